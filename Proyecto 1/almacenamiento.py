@@ -0,0 +1,171 @@
+"""Capa de almacenamiento de tablas para el gestor.
+
+Las tablas de trabajo se guardan en un formato columnar (Parquet o Feather/Arrow IPC)
+con los tipos de cada columna preservados, así que leer o escribir una tabla no
+requiere volver a interpretar texto. CSV queda solo en los bordes: los originales de
+`Tables/` se importan desde CSV y cualquier tabla se puede exportar a CSV.
+
+Cada formato es un backend registrado en `BACKENDS`; agregar uno nuevo es sumar una
+entrada con su extensión y sus funciones de lectura y escritura.
+"""
+import importlib.util
+import os
+
+import pandas as pd
+
+from concurrencia import escribir_atomico
+from esquemas import opciones_lectura
+
+HAY_PYARROW = importlib.util.find_spec("pyarrow") is not None
+
+
+# ==================== BACKENDS ====================
+
+def _leer_csv(ruta, columnas=None, esquema=None, **opciones):
+    if esquema:
+        # Con esquema los tipos vienen dados: pandas no los tiene que inferir
+        tipos, fechas = opciones_lectura(esquema)
+        opciones.update(dtype=tipos, parse_dates=fechas)
+    df = pd.read_csv(ruta, index_col=0, **opciones)
+    if columnas is not None:
+        df = df[list(columnas)]
+    return df
+
+def _escribir_csv(df, ruta):
+    df.to_csv(ruta)
+
+def _esquema_arrow(ruta, formato):
+    """Lee solo el esquema del archivo, sin cargar datos"""
+    if formato == "parquet":
+        import pyarrow.parquet as pq
+        return pq.read_schema(ruta)
+    import pyarrow.ipc as ipc
+    with ipc.open_file(ruta) as lector:
+        return lector.schema
+
+def _leer_columnar(formato):
+    lector = pd.read_parquet if formato == "parquet" else pd.read_feather
+
+    def leer(ruta, columnas=None):
+        if columnas is None:
+            df = lector(ruta)
+        else:
+            # La primera columna guardada es siempre el índice
+            nombre_indice = _esquema_arrow(ruta, formato).names[0]
+            df = lector(ruta, columns=[nombre_indice] + [c for c in columnas if c != nombre_indice])
+        return df.set_index(df.columns[0])
+    return leer
+
+def _escribir_columnar(formato):
+    def escribir(df, ruta):
+        # El índice se guarda como primera columna para que ambos formatos se lean igual
+        plano = df.reset_index()
+        # Arrow exige un tipo por columna: las columnas de texto con valores mezclados se guardan como texto
+        for col in plano.columns[plano.dtypes == object]:
+            if pd.api.types.infer_dtype(plano[col], skipna=True).startswith("mixed"):
+                plano[col] = plano[col].astype("string")
+        if formato == "parquet":
+            plano.to_parquet(ruta, index=False)
+        else:
+            plano.to_feather(ruta)
+    return escribir
+
+BACKENDS = {
+    "parquet": {"extension": ".parquet", "leer": _leer_columnar("parquet"), "escribir": _escribir_columnar("parquet")},
+    "feather": {"extension": ".feather", "leer": _leer_columnar("feather"), "escribir": _escribir_columnar("feather")},
+    "csv": {"extension": ".csv", "leer": _leer_csv, "escribir": _escribir_csv},
+}
+
+# Sin pyarrow no hay formatos columnares: se sigue trabajando con CSV
+FORMATO_PREDETERMINADO = os.environ.get("GESTOR_FORMATO", "parquet" if HAY_PYARROW else "csv")
+
+# Orden en que se buscan las tablas ya guardadas (CSV al final por compatibilidad)
+ORDEN_BUSQUEDA = [FORMATO_PREDETERMINADO] + [f for f in BACKENDS if f != FORMATO_PREDETERMINADO]
+
+EXTENSIONES_TABLA = tuple(BACKENDS[f]["extension"] for f in BACKENDS)
+
+
+# ==================== API ====================
+
+def formato_de(ruta):
+    """Retorna el nombre del backend según la extensión del archivo"""
+    extension = os.path.splitext(ruta)[1].lower()
+    for formato, backend in BACKENDS.items():
+        if backend["extension"] == extension:
+            return formato
+    raise ValueError(f"Formato de tabla no soportado: {ruta}")
+
+def ruta_tabla(carpeta, nombre, formato=None):
+    """Arma la ruta de una tabla en el formato indicado (o el predeterminado)"""
+    formato = formato or FORMATO_PREDETERMINADO
+    return os.path.join(carpeta, nombre + BACKENDS[formato]["extension"])
+
+def buscar_tabla(carpeta, nombre, existentes=None):
+    """Retorna la ruta de la tabla guardada con ese nombre, en cualquier formato, o None.
+
+    Si se pasa `existentes` (el listado de la carpeta) se busca ahí en lugar del disco.
+    """
+    for formato in ORDEN_BUSQUEDA:
+        ruta = ruta_tabla(carpeta, nombre, formato)
+        if os.path.basename(ruta) in existentes if existentes is not None else os.path.exists(ruta):
+            return ruta
+    return None
+
+def leer_tabla(ruta, columnas=None):
+    """Lee una tabla con la primera columna como índice.
+
+    En los formatos columnares `columnas` limita la lectura a esas columnas, así que
+    el costo depende de lo que se pide y no del tamaño total del archivo.
+    """
+    return BACKENDS[formato_de(ruta)]["leer"](ruta, columnas)
+
+def iterar_lotes(ruta, tamano_lote=50_000, esquema=None):
+    """Recorre la tabla en lotes de hasta `tamano_lote` filas sin cargarla entera.
+
+    `esquema` da los tipos de las columnas al leer un CSV; los formatos columnares ya
+    los tienen guardados.
+    """
+    formato = formato_de(ruta)
+    if formato == "csv":
+        yield from _leer_csv(ruta, esquema=esquema, chunksize=tamano_lote)
+        return
+    if formato == "parquet":
+        import pyarrow.parquet as pq
+        lotes = pq.ParquetFile(ruta).iter_batches(batch_size=tamano_lote)
+    else:
+        import pyarrow as pa
+        import pyarrow.ipc as ipc
+        # Feather v2 es Arrow IPC: los lotes se leen del archivo mapeado en memoria
+        lector = ipc.open_file(pa.memory_map(ruta, "r"))
+        lotes = (lector.get_batch(i) for i in range(lector.num_record_batches))
+    for lote in lotes:
+        df = lote.to_pandas()
+        yield df.set_index(df.columns[0])
+
+def escribir_tabla(df, ruta):
+    """Escribe la tabla en el formato que indica la extensión de la ruta.
+
+    Se escribe en un temporal que después reemplaza al archivo, así quien lo lee en
+    paralelo nunca ve una tabla a medio escribir.
+    """
+    escribir = BACKENDS[formato_de(ruta)]["escribir"]
+    return escribir_atomico(ruta, lambda temporal: escribir(df, temporal))
+
+def importar_csv(ruta_csv, carpeta_destino, formato=None, esquema=None):
+    """Convierte un CSV a formato columnar, solo si el CSV cambió desde la última vez.
+
+    Con `esquema` el CSV se lee con esos tipos y la copia columnar los conserva.
+    """
+    nombre = os.path.splitext(os.path.basename(ruta_csv))[0]
+    ruta_destino = ruta_tabla(carpeta_destino, nombre, formato)
+    if ruta_destino == ruta_csv:
+        return ruta_csv
+    if not os.path.exists(ruta_destino) or os.path.getmtime(ruta_destino) < os.path.getmtime(ruta_csv):
+        os.makedirs(carpeta_destino, exist_ok=True)
+        escribir_tabla(_leer_csv(ruta_csv, esquema=esquema), ruta_destino)
+    return ruta_destino
+
+def exportar_csv(ruta, ruta_csv):
+    """Exporta cualquier tabla guardada a CSV"""
+    df = leer_tabla(ruta)
+    return escribir_atomico(ruta_csv, lambda temporal: _escribir_csv(df, temporal))
@@ -1,17 +1,59 @@
 import streamlit as st
 import pandas as pd
 import os
-import json
-from datetime import datetime
+
+from almacenamiento import (
+    EXTENSIONES_TABLA, buscar_tabla, escribir_tabla, importar_csv,
+    iterar_lotes, leer_tabla, ruta_tabla,
+)
+from bitacora import (
+    UMBRAL_COMPACTACION, aplicar_operaciones, contar_operaciones, leer_operaciones,
+    operacion, registrar, vaciar,
+)
+from conversion import (
+    FORMATOS_JSON, TAMANO_LOTE, contar_registros_json, escribir_json, leer_registros_json,
+)
+from conversion import json_a_csv as convertir_json_a_csv
+from diferencias import cambios_por_columna, comparar
+from carga_masiva import aplicar_lote, cambios_grilla, leer_lote, separar_lote, validar_lote
+from claves import (
+    avanzar_secuencia, convertir_id, existe_id, fila_por_id, reservar_id, reservar_ids, sello_fila,
+    siguiente_id,
+)
+from concurrencia import ConflictoVersion, bloqueo
+from esquemas import TIPOS, aplicar_esquema, convertir_valores, esquema_tabla, guardar_esquema
+from cache_tablas import actualizar, clave, estadisticas, existe, listar_carpeta, obtener
+from historial import MANIFIESTO, cargar_version, leer_manifiesto, registrar_version
+from indice_busqueda import aplicar_operacion, buscar, construir_indice, tamano_indice
+from relaciones import (
+    VISTAS, ErrorIntegridad, aplicar_a_vista, aplicar_operacion_referencias, construir_vista,
+    contar_referencias, padres_de, tablas_de_vista, verificar_baja, verificar_fila, verificar_lote,
+    vistas_de,
+)
+from vista_tabla import ORDEN_TABLA, posiciones_visibles
 
 # Configuración de carpetas
 CARPETA_BASE = "Tables"
 CARPETA_MODIFICADA = "data_modificada"
 CARPETA_HISTORICO = "historico"
+CARPETA_EXPORTADOS = "exportados"
+# Copias columnares de los CSV de Tables/ (se regeneran si el CSV cambia)
+CARPETA_COLUMNAR = os.path.join(CARPETA_MODIFICADA, "base")
+
+# Filas que se muestran por página en los resultados
+FILAS_POR_PAGINA = 50
+MAX_FILAS_GRILLA = 1000
+# Hasta esta cantidad de filas el ID se elige de una lista; con más, se escribe
+MAX_IDS_SELECTOR = 1000
+# Próximo id de cada tabla
+RUTA_SECUENCIAS = os.path.join(CARPETA_MODIFICADA, "secuencias.json")
+# Tipos de las columnas de cada tabla (se infieren una vez de Tables/ y se pueden editar)
+RUTA_ESQUEMAS = os.path.join(CARPETA_MODIFICADA, "esquemas.json")
 
 # Crear carpetas si no existen
 os.makedirs(CARPETA_MODIFICADA, exist_ok=True)
 os.makedirs(CARPETA_HISTORICO, exist_ok=True)
+os.makedirs(CARPETA_EXPORTADOS, exist_ok=True)
 
 # Configuración de la página
 st.set_page_config(
@@ -21,90 +63,423 @@ st.set_page_config(
 )
 
 # Funciones auxiliares
+def obtener_archivos(carpeta, extensiones):
+    """Retorna lista de archivos con alguna de las extensiones en una carpeta"""
+    return [f for f in listar_carpeta(carpeta) if f.endswith(tuple(extensiones))]
+
 def obtener_archivos_csv(carpeta):
     """Retorna lista de archivos CSV en una carpeta"""
-    if not os.path.exists(carpeta):
-        return []
-    return sorted([f for f in os.listdir(carpeta) if f.endswith('.csv')])
+    return obtener_archivos(carpeta, ('.csv',))
 
-def cargar_csv(archivo, usar_modificado=False):
-    """Carga un archivo CSV con la primera columna como índice"""
-    carpeta = CARPETA_MODIFICADA if usar_modificado else CARPETA_BASE
-    ruta = os.path.join(carpeta, archivo)
+def nombre_modificado(archivo):
+    """Nombre (sin extensión) de la versión modificada de un archivo base"""
+    nombre_base = archivo.replace('.csv', '')
+    return f"{nombre_base}_modificado"
     
-    if usar_modificado:
-        # Buscar el archivo modificado
-        nombre_base = archivo.replace('.csv', '')
-        archivo_mod = f"{nombre_base}_modificado.csv"
-        ruta = os.path.join(CARPETA_MODIFICADA, archivo_mod)
+def ruta_modificado(archivo):
+    """Ruta de la versión modificada en cualquier formato, o None si no existe"""
+    return buscar_tabla(CARPETA_MODIFICADA, nombre_modificado(archivo), listar_carpeta(CARPETA_MODIFICADA))
+    
+def ruta_bitacora(archivo):
+    """Ruta de la bitácora de operaciones pendientes de una tabla"""
+    return os.path.join(CARPETA_MODIFICADA, f"{nombre_modificado(archivo)}.bitacora.jsonl")
+
+def ruta_original(archivo):
+    """Ruta de la copia columnar del CSV original, o None si no existe"""
+    ruta = os.path.join(CARPETA_BASE, archivo)
+    if not os.path.exists(ruta):
+        return None
+    # El CSV original se lee desde su copia columnar, ya con los tipos del esquema
+    return importar_csv(ruta, CARPETA_COLUMNAR, esquema=esquema_de(archivo))
+
+def esquema_de(archivo):
+    """Esquema de tipos de la tabla ({columna: tipo}); la primera vez se infiere del CSV"""
+    tabla = archivo.replace('.csv', '')
+    return obtener(("esquema", tabla), [RUTA_ESQUEMAS],
+                   lambda: esquema_tabla(RUTA_ESQUEMAS, tabla, os.path.join(CARPETA_BASE, archivo)))
+
+def _leer_modificado(archivo, columnas=None):
+    # Versión modificada: última versión guardada (o el original) más la bitácora
+    ruta = ruta_modificado(archivo) or ruta_original(archivo)
+    operaciones = leer_operaciones(ruta_bitacora(archivo))
+    # Con operaciones pendientes se leen todas las columnas para poder aplicarlas
+    df = leer_tabla(ruta, None if operaciones else columnas)
+    df = aplicar_esquema(aplicar_operaciones(df, operaciones), esquema_de(archivo))
+    return df[list(columnas)] if columnas is not None else df
+
+def cargar_tabla(archivo, usar_modificado=False, columnas=None):
+    """Carga una tabla con la primera columna como índice.
     
-    if os.path.exists(ruta):
-        # Cargar con la primera columna como índice
-        return pd.read_csv(ruta, index_col=0)
-    return None
+    La tabla queda en el caché del proceso hasta que cambie alguno de sus archivos,
+    así que el resultado es compartido y no se debe modificar en el lugar.
+    """
+    if not existe(CARPETA_BASE, archivo) and not (usar_modificado and existe_modificado(archivo)):
+        return None
+    clave_columnas = tuple(columnas) if columnas is not None else None
+    
+    if not usar_modificado:
+        return obtener(("original", archivo, clave_columnas), dependencias_tabla(archivo),
+                       lambda: aplicar_esquema(leer_tabla(ruta_original(archivo), columnas), esquema_de(archivo)))
+    
+    return obtener(("modificado", archivo, clave_columnas), dependencias_tabla(archivo, True),
+                   lambda: _leer_modificado(archivo, columnas))
+
+def dependencias_tabla(archivo, usar_modificado=False):
+    """Archivos de los que depende el contenido de una tabla (para invalidar el caché)"""
+    ruta_csv = os.path.join(CARPETA_BASE, archivo)
+    if not usar_modificado:
+        return [ruta_csv, RUTA_ESQUEMAS]
+    return [ruta_modificado(archivo) or ruta_csv, ruta_bitacora(archivo), RUTA_ESQUEMAS]
+
+def indice_tabla(archivo, usar_modificado=False):
+    """Índice de búsqueda de la tabla: se construye una vez y se mantiene con cada cambio"""
+    return obtener(("indice", archivo, usar_modificado), dependencias_tabla(archivo, usar_modificado),
+                   lambda: construir_indice(cargar_tabla(archivo, usar_modificado)),
+                   tamano=tamano_indice)
+
+def cargar_relacionada(tabla):
+    """Versión vigente de una tabla por su nombre, para validar y armar vistas"""
+    return cargar_tabla(f"{tabla}.csv", usar_modificado=True)
+
+def referencias_tabla(hija, columna):
+    """Conteo de filas de `hija` que apuntan a cada id: se arma una vez y se ajusta con cada cambio"""
+    archivo = f"{hija}.csv"
+    return obtener(("referencias", hija, columna), dependencias_tabla(archivo, True),
+                   lambda: contar_referencias(cargar_tabla(archivo, usar_modificado=True), columna))
+
+def dependencias_vista(nombre):
+    """Archivos de todas las tablas que forman una vista combinada"""
+    dependencias = []
+    for tabla in tablas_de_vista(nombre):
+        dependencias += [r for r in dependencias_tabla(f"{tabla}.csv", True) if r not in dependencias]
+    return dependencias
+
+def vista_combinada(nombre):
+    """Vista desnormalizada (p. ej. ventas con el nombre y precio del libro), mantenida con cada cambio"""
+    return obtener(("vista", nombre), dependencias_vista(nombre),
+                   lambda: construir_vista(nombre, cargar_relacionada))
+
+def verificar_integridad(archivo, op, id_fila, valores=None):
+    """Lanza ErrorIntegridad si el cambio deja claves foráneas apuntando a filas que no existen"""
+    tabla = archivo.replace('.csv', '')
+    if op == "delete":
+        verificar_baja(tabla, id_fila, referencias_tabla)
+    else:
+        verificar_fila(tabla, valores or {}, cargar_relacionada)
+
+def actualizar_derivados(tabla, clave_antes, claves_vistas, entrada=None, anterior=None):
+    """Lleva los conteos de referencias y las vistas cacheadas al estado posterior a
+    `entrada` (o los da por vigentes si el contenido no cambió)"""
+    archivo = f"{tabla}.csv"
+    for columna, _ in padres_de(tabla):
+        actualizar(("referencias", tabla, columna), clave_antes, dependencias_tabla(archivo, True),
+                   lambda conteo, columna=columna: conteo if entrada is None
+                   else aplicar_operacion_referencias(conteo, columna, entrada, anterior))
+    for nombre, clave_vista in claves_vistas.items():
+        actualizar(("vista", nombre), clave_vista, dependencias_vista(nombre),
+                   lambda vista, nombre=nombre: vista if entrada is None or vista is None
+                   else aplicar_a_vista(vista, nombre, tabla, entrada, cargar_relacionada))
 
 def existe_modificado(archivo):
-    """Verifica si existe versión modificada"""
-    nombre_base = archivo.replace('.csv', '')
-    archivo_mod = f"{nombre_base}_modificado.csv"
-    return os.path.exists(os.path.join(CARPETA_MODIFICADA, archivo_mod))
+    """Verifica si existe versión modificada (guardada o con cambios pendientes)"""
+    return (ruta_modificado(archivo) is not None
+            or existe(CARPETA_MODIFICADA, os.path.basename(ruta_bitacora(archivo))))
 
-def guardar_csv(df, archivo, respaldar=True):
-    """Guarda CSV con índice y crea respaldo si existe versión anterior"""
+def operaciones_pendientes(archivo):
+    """Cantidad de cambios en la bitácora de la tabla que todavía no se compactaron"""
+    ruta = ruta_bitacora(archivo)
+    if not existe(CARPETA_MODIFICADA, os.path.basename(ruta)):
+        return 0
+    return obtener(("pendientes", archivo), [ruta], lambda: contar_operaciones(ruta))
+
+def total_versiones():
+    """Cantidad de versiones guardadas en el historial entre todas las tablas"""
+    tablas = [t for t in listar_carpeta(CARPETA_HISTORICO)
+              if os.path.isdir(os.path.join(CARPETA_HISTORICO, t))]
+    manifiestos = [os.path.join(CARPETA_HISTORICO, t, MANIFIESTO) for t in tablas]
+    return obtener(("versiones",), manifiestos,
+                   lambda: sum(len(leer_manifiesto(CARPETA_HISTORICO, t)) for t in tablas))
+
+def guardar_tabla(df, archivo, respaldar=True, anterior=None):
+    """Guarda la tabla con índice y registra la versión en el historial.
+    
+    `anterior` es el contenido de la última versión guardada, si ya está en memoria;
+    si no se pasa y hace falta, se lee del disco.
+    """
     nombre_base = archivo.replace('.csv', '')
-    archivo_mod = f"{nombre_base}_modificado.csv"
-    ruta_destino = os.path.join(CARPETA_MODIFICADA, archivo_mod)
-    
-    # Respaldar versión anterior si existe
-    if respaldar and os.path.exists(ruta_destino):
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        nombre_respaldo = f"{nombre_base}_{timestamp}.csv"
-        ruta_respaldo = os.path.join(CARPETA_HISTORICO, nombre_respaldo)
-        df_anterior = pd.read_csv(ruta_destino, index_col=0)
-        df_anterior.to_csv(ruta_respaldo)
-        st.success(f"✅ Respaldo guardado: {nombre_respaldo}")
-    
-    # Guardar nueva versión con índice
-    df.to_csv(ruta_destino)
+    ruta_anterior = ruta_modificado(archivo)
+    ruta_destino = ruta_tabla(CARPETA_MODIFICADA, nombre_modificado(archivo))
+    df = aplicar_esquema(df, esquema_de(archivo))
+
+    # Registrar la versión en el historial (solo las filas que cambiaron)
+    if respaldar:
+        if anterior is None:
+            ruta_previa = ruta_anterior or ruta_original(archivo)
+            anterior = leer_tabla(ruta_previa) if ruta_previa else df.iloc[0:0]
+        version = registrar_version(CARPETA_HISTORICO, nombre_base, df, anterior)
+        if version is not None:
+            st.success(f"✅ Versión {version} guardada en el historial")
+    
+    # Guardar nueva versión con índice; ya incluye lo que estaba en la bitácora
+    escribir_tabla(df, ruta_destino)
+    vaciar(ruta_bitacora(archivo))
+    # Una versión anterior en otro formato (p. ej. CSV) queda reemplazada
+    if ruta_anterior and ruta_anterior != ruta_destino:
+        os.remove(ruta_anterior)
     return ruta_destino
 
-def csv_a_json(archivo, usar_modificado=False):
-    """Convierte CSV a JSON"""
-    df = cargar_csv(archivo, usar_modificado)
-    if df is None:
+def bloqueo_tabla(archivo):
+    """Bloqueo de escritura de una tabla: lo toman los cambios, la compactación y el guardado"""
+    return bloqueo(os.path.join(CARPETA_MODIFICADA, nombre_modificado(archivo)))
+
+def registrar_cambio(archivo, op, id_fila, valores=None, usar_modificado=True, sello=None):
+    """Registra un alta, edición o baja de fila sin reescribir la tabla.
+    
+    `sello` es el de la fila cuando se mostró (`sello_fila`); si se pasa y la fila
+    cambió desde entonces se lanza ConflictoVersion y no se registra nada. Si el
+    cambio rompe una clave foránea se lanza ErrorIntegridad.
+    """
+    with bloqueo_tabla(archivo):
+        if sello is not None and sello_fila(cargar_tabla(archivo, usar_modificado), id_fila) != sello:
+            raise ConflictoVersion(f"La fila {id_fila} fue modificada o eliminada por otra sesión")
+        verificar_integridad(archivo, op, id_fila, valores)
+        return _registrar_cambio(archivo, operacion(op, id_fila, valores), usar_modificado)
+
+def _registrar_cambio(archivo, entrada, usar_modificado):
+    if not usar_modificado and existe_modificado(archivo):
+        # Se trabaja sobre el original descartando la versión modificada: se reescribe entera
+        df = aplicar_operaciones(cargar_tabla(archivo), [entrada])
+        return guardar_tabla(df, archivo)
+    
+    tabla = archivo.replace('.csv', '')
+    clave_antes = clave(dependencias_tabla(archivo, True))
+    claves_vistas = {nombre: clave(dependencias_vista(nombre)) for nombre in vistas_de(tabla)}
+    # Valores de la fila antes del cambio, para ajustar los conteos de referencias
+    fila = fila_por_id(cargar_tabla(archivo, usar_modificado=True), entrada["id"]) if padres_de(tabla) else None
+    anterior = None if fila is None else fila.iloc[0].to_dict()
+    
+    pendientes = registrar(ruta_bitacora(archivo), entrada)
+    # La tabla y el índice cacheados se actualizan en memoria, sin volver a leer el disco
+    dependencias = dependencias_tabla(archivo, True)
+    actualizar(("modificado", archivo, None), clave_antes, dependencias,
+               lambda df: aplicar_operaciones(df, [entrada]))
+    actualizar(("indice", archivo, True), clave_antes, dependencias,
+               lambda indice: aplicar_operacion(indice, entrada), tamano=tamano_indice)
+    actualizar_derivados(tabla, clave_antes, claves_vistas, entrada, anterior)
+    
+    if pendientes >= UMBRAL_COMPACTACION:
+        compactar_tabla(archivo)
+    return ruta_bitacora(archivo)
+
+def cargar_lote(archivo, altas=None, altas_sin_id=None, correcciones=None, mascara=None, bajas=None):
+    """Aplica un lote de altas, correcciones y bajas sobre la versión modificada y la
+    guarda una sola vez, como una única versión en el historial"""
+    tabla = archivo.replace('.csv', '')
+    with bloqueo_tabla(archivo):
+        clave_antes = clave(dependencias_tabla(archivo, True))
+        df = cargar_tabla(archivo, usar_modificado=True)
+        if altas_sin_id is not None and len(altas_sin_id):
+            # Los ids de todas las altas se reservan de una sola vez
+            altas_sin_id = altas_sin_id.set_axis(
+                pd.Index(reservar_ids(RUTA_SECUENCIAS, tabla, df, len(altas_sin_id)), name=df.index.name))
+            altas = altas_sin_id if altas is None or altas.empty else pd.concat([altas, altas_sin_id])
+        if altas is not None and len(altas):
+            avanzar_secuencia(RUTA_SECUENCIAS, tabla, altas.index.max())
+        # Lanza ValueError si el lote deja alguna columna fuera de su tipo (p. ej. un vacío en un entero)
+        nuevo = aplicar_esquema(aplicar_lote(df, altas, correcciones, mascara, bajas), esquema_de(archivo), estricto=True)
+        guardar_tabla(nuevo, archivo)
+        # La tabla cacheada pasa a ser la nueva sin volver a leerla
+        actualizar(("modificado", archivo, None), clave_antes, dependencias_tabla(archivo, True), lambda _: nuevo)
+    return nuevo
+
+def compactar_tabla(archivo):
+    """Vuelca la bitácora sobre la versión modificada y la vacía"""
+    with bloqueo_tabla(archivo):
+        return _compactar_tabla(archivo)
+
+def _compactar_tabla(archivo):
+    # Quien lea entre que se escribe la tabla y se vacía la bitácora aplica dos veces
+    # las mismas operaciones; como cada una fija valores absolutos, el resultado es igual
+    operaciones = leer_operaciones(ruta_bitacora(archivo))
+    if not operaciones:
         return None
+    tabla = archivo.replace('.csv', '')
+    clave_antes = clave(dependencias_tabla(archivo, True))
+    claves_vistas = {nombre: clave(dependencias_vista(nombre)) for nombre in vistas_de(tabla)}
+    base = leer_tabla(ruta_modificado(archivo) or ruta_original(archivo))
+    ruta = guardar_tabla(aplicar_operaciones(base, operaciones), archivo, anterior=base)
+    # El contenido no cambia al compactar: tabla, índice, referencias y vistas siguen valiendo
+    dependencias = dependencias_tabla(archivo, True)
+    actualizar(("modificado", archivo, None), clave_antes, dependencias, lambda df: df)
+    actualizar(("indice", archivo, True), clave_antes, dependencias, lambda indice: indice,
+               tamano=tamano_indice)
+    actualizar_derivados(tabla, clave_antes, claves_vistas)
+    return ruta
     
-    # Reset index para incluirlo en el JSON
-    df_reset = df.reset_index()
-    registros = df_reset.to_dict('records')
+def seleccionar_id(df, etiqueta, clave_widget):
+    """Selector de ID: lista desplegable en tablas chicas y campo de texto en las grandes.
     
-    carpeta = CARPETA_MODIFICADA if usar_modificado else CARPETA_BASE
-    nombre_json = archivo.replace('.csv', '.json')
-    ruta_json = os.path.join(carpeta, nombre_json)
+    Retorna el id elegido, o None si el escrito no existe en la tabla.
+    """
+    if len(df.index) <= MAX_IDS_SELECTOR:
+        return st.selectbox(etiqueta, df.index, key=clave_widget)
+    texto = st.text_input(etiqueta, key=clave_widget)
+    if not texto:
+        return None
+    try:
+        id_fila = convertir_id(df.index, texto)
+    except ValueError:
+        st.warning("El ID no tiene el formato de la tabla")
+        return None
+    if not existe_id(df, id_fila):
+        st.warning("No se encontró el ID")
+        return None
+    return id_fila
+
+def mostrar_tabla(df, clave_widget, cargar_indice=None, resaltar=None):
+    """Muestra la tabla de a una página, con orden y filtro calculados en el servidor.
     
-    with open(ruta_json, 'w', encoding='utf-8') as f:
-        json.dump(registros, f, ensure_ascii=False, indent=2)
+    Solo se envía al navegador la página visible. `cargar_indice` retorna el índice de
+    búsqueda de la tabla, si lo tiene; se usa (y se construye) solo al filtrar.
+    `resaltar` es una máscara booleana por id y columna con las celdas a destacar.
+    """
+    col_orden, col_sentido, col_filtro, col_texto = st.columns([3, 1, 3, 3])
+    with col_orden:
+        opciones_orden = ["(orden de la tabla)"] + ([df.index.name] if df.index.name else []) + list(df.columns)
+        orden = st.selectbox("Ordenar por", opciones_orden, key=f"{clave_widget}_orden")
+    with col_sentido:
+        descendente = st.checkbox("Desc.", key=f"{clave_widget}_desc")
+    with col_filtro:
+        columna_filtro = st.selectbox("Filtrar en", ["(todas)"] + list(df.columns), key=f"{clave_widget}_filtro")
+    with col_texto:
+        texto = st.text_input("Contiene", key=f"{clave_widget}_texto")
     
-    return ruta_json
+    columna_orden = ORDEN_TABLA if orden == opciones_orden[0] else orden
+    columnas_filtro = None if columna_filtro == "(todas)" else [columna_filtro]
+    indice = cargar_indice() if texto and cargar_indice else None
+    posiciones = posiciones_visibles(df, columna_orden, not descendente, texto, columnas_filtro, indice)
+    paginas = max((len(posiciones) - 1) // FILAS_POR_PAGINA + 1, 1)
+    pagina = st.number_input("Página", min_value=1, max_value=paginas, value=1,
+                             key=f"{clave_widget}_pagina") if paginas > 1 else 1
+    desde = (min(pagina, paginas) - 1) * FILAS_POR_PAGINA
+    df_pagina = df.iloc[posiciones[desde:desde + FILAS_POR_PAGINA]]
+    if resaltar is not None and len(df_pagina):
+        # El estilo se arma solo para las filas de la página
+        estilos = pd.DataFrame("", index=df_pagina.index, columns=df_pagina.columns)
+        mascara = resaltar.reindex(index=df_pagina.index, columns=df_pagina.columns, fill_value=False)
+        estilos[mascara.to_numpy(dtype=bool)] = "background-color: #fff3b0"
+        df_pagina = df_pagina.style.apply(lambda _: estilos, axis=None)
+    st.dataframe(df_pagina, use_container_width=True)
+    hasta = min(desde + FILAS_POR_PAGINA, len(posiciones))
+    st.caption(f"Filas {desde + 1 if hasta else 0}–{hasta} de {len(posiciones)}"
+               + (f" (filtradas de {len(df)})" if texto else "") + f" · página {pagina} de {paginas}")
 
-def json_a_csv(ruta_json):
-    """Convierte JSON a CSV"""
-    with open(ruta_json, 'r', encoding='utf-8') as f:
-        datos = json.load(f)
+def sello_mostrado(clave_sello, df, id_fila):
+    """Sello de la fila tal como se le mostró al usuario: se toma la primera vez que se
+    muestra y se conserva entre re-ejecuciones hasta que se guarda o se descarta"""
+    if clave_sello not in st.session_state:
+        st.session_state[clave_sello] = sello_fila(df, id_fila)
+    return st.session_state[clave_sello]
+
+def descartar_formulario(prefijo):
+    """Olvida el sello y los valores escritos de un formulario para que se vuelva a
+    cargar con el contenido actual de la fila"""
+    for k in [k for k in st.session_state if str(k).startswith(prefijo)]:
+        del st.session_state[k]
+
+def versiones_disponibles(archivo):
+    """Versiones comparables de una tabla: original, las del historial y la actual"""
+    nombre_base = archivo.replace('.csv', '')
+    opciones = {"Original (Tables)": "original"}
+    for v in leer_manifiesto(CARPETA_HISTORICO, nombre_base):
+        opciones[f"Versión {v['version']} ({v['fecha']})"] = v["version"]
+    opciones["Actual (con cambios pendientes)"] = "actual"
+    return opciones
+
+def cargar_version_tabla(archivo, version):
+    """Carga una versión de la tabla: 'original', 'actual' o un número del historial"""
+    if version == "original":
+        return cargar_tabla(archivo)
+    if version == "actual":
+        return cargar_tabla(archivo, usar_modificado=True)
+    nombre_base = archivo.replace('.csv', '')
+    manifiesto = os.path.join(CARPETA_HISTORICO, nombre_base, MANIFIESTO)
+    return obtener(("version", archivo, version), [manifiesto],
+                   lambda: cargar_version(CARPETA_HISTORICO, nombre_base, version))
+
+def dependencias_version(archivo, version):
+    """Archivos de los que depende una versión de la tabla (para invalidar el caché)"""
+    if version == "original":
+        return dependencias_tabla(archivo)
+    if version == "actual":
+        return dependencias_tabla(archivo, usar_modificado=True)
+    return [os.path.join(CARPETA_HISTORICO, archivo.replace('.csv', ''), MANIFIESTO)]
+
+def diferencia_versiones(archivo, version_a, version_b):
+    """Diferencias entre dos versiones de la tabla, con las filas añadidas, eliminadas y
+    modificadas ya separadas; se calcula una vez por par de versiones"""
+    def calcular():
+        df_a = cargar_version_tabla(archivo, version_a)
+        df_b = cargar_version_tabla(archivo, version_b)
+        diferencia = comparar(df_a, df_b)
+        diferencia["filas_altas"] = df_b.loc[df_b.index.isin(diferencia["altas"])]
+        diferencia["filas_bajas"] = df_a.loc[df_a.index.isin(diferencia["bajas"])]
+        diferencia["filas_modificadas"] = df_b.loc[df_b.index.isin(diferencia["modificadas"])]
+        return diferencia
     
-    df = pd.DataFrame(datos)
+    def tamano(diferencia):
+        tablas = ["mascara", "filas_altas", "filas_bajas", "filas_modificadas"]
+        return sum(int(diferencia[t].memory_usage(index=True, deep=True).sum()) for t in tablas)
     
-    # Si el primer campo parece un ID, usarlo como índice
-    primera_col = df.columns[0]
-    if 'id' in primera_col.lower():
-        df = df.set_index(primera_col)
+    return obtener(("diferencia", archivo, version_a, version_b),
+                   dependencias_version(archivo, version_a) + dependencias_version(archivo, version_b),
+                   calcular, tamano=tamano)
+
+def csv_a_json(archivo, usar_modificado=False, formato="json"):
+    """Convierte la tabla a JSON (o JSON Lines) por lotes, sin cargarla entera"""
+    if usar_modificado:
+        if not existe_modificado(archivo):
+            return None
+        if operaciones_pendientes(archivo):
+            # Con cambios pendientes la tabla vigente es la que está en el caché
+            df = cargar_tabla(archivo, usar_modificado=True)
+            lotes = (df.iloc[i:i + TAMANO_LOTE] for i in range(0, len(df), TAMANO_LOTE))
+        else:
+            lotes = iterar_lotes(ruta_modificado(archivo) or ruta_original(archivo), TAMANO_LOTE)
+    else:
+        ruta_csv = os.path.join(CARPETA_BASE, archivo)
+        if not os.path.exists(ruta_csv):
+            return None
+        lotes = iterar_lotes(ruta_csv, TAMANO_LOTE, esquema_de(archivo))
     
-    nombre_csv = os.path.basename(ruta_json).replace('.json', '.csv')
+    carpeta = CARPETA_MODIFICADA if usar_modificado else CARPETA_BASE
+    nombre_json = archivo.replace('.csv', FORMATOS_JSON[formato])
+    ruta_json = os.path.join(carpeta, nombre_json)
+    escribir_json(lotes, ruta_json, formato)
+    
+    return ruta_json
+
+def json_a_csv(ruta_json):
+    """Convierte JSON o JSON Lines a CSV por lotes"""
+    nombre_csv = os.path.splitext(os.path.basename(ruta_json))[0] + '.csv'
     ruta_csv = os.path.join(CARPETA_MODIFICADA, nombre_csv)
-    df.to_csv(ruta_csv)
+    convertir_json_a_csv(ruta_json, ruta_csv)
     
     return ruta_csv
 
+def obtener_archivos_json(carpeta):
+    """Archivos JSON y JSON Lines de una carpeta (sin contar bitácoras, secuencias ni esquemas)"""
+    return [f for f in obtener_archivos(carpeta, FORMATOS_JSON.values())
+            if not f.endswith('.bitacora.jsonl') and os.path.join(carpeta, f) not in (RUTA_SECUENCIAS, RUTA_ESQUEMAS)]
+
+def tabla_a_csv(archivo):
+    """Exporta la versión modificada de una tabla a CSV"""
+    df = cargar_tabla(archivo, usar_modificado=True)
+    if df is None:
+        return None
+    ruta_csv = os.path.join(CARPETA_EXPORTADOS, f"{nombre_modificado(archivo)}.csv")
+    return escribir_tabla(df, ruta_csv)
+
 # ==================== INTERFAZ ====================
 
 st.title("📊 Sistema de Gestión de CSV")
@@ -114,9 +489,12 @@ st.markdown("---")
 menu = st.sidebar.selectbox(
     "Seleccione una opción",
     ["🏠 Inicio", "👁️ Visualizar", "➕ Agregar Fila", "✏️ Editar Fila", 
-     "🗑️ Eliminar Fila", "🔍 Buscar", "🔄 Convertir CSV/JSON", "📊 Comparar Versiones"]
+     "🗑️ Eliminar Fila", "📥 Carga Masiva", "🔍 Buscar", "🔄 Convertir CSV/JSON", "📊 Comparar Versiones"]
 )
 
+uso_cache = estadisticas()
+st.sidebar.caption(f"🧠 Caché: {uso_cache['entradas']} entradas · {uso_cache['memoria_mb']:.1f} MB")
+
 # ==================== INICIO ====================
 if menu == "🏠 Inicio":
     st.header("Bienvenido al Gestor de CSV")
@@ -128,18 +506,54 @@ if menu == "🏠 Inicio":
         st.metric("Archivos Base", len(archivos_base))
     
     with col2:
-        archivos_mod = obtener_archivos_csv(CARPETA_MODIFICADA)
+        archivos_mod = [a for a in archivos_base if existe_modificado(a)]
         st.metric("Archivos Modificados", len(archivos_mod))
     
     with col3:
-        archivos_hist = obtener_archivos_csv(CARPETA_HISTORICO)
-        st.metric("Respaldos", len(archivos_hist))
+        st.metric("Versiones en historial", total_versiones())
     
     st.markdown("### 📁 Archivos disponibles")
     if archivos_base:
         for archivo in archivos_base:
             modificado = "✅" if existe_modificado(archivo) else "⚪"
-            st.write(f"{modificado} {archivo}")
+            pendientes = operaciones_pendientes(archivo)
+            detalle = f" ({pendientes} cambios pendientes de compactar)" if pendientes else ""
+            st.write(f"{modificado} {archivo}{detalle}")
+        
+        con_bitacora = [a for a in archivos_base if operaciones_pendientes(a)]
+        if con_bitacora and st.button("🗜️ Compactar bitácoras"):
+            for archivo in con_bitacora:
+                compactar_tabla(archivo)
+            st.success(f"✅ Compactadas: {len(con_bitacora)} tablas")
+            st.rerun()
+        
+        st.markdown("### 🧬 Tipos de las columnas")
+        with st.expander("Ver o editar el esquema de una tabla"):
+            st.caption("Los tipos se infirieron del CSV original. Con los cambios se validan las "
+                       "escrituras y se convierten las tablas al cargarlas.")
+            archivo = st.selectbox("Tabla", archivos_base, key="esquema_archivo")
+            tabla = archivo.replace('.csv', '')
+            esquema = esquema_de(archivo)
+            editado = st.data_editor(
+                pd.DataFrame({"columna": list(esquema), "tipo": list(esquema.values())}),
+                column_config={"tipo": st.column_config.SelectboxColumn("tipo", options=TIPOS, required=True)},
+                disabled=["columna"], hide_index=True, use_container_width=True, key=f"esquema_{tabla}")
+            nuevo = dict(zip(editado["columna"], editado["tipo"]))
+            
+            if st.button("Guardar esquema", disabled=nuevo == esquema):
+                try:
+                    # Las versiones actuales de la tabla tienen que poder llevarse a los tipos nuevos
+                    for usar_mod in {False, existe_modificado(archivo)}:
+                        aplicar_esquema(cargar_tabla(archivo, usar_mod), nuevo, estricto=True)
+                except ValueError as e:
+                    st.error(f"No se guardó el esquema: {e}")
+                else:
+                    guardar_esquema(RUTA_ESQUEMAS, tabla, nuevo)
+                    # La copia columnar del CSV se regenera con los tipos nuevos
+                    ruta_copia = buscar_tabla(CARPETA_COLUMNAR, tabla)
+                    if ruta_copia:
+                        os.remove(ruta_copia)
+                    st.success(f"✅ Esquema de {tabla} guardado")
     else:
         st.warning("No hay archivos CSV en la carpeta Tables")
 
@@ -147,14 +561,22 @@ if menu == "🏠 Inicio":
 elif menu == "👁️ Visualizar":
     st.header("Visualizar Archivos")
     
-    tipo = st.radio("Tipo de archivo", ["CSV Base", "CSV Modificado", "JSON"])
+    tipo = st.radio("Tipo de archivo", ["CSV Base", "Tabla Modificada", "Vista combinada", "JSON"])
     
     if tipo == "CSV Base":
         archivos = obtener_archivos_csv(CARPETA_BASE)
         carpeta = CARPETA_BASE
-    elif tipo == "CSV Modificado":
-        archivos = obtener_archivos_csv(CARPETA_MODIFICADA)
+    elif tipo == "Tabla Modificada":
+        # Tablas con versión modificada (incluye la bitácora) y otros archivos convertidos
+        tablas_mod = {nombre_modificado(a): a for a in obtener_archivos_csv(CARPETA_BASE) if existe_modificado(a)}
+        sueltos = [f for f in obtener_archivos(CARPETA_MODIFICADA, EXTENSIONES_TABLA)
+                   if os.path.splitext(f)[0] not in tablas_mod]
+        archivos = list(tablas_mod) + sueltos
         carpeta = CARPETA_MODIFICADA
+    elif tipo == "Vista combinada":
+        # Tablas unidas con las que referencian (ver relaciones.py)
+        archivos = [nombre for nombre in VISTAS if existe(CARPETA_BASE, f"{VISTAS[nombre]['base']}.csv")]
+        carpeta = None
     else:  # JSON
         # Buscar JSON en ambas carpetas
         archivos = []
@@ -162,7 +584,7 @@ elif menu == "👁️ Visualizar":
         
         for carpeta_buscar in [CARPETA_BASE, CARPETA_MODIFICADA]:
             if os.path.exists(carpeta_buscar):
-                jsons = [f for f in os.listdir(carpeta_buscar) if f.endswith('.json')]
+                jsons = obtener_archivos_json(carpeta_buscar)
                 for j in jsons:
                     origen = "Base" if carpeta_buscar == CARPETA_BASE else "Modificada"
                     archivos.append(f"{j} ({origen})")
@@ -173,25 +595,44 @@ elif menu == "👁️ Visualizar":
     if archivos:
         archivo_seleccionado = st.selectbox("Seleccione un archivo", archivos)
         
+        if tipo == "JSON":
+            # Obtener el índice seleccionado y buscar la carpeta correcta
+            indice_seleccionado = archivos.index(archivo_seleccionado)
+            nombre_real, carpeta = archivos_info[indice_seleccionado]
+            ruta = os.path.join(carpeta, nombre_real)
+        elif tipo == "Vista combinada":
+            ruta = f"vista:{archivo_seleccionado}"
+        else:
+            ruta = os.path.join(carpeta, archivo_seleccionado)
+        
         if st.button("Mostrar"):
-            if tipo == "JSON":
-                # Obtener el índice seleccionado y buscar la carpeta correcta
-                indice_seleccionado = archivos.index(archivo_seleccionado)
-                nombre_real, carpeta = archivos_info[indice_seleccionado]
-                ruta = os.path.join(carpeta, nombre_real)
+            st.session_state["visualizar"] = ruta
+        
+        # Lo elegido se sigue mostrando al cambiar de página, orden o filtro
+        if tipo != "JSON" and st.session_state.get("visualizar") == ruta:
+            if tipo == "CSV Base":
+                df = cargar_tabla(archivo_seleccionado)
+                cargar_indice = lambda: indice_tabla(archivo_seleccionado)
+            elif tipo == "Vista combinada":
+                df = vista_combinada(archivo_seleccionado)
+                cargar_indice = None
+            elif archivo_seleccionado in tablas_mod:
+                df = cargar_tabla(tablas_mod[archivo_seleccionado], usar_modificado=True)
+                cargar_indice = lambda: indice_tabla(tablas_mod[archivo_seleccionado], usar_modificado=True)
             else:
-                ruta = os.path.join(carpeta, archivo_seleccionado)
+                df = obtener(("archivo", ruta), [ruta], lambda: leer_tabla(ruta))
+                cargar_indice = None
+            mostrar_tabla(df, "visualizar", cargar_indice)
+            st.info(f"📊 Filas: {len(df)} | Columnas: {len(df.columns)}")
             
-            if archivo_seleccionado.endswith('.csv') or ruta.endswith('.csv'):
-                df = pd.read_csv(ruta, index_col=0)
-                st.dataframe(df, use_container_width=True)
-                st.info(f"📊 Filas: {len(df)} | Columnas: {len(df.columns)}")
-            else:  # JSON
-                with open(ruta, 'r', encoding='utf-8') as f:
-                    datos = json.load(f)
-                st.json(datos[:50])  # Mostrar primeros 50 registros
-                if isinstance(datos, list):
-                    st.info(f"📊 Total registros: {len(datos)}")
+        # El JSON se muestra por páginas usando su índice de posiciones: el total sale del
+        # índice y cada página se lee sin recorrer el resto del archivo
+        if tipo == "JSON" and st.session_state.get("visualizar") == ruta:
+            total = contar_registros_json(ruta)
+            paginas = max((total - 1) // FILAS_POR_PAGINA + 1, 1)
+            pagina = st.number_input("Página", min_value=1, max_value=paginas, value=1) if paginas > 1 else 1
+            st.json(leer_registros_json(ruta, (pagina - 1) * FILAS_POR_PAGINA, FILAS_POR_PAGINA))
+            st.info(f"📊 Total registros: {total}" + (f" | Página {pagina} de {paginas}" if paginas > 1 else ""))
     else:
         st.warning(f"No hay archivos disponibles de tipo: {tipo}")
 
@@ -208,19 +649,15 @@ elif menu == "➕ Agregar Fila":
         if existe_modificado(archivo):
             usar_mod = st.checkbox("Usar versión modificada")
         
-        df = cargar_csv(archivo, usar_mod)
+        df = cargar_tabla(archivo, usar_mod)
         
         if df is not None:
             st.write("Vista previa:")
             st.dataframe(df.head(10), use_container_width=True)
             
-            # Calcular nuevo ID basado en el índice
-            if len(df.index) > 0:
-                ids_numericos = pd.to_numeric(df.index, errors='coerce')
-                ids_validos = ids_numericos.dropna()
-                nuevo_id = int(ids_validos.max()) + 1 if len(ids_validos) > 0 else 1
-            else:
-                nuevo_id = 1
+            # Próximo ID de la secuencia persistente de la tabla (sin recorrer el índice)
+            tabla = archivo.replace('.csv', '')
+            nuevo_id = siguiente_id(RUTA_SECUENCIAS, tabla, df)
             
             st.info(f"Nuevo ID asignado: {nuevo_id}")
             
@@ -231,18 +668,27 @@ elif menu == "➕ Agregar Fila":
                 # Mostrar el ID que se asignará
                 st.text_input(f"{df.index.name or 'ID'} (Auto)", value=str(nuevo_id), disabled=True)
                 
-                # Resto de columnas
+                # Resto de columnas (el tipo de cada una se indica como ayuda)
+                esquema = esquema_de(archivo) or {}
                 for col in df.columns:
-                    valores[col] = st.text_input(f"{col}", key=f"col_{col}")
+                    valores[col] = st.text_input(f"{col}", key=f"col_{col}", help=esquema.get(col))
                 
                 submitted = st.form_submit_button("Agregar Fila")
                 
                 if submitted:
-                    # Crear nueva fila con el ID como índice
-                    nueva_fila = pd.DataFrame([valores], index=[nuevo_id])
-                    nueva_fila.index.name = df.index.name
-                    df_modificado = pd.concat([df, nueva_fila])
-                    guardar_csv(df_modificado, archivo)
+                    try:
+                        valores = convertir_valores(esquema_de(archivo), valores)
+                    except ValueError as e:
+                        st.error(f"Valor inválido: {e}")
+                        st.stop()
+                    try:
+                        # Se valida antes de reservar el id para no gastarlo en un alta rechazada
+                        verificar_integridad(archivo, "insert", None, valores)
+                        nuevo_id = reservar_id(RUTA_SECUENCIAS, tabla, df)
+                        registrar_cambio(archivo, "insert", nuevo_id, valores, usar_mod)
+                    except ErrorIntegridad as e:
+                        st.error(f"No se puede agregar la fila: {e}")
+                        st.stop()
                     st.success("✅ Fila agregada exitosamente")
                     st.rerun()
     else:
@@ -261,15 +707,22 @@ elif menu == "✏️ Editar Fila":
         if existe_modificado(archivo):
             usar_mod = st.checkbox("Usar versión modificada")
         
-        df = cargar_csv(archivo, usar_mod)
+        df = cargar_tabla(archivo, usar_mod)
         
         if df is not None:
             st.write("Datos actuales:")
-            st.dataframe(df, use_container_width=True)
+            mostrar_tabla(df, "editar", lambda: indice_tabla(archivo, usar_mod))
             
             # Seleccionar por ID (índice)
-            ids_disponibles = df.index.tolist()
-            id_seleccionado = st.selectbox("Seleccione el ID a editar", ids_disponibles)
+            id_seleccionado = seleccionar_id(df, "Seleccione el ID a editar", "id_editar")
+            if id_seleccionado is None:
+                st.stop()
+            fila_actual = fila_por_id(df, id_seleccionado).iloc[0]
+            prefijo = f"edit_{archivo}_{id_seleccionado}_"
+            sello = sello_mostrado(f"{prefijo}sello_{usar_mod}", df, id_seleccionado)
+            
+            if "conflicto" in st.session_state:
+                st.error(st.session_state.pop("conflicto"))
             
             with st.form("editar_fila"):
                 st.write(f"Editando registro con ID: {id_seleccionado}")
@@ -278,17 +731,31 @@ elif menu == "✏️ Editar Fila":
                 # Mostrar ID (no editable)
                 st.text_input(f"{df.index.name or 'ID'} (no editable)", value=str(id_seleccionado), disabled=True)
                 
+                esquema = esquema_de(archivo) or {}
                 for col in df.columns:
-                    valor_actual = df.loc[id_seleccionado, col]
-                    valores_nuevos[col] = st.text_input(f"{col}", value=str(valor_actual), key=f"edit_{col}")
+                    valor_actual = fila_actual[col]
+                    texto_actual = "" if pd.isna(valor_actual) else str(valor_actual)
+                    valores_nuevos[col] = st.text_input(f"{col}", value=texto_actual, help=esquema.get(col),
+                                                        key=f"edit_{archivo}_{id_seleccionado}_{col}")
                 
                 submitted = st.form_submit_button("Guardar Cambios")
                 
                 if submitted:
-                    for col, val in valores_nuevos.items():
-                        df.loc[id_seleccionado, col] = val
-                    guardar_csv(df, archivo)
-                    st.success("✅ Fila modificada exitosamente")
+                    try:
+                        valores_nuevos = convertir_valores(esquema_de(archivo), valores_nuevos)
+                    except ValueError as e:
+                        st.error(f"Valor inválido: {e}")
+                        st.stop()
+                    try:
+                        registrar_cambio(archivo, "update", id_seleccionado, valores_nuevos, usar_mod, sello)
+                    except ConflictoVersion as e:
+                        st.session_state["conflicto"] = f"⚠️ {e}. Se cargaron los valores actuales: revíselos y vuelva a guardar."
+                    except ErrorIntegridad as e:
+                        st.error(f"No se pueden guardar los cambios: {e}")
+                        st.stop()
+                    else:
+                        st.success("✅ Fila modificada exitosamente")
+                    descartar_formulario(prefijo)
                     st.rerun()
     else:
         st.warning("No hay archivos disponibles")
@@ -305,27 +772,147 @@ elif menu == "🗑️ Eliminar Fila":
     if archivos_mod:
         archivo = st.selectbox("Seleccione archivo (solo modificados)", archivos_mod)
         
-        df = cargar_csv(archivo, usar_modificado=True)
+        df = cargar_tabla(archivo, usar_modificado=True)
         
         if df is not None:
             st.write("Datos actuales:")
-            st.dataframe(df, use_container_width=True)
+            mostrar_tabla(df, "eliminar", lambda: indice_tabla(archivo, usar_modificado=True))
             
             # Seleccionar por ID
-            ids_disponibles = df.index.tolist()
-            id_eliminar = st.selectbox("Seleccione el ID a eliminar", ids_disponibles)
+            id_eliminar = seleccionar_id(df, "Seleccione el ID a eliminar", "id_eliminar")
+            if id_eliminar is None:
+                st.stop()
+            
+            prefijo = f"eliminar_{archivo}_{id_eliminar}_"
+            sello = sello_mostrado(f"{prefijo}sello", df, id_eliminar)
             
-            st.warning(f"⚠️ Se eliminará el registro con ID: {id_eliminar}")
-            st.dataframe(df.loc[[id_eliminar]], use_container_width=True)
+            if "conflicto" in st.session_state:
+                st.error(st.session_state.pop("conflicto"))
+            # Una fila referenciada por otra tabla no se puede eliminar
+            try:
+                verificar_integridad(archivo, "delete", id_eliminar)
+                referenciada = None
+            except ErrorIntegridad as e:
+                referenciada = str(e)
             
-            if st.button("Confirmar Eliminación", type="primary"):
-                df = df.drop(id_eliminar)
-                guardar_csv(df, archivo)
-                st.success("✅ Fila eliminada exitosamente")
+            if referenciada:
+                st.error(f"🔗 No se puede eliminar: {referenciada}")
+            else:
+                st.warning(f"⚠️ Se eliminará el registro con ID: {id_eliminar}")
+            st.dataframe(fila_por_id(df, id_eliminar), use_container_width=True)
+            
+            if st.button("Confirmar Eliminación", type="primary", disabled=referenciada is not None):
+                try:
+                    registrar_cambio(archivo, "delete", id_eliminar, sello=sello)
+                except ConflictoVersion as e:
+                    st.session_state["conflicto"] = f"⚠️ {e}. Revise el registro actual antes de eliminarlo."
+                except ErrorIntegridad as e:
+                    st.session_state["conflicto"] = f"🔗 {e}"
+                else:
+                    st.success("✅ Fila eliminada exitosamente")
+                descartar_formulario(prefijo)
                 st.rerun()
     else:
         st.warning("No hay archivos modificados disponibles")
 
+# ==================== CARGA MASIVA ====================
+elif menu == "📥 Carga Masiva":
+    st.header("Carga Masiva")
+    
+    archivos = obtener_archivos_csv(CARPETA_BASE)
+    
+    if archivos:
+        archivo = st.selectbox("Seleccione archivo", archivos)
+        df = cargar_tabla(archivo, usar_modificado=True)
+        st.caption("Los cambios se aplican sobre la versión modificada y se guardan juntos, "
+                   "como una sola versión en el historial. Si el lote tiene errores no se aplica nada.")
+        
+        origen = st.radio("Origen de los cambios", ["Archivo CSV/JSON", "Grilla editable"], horizontal=True)
+        # Al guardar avanza el contador: el archivo subido y la grilla vuelven a empezar
+        version_carga = st.session_state.setdefault("version_carga", 0)
+        if "carga_aplicada" in st.session_state:
+            st.success(st.session_state.pop("carga_aplicada"))
+        
+        if origen == "Archivo CSV/JSON":
+            st.markdown(f"- Filas con un `{df.index.name or 'ID'}` existente: corrigen esa fila (una celda vacía no cambia el valor)\n"
+                        f"- Filas con un ID nuevo se agregan con ese ID; sin ID, se les asigna uno de la secuencia")
+            subido = st.file_uploader("Archivo con las filas", type=["csv", "json", "jsonl"],
+                                      key=f"lote_{version_carga}")
+            
+            if subido is not None:
+                try:
+                    lote = leer_lote(subido, subido.name)
+                except ValueError as e:
+                    st.error(f"No se pudo leer el archivo: {e}")
+                    st.stop()
+                lote, errores = validar_lote(df, lote)
+                if not errores:
+                    altas, altas_sin_id, correcciones, mascara = separar_lote(df, lote)
+                    errores = verificar_lote(archivo.replace('.csv', ''), [altas, altas_sin_id, correcciones],
+                                             None, cargar_relacionada, referencias_tabla)
+                if errores:
+                    st.error("El lote tiene errores y no se aplicó:\n\n" + "\n".join(f"- {e}" for e in errores))
+                    st.stop()
+                
+                col1, col2, col3 = st.columns(3)
+                col1.metric("Filas nuevas", len(altas) + len(altas_sin_id))
+                col2.metric("Filas corregidas", len(correcciones))
+                col3.metric("Celdas a cambiar", int(mascara.to_numpy().sum()))
+                st.write("Vista previa del lote:")
+                st.dataframe(lote.head(FILAS_POR_PAGINA), use_container_width=True)
+                
+                if st.button("Confirmar carga", type="primary"):
+                    try:
+                        cargar_lote(archivo, altas, altas_sin_id, correcciones, mascara)
+                    except ValueError as e:
+                        st.error(f"El lote no se aplicó: {e}")
+                        st.stop()
+                    st.session_state["carga_aplicada"] = (f"✅ Lote aplicado: {len(altas) + len(altas_sin_id)} "
+                                                          f"filas nuevas y {len(correcciones)} filas corregidas")
+                    st.session_state["version_carga"] += 1
+                    st.rerun()
+        
+        else:  # Grilla editable
+            st.caption(f"Se editan hasta {MAX_FILAS_GRILLA} filas por vez; se pueden agregar filas al final "
+                       "(el ID se asigna solo) y borrar filas seleccionándolas")
+            texto = st.text_input("Filtrar filas (contiene)")
+            indice = indice_tabla(archivo, usar_modificado=True) if texto else None
+            posiciones = posiciones_visibles(df, texto=texto, indice=indice)
+            tandas = max((len(posiciones) - 1) // MAX_FILAS_GRILLA + 1, 1)
+            tanda = st.number_input("Tanda", min_value=1, max_value=tandas, value=1) if tandas > 1 else 1
+            desde = (tanda - 1) * MAX_FILAS_GRILLA
+            original = df.iloc[posiciones[desde:desde + MAX_FILAS_GRILLA]]
+            
+            nombre_id = df.index.name or "index"
+            editado = st.data_editor(original.reset_index(names=nombre_id), num_rows="dynamic", hide_index=True,
+                                     disabled=[nombre_id], use_container_width=True,
+                                     key=f"grilla_{archivo}_{texto}_{tanda}_{version_carga}")
+            editado = editado.set_index(nombre_id)
+            altas_sin_id, correcciones, mascara, bajas = cambios_grilla(original, editado)
+            errores = verificar_lote(archivo.replace('.csv', ''), [altas_sin_id, correcciones], bajas,
+                                     cargar_relacionada, referencias_tabla)
+            if errores:
+                st.error("Los cambios rompen relaciones entre tablas:\n\n" + "\n".join(f"- {e}" for e in errores))
+            
+            col1, col2, col3 = st.columns(3)
+            col1.metric("Filas nuevas", len(altas_sin_id))
+            col2.metric("Filas modificadas", len(correcciones))
+            col3.metric("Filas eliminadas", len(bajas))
+            
+            hay_cambios = len(altas_sin_id) or len(correcciones) or len(bajas)
+            if st.button("Guardar cambios", type="primary", disabled=not hay_cambios or bool(errores)):
+                try:
+                    cargar_lote(archivo, altas_sin_id=altas_sin_id, correcciones=correcciones, mascara=mascara, bajas=bajas)
+                except ValueError as e:
+                    st.error(f"Los cambios no se guardaron: {e}")
+                    st.stop()
+                st.session_state["carga_aplicada"] = (f"✅ Cambios guardados: {len(altas_sin_id)} filas nuevas, "
+                                                      f"{len(correcciones)} modificadas y {len(bajas)} eliminadas")
+                st.session_state["version_carga"] += 1
+                st.rerun()
+    else:
+        st.warning("No hay archivos disponibles")
+
 # ==================== BUSCAR ====================
 elif menu == "🔍 Buscar":
     st.header("Buscar en CSV")
@@ -339,7 +926,7 @@ elif menu == "🔍 Buscar":
         if existe_modificado(archivo):
             usar_mod = st.checkbox("Buscar en versión modificada")
         
-        df = cargar_csv(archivo, usar_mod)
+        df = cargar_tabla(archivo, usar_mod)
         
         if df is not None:
             tipo_busqueda = st.radio("Tipo de búsqueda", ["Por ID", "Por columna", "Texto libre"])
@@ -348,13 +935,14 @@ elif menu == "🔍 Buscar":
                 id_buscar = st.text_input("ID a buscar")
                 if st.button("Buscar") and id_buscar:
                     try:
-                        # Convertir a tipo apropiado
-                        if df.index.dtype == 'int64':
-                            id_buscar = int(id_buscar)
-                        resultado = df.loc[[id_buscar]]
+                        # Convertir al tipo del índice
+                        resultado = fila_por_id(df, convertir_id(df.index, id_buscar))
+                    except ValueError:
+                        resultado = None
+                    if resultado is not None:
                         st.success("Encontrado:")
                         st.dataframe(resultado, use_container_width=True)
-                    except:
+                    else:
                         st.warning("No se encontró el ID")
             
             elif tipo_busqueda == "Por columna":
@@ -362,22 +950,29 @@ elif menu == "🔍 Buscar":
                 col_seleccionada = st.selectbox("Seleccione columna", columnas_disponibles)
                 texto = st.text_input("Texto a buscar")
                 if st.button("Buscar") and texto:
-                    resultado = df[df[col_seleccionada].astype(str).str.contains(texto, case=False, na=False)]
-                    if not resultado.empty:
-                        st.success(f"Encontrados {len(resultado)} resultados:")
-                        st.dataframe(resultado, use_container_width=True)
-                    else:
-                        st.warning("No se encontraron coincidencias")
+                    ids = buscar(indice_tabla(archivo, usar_mod), texto, [col_seleccionada])
+                    st.session_state["busqueda"] = (archivo, usar_mod, ids)
             
             else:  # Texto libre
                 texto = st.text_input("Buscar en todo el archivo")
                 if st.button("Buscar") and texto:
-                    resultado = df[df.apply(lambda row: row.astype(str).str.contains(texto, case=False, na=False).any(), axis=1)]
-                    if not resultado.empty:
-                        st.success(f"Encontrados {len(resultado)} resultados:")
-                        st.dataframe(resultado, use_container_width=True)
-                    else:
-                        st.warning("No se encontraron coincidencias")
+                    ids = buscar(indice_tabla(archivo, usar_mod), texto)
+                    st.session_state["busqueda"] = (archivo, usar_mod, ids)
+            
+            # Resultados de la última búsqueda, paginados por id
+            busqueda = st.session_state.get("busqueda")
+            if tipo_busqueda != "Por ID" and busqueda and busqueda[:2] == (archivo, usar_mod):
+                ids = busqueda[2]
+                if ids:
+                    st.success(f"Encontrados {len(ids)} resultados:")
+                    paginas = (len(ids) - 1) // FILAS_POR_PAGINA + 1
+                    pagina = st.number_input("Página", min_value=1, max_value=paginas, value=1) if paginas > 1 else 1
+                    ids_pagina = ids[(pagina - 1) * FILAS_POR_PAGINA:pagina * FILAS_POR_PAGINA]
+                    st.dataframe(df.loc[ids_pagina], use_container_width=True)
+                    if paginas > 1:
+                        st.caption(f"Página {pagina} de {paginas}")
+                else:
+                    st.warning("No se encontraron coincidencias")
     else:
         st.warning("No hay archivos disponibles")
 
@@ -385,26 +980,41 @@ elif menu == "🔍 Buscar":
 elif menu == "🔄 Convertir CSV/JSON":
     st.header("Conversión de Archivos")
     
-    tipo_conv = st.radio("Tipo de conversión", ["CSV → JSON", "JSON → CSV"])
+    tipo_conv = st.radio("Tipo de conversión", ["CSV → JSON", "JSON → CSV", "Tabla Modificada → CSV"])
     
     if tipo_conv == "CSV → JSON":
         archivos = obtener_archivos_csv(CARPETA_BASE)
         if archivos:
             archivo = st.selectbox("Seleccione CSV", archivos)
             usar_mod = st.checkbox("Usar versión modificada")
+            formato = st.radio("Formato de salida", ["JSON", "JSON Lines"], horizontal=True)
             
             if st.button("Convertir a JSON"):
-                ruta_json = csv_a_json(archivo, usar_mod)
+                ruta_json = csv_a_json(archivo, usar_mod, "jsonl" if formato == "JSON Lines" else "json")
                 if ruta_json:
                     st.success(f"✅ Convertido: {ruta_json}")
                 else:
                     st.error("Error en la conversión")
     
+    elif tipo_conv == "Tabla Modificada → CSV":
+        archivos_mod = [a for a in obtener_archivos_csv(CARPETA_BASE) if existe_modificado(a)]
+        if archivos_mod:
+            archivo = st.selectbox("Seleccione tabla", archivos_mod)
+            
+            if st.button("Exportar a CSV"):
+                ruta_csv = tabla_a_csv(archivo)
+                if ruta_csv:
+                    st.success(f"✅ Exportado: {ruta_csv}")
+                else:
+                    st.error("Error en la exportación")
+        else:
+            st.warning("No hay tablas modificadas para exportar")
+    
     else:  # JSON → CSV
         archivos_json = []
         for carpeta in [CARPETA_BASE, CARPETA_MODIFICADA]:
             if os.path.exists(carpeta):
-                archivos_json.extend([os.path.join(carpeta, f) for f in os.listdir(carpeta) if f.endswith('.json')])
+                archivos_json.extend([os.path.join(carpeta, f) for f in obtener_archivos_json(carpeta)])
         
         if archivos_json:
             archivo_json = st.selectbox("Seleccione JSON", archivos_json)
@@ -420,7 +1030,7 @@ elif menu == "🔄 Convertir CSV/JSON":
 
 # ==================== COMPARAR ====================
 elif menu == "📊 Comparar Versiones":
-    st.header("Comparar Original vs Modificado")
+    st.header("Comparar Versiones")
     
     archivos_mod = []
     for arch in obtener_archivos_csv(CARPETA_BASE):
@@ -430,42 +1040,55 @@ elif menu == "📊 Comparar Versiones":
     if archivos_mod:
         archivo = st.selectbox("Seleccione archivo", archivos_mod)
         
+        versiones = versiones_disponibles(archivo)
+        etiquetas = list(versiones)
+        col_v1, col_v2 = st.columns(2)
+        with col_v1:
+            etiqueta_a = st.selectbox("Versión A", etiquetas, index=0)
+        with col_v2:
+            etiqueta_b = st.selectbox("Versión B", etiquetas, index=len(etiquetas) - 1)
+        
         if st.button("Comparar"):
-            df_original = cargar_csv(archivo, usar_modificado=False)
-            df_modificado = cargar_csv(archivo, usar_modificado=True)
+            st.session_state["comparar"] = (archivo, etiqueta_a, etiqueta_b)
+        
+        # La comparación se sigue mostrando al cambiar de página, orden o filtro
+        if st.session_state.get("comparar") == (archivo, etiqueta_a, etiqueta_b):
+            df_original = cargar_version_tabla(archivo, versiones[etiqueta_a])
+            df_modificado = cargar_version_tabla(archivo, versiones[etiqueta_b])
             
             if df_original is not None and df_modificado is not None:
-                col1, col2 = st.columns(2)
-                
-                with col1:
-                    st.subheader("Original")
-                    st.dataframe(df_original, use_container_width=True)
-                    st.info(f"Filas: {len(df_original)}")
-                
-                with col2:
-                    st.subheader("Modificado")
-                    st.dataframe(df_modificado, use_container_width=True)
-                    st.info(f"Filas: {len(df_modificado)}")
+                diferencia = diferencia_versiones(archivo, versiones[etiqueta_a], versiones[etiqueta_b])
+                celdas = cambios_por_columna(diferencia)
                 
                 # Análisis de diferencias
                 st.markdown("### Análisis de cambios")
+                col_a, col_b, col_c, col_d = st.columns(4)
+                col_a.metric("Filas añadidas", len(diferencia["altas"]))
+                col_b.metric("Filas eliminadas", len(diferencia["bajas"]))
+                col_c.metric("Filas modificadas", len(diferencia["modificadas"]))
+                col_d.metric("Celdas cambiadas", int(celdas.sum()))
                 
-                ids_orig = set(df_original.index)
-                ids_mod = set(df_modificado.index)
-                
-                nuevas = ids_mod - ids_orig
-                eliminadas = ids_orig - ids_mod
+                if diferencia["columnas_agregadas"] or diferencia["columnas_quitadas"]:
+                    st.info(f"Columnas agregadas: {', '.join(map(str, diferencia['columnas_agregadas'])) or '-'} | "
+                            f"Columnas quitadas: {', '.join(map(str, diferencia['columnas_quitadas'])) or '-'}")
+                if celdas.sum() > 0:
+                    st.write("Celdas cambiadas por columna:")
+                    st.dataframe(celdas[celdas > 0].rename("celdas").to_frame().T, use_container_width=True)
                 
-                col_a, col_b = st.columns(2)
-                
-                with col_a:
-                    st.metric("Filas añadidas", len(nuevas))
-                    if nuevas:
-                        st.write(sorted(nuevas))
-                
-                with col_b:
-                    st.metric("Filas eliminadas", len(eliminadas))
-                    if eliminadas:
-                        st.write(sorted(eliminadas))
+                tab_mod, tab_altas, tab_bajas, tab_a, tab_b = st.tabs(
+                    ["✏️ Modificadas", "➕ Añadidas", "➖ Eliminadas", etiqueta_a, etiqueta_b])
+                with tab_mod:
+                    st.caption(f"Filas en {etiqueta_b}, con las celdas cambiadas resaltadas")
+                    mostrar_tabla(diferencia["filas_modificadas"], "comparar_mod", resaltar=diferencia["mascara"])
+                with tab_altas:
+                    mostrar_tabla(diferencia["filas_altas"], "comparar_altas")
+                with tab_bajas:
+                    mostrar_tabla(diferencia["filas_bajas"], "comparar_bajas")
+                with tab_a:
+                    mostrar_tabla(df_original, "comparar_a")
+                    st.info(f"Filas: {len(df_original)}")
+                with tab_b:
+                    mostrar_tabla(df_modificado, "comparar_b")
+                    st.info(f"Filas: {len(df_modificado)}")
     else:
         st.warning("No hay archivos modificados para comparar")
\ No newline at end of file
@@ -0,0 +1,175 @@
+"""Bitácora de operaciones por tabla.
+
+Agregar, editar o eliminar una fila no reescribe la tabla: se agrega una línea JSON
+a la bitácora de esa tabla (`insert`, `update` o `delete` con el id de la fila).
+La tabla vigente es la versión base más las operaciones pendientes, y la
+compactación cada tanto vuelca la bitácora sobre la base y la vacía.
+"""
+import json
+import os
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from esquemas import asignar, concatenar
+
+OPERACIONES = ("insert", "update", "delete")
+
+# Cantidad de operaciones pendientes a partir de la cual conviene compactar
+UMBRAL_COMPACTACION = 500
+
+# Ruta -> (inodo, tamaño, operaciones) de cada bitácora al contarla por última vez
+_conteos = {}
+
+
+def _a_json(valor):
+    """Convierte escalares de numpy/pandas a tipos nativos para poder serializarlos"""
+    if hasattr(valor, "item"):
+        return valor.item()
+    if isinstance(valor, (pd.Timestamp, datetime)):
+        return valor.isoformat()
+    return str(valor)
+
+def _limpiar(valores):
+    return {col: (None if pd.isna(val) else val) if pd.api.types.is_scalar(val) else val
+            for col, val in valores.items()}
+
+def operacion(op, id_fila, valores=None):
+    """Arma una entrada de bitácora"""
+    if op not in OPERACIONES:
+        raise ValueError(f"Operación desconocida: {op}")
+    entrada = {"op": op, "id": id_fila, "ts": datetime.now().isoformat(timespec="seconds")}
+    if op != "delete":
+        entrada["valores"] = _limpiar(valores or {})
+    return entrada
+
+def _cortar_linea_incompleta(f, tamano):
+    """Descarta una última línea sin salto (corte a mitad de escritura) y retorna el
+    tamaño resultante, para que la próxima operación no quede pegada a ella"""
+    if tamano == 0:
+        return 0
+    f.seek(tamano - 1)
+    if f.read(1) == b"\n":
+        return tamano
+    fin = tamano
+    while fin > 0:
+        inicio = max(0, fin - (1 << 16))
+        f.seek(inicio)
+        salto = f.read(fin - inicio).rfind(b"\n")
+        if salto >= 0:
+            fin = inicio + salto + 1
+            break
+        fin = inicio
+    f.truncate(fin)
+    return fin
+
+def registrar(ruta, entrada):
+    """Agrega una operación (armada con `operacion`) al final de la bitácora y retorna
+    cuántas hay pendientes.
+
+    Quien registra tiene el bloqueo de la tabla, así que una línea incompleta al final
+    es de una escritura que se cortó y se descarta antes de agregar.
+    """
+    linea = (json.dumps(entrada, ensure_ascii=False, default=_a_json) + "\n").encode("utf-8")
+    with open(ruta, "a+b") as f:
+        antes = os.fstat(f.fileno())
+        tamano = _cortar_linea_incompleta(f, antes.st_size)
+        f.write(linea)
+    # Si la bitácora es la que se contó por última vez se suma uno sin volver a leerla
+    # (la línea descartada no tenía salto, así que no estaba en el conteo)
+    conteo = _conteos.get(ruta)
+    if conteo is not None and conteo[:2] == (antes.st_ino, antes.st_size):
+        pendientes = conteo[2] + 1
+        _conteos[ruta] = (antes.st_ino, tamano + len(linea), pendientes)
+        return pendientes
+    return contar_operaciones(ruta)
+
+def contar_operaciones(ruta):
+    """Cantidad de operaciones pendientes en la bitácora.
+
+    El conteo se guarda con el inodo y el tamaño del archivo: solo se vuelve a leer
+    si la bitácora cambió por otro lado (compactación, otro proceso).
+    """
+    try:
+        estado = os.stat(ruta)
+    except FileNotFoundError:
+        _conteos.pop(ruta, None)
+        return 0
+    conteo = _conteos.get(ruta)
+    if conteo is not None and conteo[:2] == (estado.st_ino, estado.st_size):
+        return conteo[2]
+    operaciones = 0
+    with open(ruta, "rb") as f:
+        for bloque in iter(lambda: f.read(1 << 20), b""):
+            operaciones += bloque.count(b"\n")
+        tamano = f.tell()
+    _conteos[ruta] = (estado.st_ino, tamano, operaciones)
+    return operaciones
+
+def leer_operaciones(ruta):
+    """Lee las operaciones pendientes en el orden en que se registraron"""
+    if not os.path.exists(ruta):
+        return []
+    with open(ruta, "r", encoding="utf-8") as f:
+        # Una última línea incompleta (corte a mitad de escritura) se descarta
+        return [json.loads(linea) for linea in f if linea.endswith("\n")]
+
+def resumir_operaciones(operaciones):
+    """Reduce la secuencia de operaciones al estado final de cada id.
+
+    Retorna (cambios, eliminados): `cambios` mapea id -> (es_alta, valores) y
+    `eliminados` es el conjunto de ids borrados. Operaciones sucesivas sobre el
+    mismo id se combinan, la última gana.
+    """
+    cambios = {}
+    eliminados = set()
+    for entrada in operaciones:
+        id_fila = entrada["id"]
+        if entrada["op"] == "delete":
+            cambios.pop(id_fila, None)
+            eliminados.add(id_fila)
+        elif entrada["op"] == "insert" or id_fila in eliminados:
+            eliminados.discard(id_fila)
+            cambios[id_fila] = (True, dict(entrada["valores"]))
+        else:
+            es_alta, valores = cambios.get(id_fila, (False, {}))
+            valores.update(entrada["valores"])
+            cambios[id_fila] = (es_alta, valores)
+    return cambios, eliminados
+
+def aplicar_operaciones(df, operaciones):
+    """Retorna una copia de la tabla con las operaciones aplicadas"""
+    if not operaciones:
+        return df
+    cambios, eliminados = resumir_operaciones(operaciones)
+
+    resultado = df.drop(index=[i for i in eliminados if i in df.index])
+
+    existentes = {i: v for i, (alta, v) in cambios.items() if i in resultado.index and not alta}
+    # Un alta sobre un id existente reemplaza la fila completa
+    reemplazos = {i: v for i, (alta, v) in cambios.items() if i in resultado.index and alta}
+    nuevas = {i: v for i, (alta, v) in cambios.items() if i not in resultado.index}
+
+    if reemplazos:
+        resultado = resultado.drop(index=list(reemplazos))
+        nuevas = {**reemplazos, **nuevas}
+
+    # Las ediciones se aplican por columna, solo sobre los ids que la modificaron
+    for col in resultado.columns:
+        valores_col = {i: v[col] for i, v in existentes.items() if col in v}
+        if valores_col:
+            posiciones = np.flatnonzero(resultado.index.isin(list(valores_col)))
+            valores = [valores_col[i] for i in resultado.index[posiciones]]
+            resultado[col] = asignar(resultado[col], posiciones, valores)
+
+    if nuevas:
+        filas = pd.DataFrame.from_dict(nuevas, orient="index")
+        resultado = concatenar(resultado, filas)
+    return resultado
+
+def vaciar(ruta):
+    """Elimina la bitácora (después de volcarla sobre la base)"""
+    _conteos.pop(ruta, None)
+    if os.path.exists(ruta):
+        os.remove(ruta)
@@ -0,0 +1,123 @@
+"""Caché de tablas y listados de carpetas compartido por todo el proceso.
+
+Streamlit vuelve a ejecutar `app.py` en cada interacción, pero los módulos importados
+se conservan: este caché vive mientras viva el servidor y lo comparten todas las
+sesiones. Cada entrada se identifica por un nombre y se valida con la firma
+(mtime y tamaño) de los archivos de los que depende; si alguno cambió, se vuelve a
+cargar. Las entradas menos usadas se descartan al superar `MEMORIA_MAXIMA`.
+
+Los DataFrames que devuelve el caché son compartidos: no se deben modificar en el
+lugar (usar `.copy()` o métodos que devuelven una tabla nueva).
+"""
+import os
+import sys
+import threading
+from collections import OrderedDict
+
+import pandas as pd
+
+# Memoria máxima (aproximada) que pueden ocupar las entradas del caché
+MEMORIA_MAXIMA = int(os.environ.get("GESTOR_CACHE_MB", "512")) * 1024 * 1024
+
+_entradas = OrderedDict()  # nombre -> (firma, valor, bytes)
+_listados = {}  # carpeta -> (mtime_ns, entradas)
+_memoria_usada = 0
+_lock = threading.RLock()
+
+
+def firma(ruta):
+    """(mtime_ns, tamaño) del archivo, o None si no existe"""
+    try:
+        info = os.stat(ruta)
+    except FileNotFoundError:
+        return None
+    return (info.st_mtime_ns, info.st_size)
+
+def clave(rutas):
+    """Clave de validez de una entrada: la firma de cada archivo del que depende"""
+    return tuple((r, firma(r)) for r in rutas)
+
+def _tamano(valor):
+    if isinstance(valor, pd.DataFrame):
+        return int(valor.memory_usage(index=True, deep=True).sum())
+    return sys.getsizeof(valor)
+
+def _liberar():
+    global _memoria_usada
+    # Siempre se conserva la entrada recién usada, aunque sola supere el límite
+    while _memoria_usada > MEMORIA_MAXIMA and len(_entradas) > 1:
+        _, (_, _, tamano) = _entradas.popitem(last=False)
+        _memoria_usada -= tamano
+
+def _guardar(nombre, clave_actual, valor, tamano):
+    global _memoria_usada
+    with _lock:
+        if nombre in _entradas:
+            _memoria_usada -= _entradas.pop(nombre)[2]
+        _entradas[nombre] = (clave_actual, valor, tamano)
+        _memoria_usada += tamano
+        _liberar()
+
+def obtener(nombre, rutas, cargar, tamano=_tamano):
+    """Retorna el valor cacheado de `nombre`, o lo carga con `cargar()` si alguna de
+    las rutas de las que depende cambió (o apareció, o se eliminó).
+
+    `tamano` estima los bytes que ocupa el valor (por defecto, DataFrames y objetos simples).
+    """
+    clave_actual = clave(rutas)
+    with _lock:
+        if nombre in _entradas and _entradas[nombre][0] == clave_actual:
+            _entradas.move_to_end(nombre)
+            return _entradas[nombre][1]
+
+    valor = cargar()
+    _guardar(nombre, clave_actual, valor, tamano(valor))
+    return valor
+
+def actualizar(nombre, clave_anterior, rutas, funcion, tamano=_tamano):
+    """Actualiza una entrada después de un cambio hecho por este mismo proceso.
+
+    Si la entrada estaba vigente para `clave_anterior` (la clave de las rutas antes del
+    cambio), se reemplaza por `funcion(valor)` y queda asociada a las firmas actuales de
+    `rutas`, así no hace falta volver a cargarla. Si no estaba vigente no se hace nada.
+    """
+    with _lock:
+        if nombre not in _entradas or _entradas[nombre][0] != clave_anterior:
+            return False
+        valor = funcion(_entradas[nombre][1])
+        _guardar(nombre, clave(rutas), valor, tamano(valor))
+    return True
+
+def listar_carpeta(carpeta):
+    """Contenido de la carpeta; se vuelve a leer solo si cambió su mtime"""
+    try:
+        mtime = os.stat(carpeta).st_mtime_ns
+    except FileNotFoundError:
+        return []
+    with _lock:
+        if carpeta in _listados and _listados[carpeta][0] == mtime:
+            return _listados[carpeta][1]
+    entradas = sorted(os.listdir(carpeta))
+    with _lock:
+        _listados[carpeta] = (mtime, entradas)
+    return entradas
+
+def existe(carpeta, archivo):
+    """Verifica si el archivo está en la carpeta usando el listado cacheado"""
+    return archivo in listar_carpeta(carpeta)
+
+def invalidar(nombre=None):
+    """Descarta una entrada (o todo el caché si no se indica nombre)"""
+    global _memoria_usada
+    with _lock:
+        if nombre is None:
+            _entradas.clear()
+            _listados.clear()
+            _memoria_usada = 0
+        elif nombre in _entradas:
+            _memoria_usada -= _entradas.pop(nombre)[2]
+
+def estadisticas():
+    """Cantidad de entradas y memoria ocupada, para mostrar en la interfaz"""
+    with _lock:
+        return {"entradas": len(_entradas), "memoria_mb": _memoria_usada / 1024 / 1024}
@@ -0,0 +1,161 @@
+"""Carga masiva: muchas altas y correcciones en una sola operación.
+
+Un lote (un archivo CSV/JSON subido o una grilla editada) se valida entero contra
+las columnas y los tipos de la tabla antes de tocar nada. Si tiene errores no se
+aplica ninguna fila; si es válido se aplica con operaciones vectorizadas y la tabla
+se guarda una sola vez, como una única versión en el historial.
+
+Reglas de un archivo:
+
+- Filas con un id que ya existe: corrigen esa fila. Solo cambian las columnas que
+  trae el archivo, y una celda vacía deja el valor como estaba.
+- Filas con un id que no existe: se agregan con ese id.
+- Filas sin id (o archivos sin la columna del id): se agregan con ids nuevos
+  tomados de la secuencia de la tabla.
+
+En la grilla las celdas vaciadas sí se guardan como vacías, y las filas borradas
+de la grilla se eliminan de la tabla.
+"""
+import os
+
+import numpy as np
+import pandas as pd
+
+from diferencias import comparar
+from esquemas import asignar, concatenar
+
+# Cantidad máxima de errores que se informan de un lote
+MAX_ERRORES = 20
+
+FORMATOS_LOTE = (".csv", ".json", ".jsonl")
+
+
+def leer_lote(archivo, nombre):
+    """Lee un lote subido como DataFrame sin índice; los valores quedan sin convertir
+    para que la validación los lleve al tipo de cada columna"""
+    extension = os.path.splitext(nombre)[1].lower()
+    if extension == ".csv":
+        return pd.read_csv(archivo, dtype=str, skipinitialspace=True)
+    if extension in (".json", ".jsonl"):
+        return pd.read_json(archivo, lines=extension == ".jsonl", dtype=False, convert_dates=False)
+    raise ValueError(f"Formato de lote no soportado: {extension}")
+
+def _convertir(serie, dtype):
+    """Convierte una columna del lote al tipo de la tabla; retorna (serie, máscara de inválidos)"""
+    if pd.api.types.is_bool_dtype(dtype):
+        texto = serie.astype(str).str.strip().str.lower()
+        convertida = texto.map({"true": True, "false": False, "1": True, "0": False})
+    elif pd.api.types.is_numeric_dtype(dtype):
+        convertida = pd.to_numeric(serie, errors="coerce")
+        if pd.api.types.is_integer_dtype(dtype):
+            # En columnas enteras un decimal o un número fuera de rango es inválido
+            limites = np.iinfo(str(dtype).lower())
+            fuera = (convertida != convertida.round()) | (convertida < limites.min) | (convertida > limites.max)
+            convertida = convertida.mask(fuera)
+    elif pd.api.types.is_datetime64_any_dtype(dtype):
+        convertida = pd.to_datetime(serie, errors="coerce")
+    else:
+        convertida = serie.where(serie.isna(), serie.astype(str))
+    return convertida, serie.notna() & convertida.isna()
+
+def validar_lote(df, lote):
+    """Valida el lote contra la tabla y lo convierte a sus tipos.
+
+    Retorna (lote con los ids como índice, lista de errores). Los ids faltantes quedan
+    como vacíos en el índice.
+    """
+    errores = []
+    nombre_id = df.index.name
+    lote = lote.copy()
+    lote.columns = [str(c).strip() for c in lote.columns]
+
+    desconocidas = [c for c in lote.columns if c != nombre_id and c not in df.columns]
+    if desconocidas:
+        errores.append(f"Columnas que no existen en la tabla: {', '.join(desconocidas)}")
+    columnas = [c for c in lote.columns if c in df.columns]
+    if not columnas:
+        errores.append("El lote no tiene ninguna columna de la tabla")
+    if errores:
+        return lote, errores
+
+    def informar(invalidos, mensaje):
+        # Se cuentan todos los errores pero se detallan solo los primeros
+        filas = np.flatnonzero(invalidos.to_numpy())
+        for fila in filas[:max(MAX_ERRORES - len(errores), 0)]:
+            errores.append(mensaje(fila))
+        return len(filas)
+
+    total = 0
+    # Ids: del tipo del índice, sin repetir dentro del lote
+    if nombre_id is not None and nombre_id in lote.columns:
+        ids, invalidos = _convertir(lote[nombre_id], df.index.dtype)
+        total += informar(invalidos, lambda fila: f"Fila {fila + 1}: ID inválido '{lote[nombre_id].iloc[fila]}'")
+        repetidos = ids.notna() & ids.duplicated(keep=False)
+        total += informar(repetidos, lambda fila: f"Fila {fila + 1}: ID {lote[nombre_id].iloc[fila]} repetido en el lote")
+    else:
+        ids = pd.Series(np.nan, index=lote.index)
+
+    convertidas = {}
+    for col in columnas:
+        convertidas[col], invalidos = _convertir(lote[col], df[col].dtype)
+        total += informar(invalidos, lambda fila: f"Fila {fila + 1}: valor '{lote[col].iloc[fila]}' inválido para la columna {col}")
+    if total > len(errores):
+        errores.append(f"... y {total - len(errores)} errores más")
+
+    resultado = pd.DataFrame(convertidas).set_axis(pd.Index(ids.to_numpy(), name=nombre_id))
+    return resultado, errores
+
+def separar_lote(df, lote):
+    """Divide un lote validado en (altas con id, altas sin id, correcciones, máscara).
+
+    La máscara de correcciones marca las celdas que cambian: en un archivo, las que
+    traen valor.
+    """
+    sin_id = lote.index.isna()
+    existentes = ~sin_id & lote.index.isin(df.index)
+    altas = lote.loc[~sin_id & ~existentes]
+    altas_sin_id = lote.loc[sin_id]
+    correcciones = lote.loc[existentes]
+    # Con ids vacíos en el lote el índice queda decimal: se vuelve al tipo de la tabla
+    if pd.api.types.is_integer_dtype(df.index.dtype):
+        altas.index = altas.index.astype(df.index.dtype)
+        correcciones.index = correcciones.index.astype(df.index.dtype)
+    return altas, altas_sin_id, correcciones, correcciones.notna()
+
+def cambios_grilla(original, editado):
+    """Cambios hechos en una grilla: (altas sin id, correcciones, máscara, bajas).
+
+    `original` son las filas que se mostraron (con los ids como índice) y `editado` lo
+    que devolvió la grilla, con el id como índice y vacío en las filas agregadas.
+    """
+    nuevas = editado.index.isna()
+    existentes = editado.loc[~nuevas]
+    # Con filas agregadas la columna de ids vuelve decimal: se lleva al tipo original
+    existentes.index = existentes.index.astype(original.index.dtype)
+    diferencia = comparar(original, existentes)
+    correcciones = existentes.loc[diferencia["modificadas"], list(original.columns)]
+    return editado.loc[nuevas], correcciones, diferencia["mascara"], diferencia["bajas"]
+
+def aplicar_lote(df, altas=None, correcciones=None, mascara=None, bajas=None):
+    """Retorna una copia de la tabla con el lote aplicado.
+
+    `altas` son filas nuevas con su id, `correcciones` filas existentes con los valores
+    nuevos en las celdas que marca `mascara`, y `bajas` ids a eliminar.
+    """
+    resultado = df
+    if bajas is not None and len(bajas):
+        resultado = resultado.drop(index=resultado.index.intersection(bajas))
+    else:
+        resultado = resultado.copy()
+
+    if correcciones is not None and len(correcciones):
+        posiciones = resultado.index.get_indexer(correcciones.index)
+        for col in correcciones.columns:
+            marcadas = mascara[col].to_numpy(dtype=bool) & (posiciones >= 0)
+            if marcadas.any():
+                resultado[col] = asignar(resultado[col], posiciones[marcadas],
+                                         correcciones[col].to_numpy()[marcadas])
+
+    if altas is not None and len(altas):
+        resultado = concatenar(resultado, altas)
+    return resultado
@@ -0,0 +1,128 @@
+"""Claves primarias: búsqueda por id y secuencias de ids persistentes.
+
+La búsqueda y la verificación de existencia usan la tabla hash del índice de pandas
+(`Index.get_loc`), que se arma una sola vez por tabla cargada; como las tablas viven
+en el caché del proceso, cada consulta por id cuesta O(1).
+
+El próximo id de cada tabla se guarda en `secuencias.json`. Se calcula recorriendo la
+tabla solo la primera vez; después se lee del archivo, así que sobrevive a reinicios
+sin volver a escanear. La secuencia es monótona: los ids de filas eliminadas no se
+reutilizan.
+"""
+import hashlib
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from concurrencia import bloqueo, escribir_atomico
+
+
+def convertir_id(indice, texto):
+    """Convierte el texto ingresado al tipo del índice; lanza ValueError si no corresponde"""
+    texto = str(texto).strip()
+    if pd.api.types.is_integer_dtype(indice):
+        return int(texto)
+    if pd.api.types.is_float_dtype(indice):
+        return float(texto)
+    return texto
+
+def posicion_id(df, id_fila):
+    """Posición de la fila con ese id, o None si no existe"""
+    try:
+        posicion = df.index.get_loc(id_fila)
+    except (KeyError, TypeError):
+        return None
+    # Con ids repetidos get_loc no da una posición única: se toma la primera
+    if not isinstance(posicion, int):
+        posicion = int(pd.Series(range(len(df)))[posicion].iloc[0])
+    return posicion
+
+def existe_id(df, id_fila):
+    """Verifica si la tabla tiene una fila con ese id"""
+    return posicion_id(df, id_fila) is not None
+
+def fila_por_id(df, id_fila):
+    """La fila con ese id como tabla de una fila, o None si no existe"""
+    posicion = posicion_id(df, id_fila)
+    return None if posicion is None else df.iloc[[posicion]]
+
+def _normalizar(valor):
+    # Los números se comparan por valor: que una columna pase de int a float al
+    # agregarse una fila con vacíos no cuenta como cambio de las demás filas
+    if valor is None or (pd.api.types.is_scalar(valor) and pd.isna(valor)):
+        return None
+    if isinstance(valor, (int, float, np.number)) and not isinstance(valor, (bool, np.bool_)):
+        return float(valor)
+    return str(valor)
+
+def sello_fila(df, id_fila):
+    """Sello del contenido de la fila con ese id (None si la fila no existe)"""
+    posicion = posicion_id(df, id_fila)
+    if posicion is None:
+        return None
+    fila = [(str(col), _normalizar(valor)) for col, valor in zip(df.columns, df.iloc[posicion].tolist())]
+    return hashlib.sha1(repr(fila).encode("utf-8")).hexdigest()[:16]
+
+def _max_id(indice):
+    ids = pd.to_numeric(pd.Series(indice), errors="coerce").dropna()
+    return int(ids.max()) if len(ids) > 0 else 0
+
+
+# ==================== SECUENCIAS ====================
+
+def leer_secuencias(ruta):
+    """Próximo id de cada tabla"""
+    if not os.path.exists(ruta):
+        return {}
+    with open(ruta, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+def _escribir_secuencias(ruta, secuencias):
+    def escribir(temporal):
+        with open(temporal, "w", encoding="utf-8") as f:
+            json.dump(secuencias, f, ensure_ascii=False, indent=2, sort_keys=True)
+    escribir_atomico(ruta, escribir)
+
+# Las funciones que modifican secuencias leen y escriben el archivo bajo su bloqueo,
+# así dos sesiones que agregan filas a la vez nunca reciben el mismo id
+
+def siguiente_id(ruta, tabla, df):
+    """Próximo id que se asignará en la tabla (sin reservarlo).
+
+    Solo si la tabla todavía no tiene secuencia se recorre `df` para inicializarla.
+    """
+    secuencias = leer_secuencias(ruta)
+    if tabla not in secuencias:
+        with bloqueo(ruta):
+            secuencias = leer_secuencias(ruta)
+            if tabla not in secuencias:
+                secuencias[tabla] = _max_id(df.index) + 1
+                _escribir_secuencias(ruta, secuencias)
+    return secuencias[tabla]
+
+def reservar_id(ruta, tabla, df):
+    """Retorna el próximo id de la tabla y avanza la secuencia"""
+    return reservar_ids(ruta, tabla, df, 1)[0]
+
+def reservar_ids(ruta, tabla, df, cantidad):
+    """Reserva `cantidad` ids consecutivos de una vez (para las cargas masivas)"""
+    with bloqueo(ruta):
+        primero = siguiente_id(ruta, tabla, df)
+        secuencias = leer_secuencias(ruta)
+        secuencias[tabla] = primero + cantidad
+        _escribir_secuencias(ruta, secuencias)
+    return range(primero, primero + cantidad)
+
+def avanzar_secuencia(ruta, tabla, id_usado):
+    """Asegura que la secuencia quede por encima de un id cargado a mano o importado"""
+    try:
+        id_usado = int(id_usado)
+    except (TypeError, ValueError):
+        return
+    with bloqueo(ruta):
+        secuencias = leer_secuencias(ruta)
+        if secuencias.get(tabla, 0) <= id_usado:
+            secuencias[tabla] = id_usado + 1
+            _escribir_secuencias(ruta, secuencias)
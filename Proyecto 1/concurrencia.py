@@ -0,0 +1,101 @@
+"""Escrituras seguras cuando varias sesiones usan el gestor a la vez.
+
+- `escribir_atomico`: el archivo se escribe en un temporal de la misma carpeta y
+  después se renombra sobre el destino con `os.replace`, que es atómico. Quien lee
+  ve la versión anterior completa o la nueva completa, nunca un archivo a medias, y
+  un corte a mitad de escritura deja intacto el archivo anterior.
+- `bloqueo`: exclusión mutua entre sesiones (hilos del mismo servidor u otros
+  procesos) con un archivo `.lock` creado en forma exclusiva. Solo lo toman quienes
+  escriben; las lecturas no esperan a nadie.
+- Control de concurrencia optimista: al mostrar una fila para editarla se toma su
+  sello (`claves.sello_fila`); al guardar se compara con el sello actual y, si otra
+  sesión la cambió en el medio, se rechaza con `ConflictoVersion` en lugar de pisar
+  su cambio.
+"""
+import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+
+# Segundos que se espera un bloqueo antes de abandonar
+ESPERA_MAXIMA = 30
+
+# Un bloqueo más viejo que esto se considera abandonado (proceso caído) y se libera
+BLOQUEO_VENCIDO = 120
+
+_PAUSA = 0.02
+
+_propios = threading.local()  # rutas de bloqueo tomadas por este hilo -> cantidad
+
+
+class ConflictoVersion(Exception):
+    """La fila cambió desde que se mostró: otra sesión la modificó o eliminó"""
+
+
+def escribir_atomico(ruta, escribir):
+    """Llama a `escribir(ruta_temporal)` y reemplaza `ruta` con el resultado.
+
+    El temporal (`.<nombre>.XXXX.tmp`) no tiene la extensión del destino, así no
+    aparece en los listados de tablas mientras se escribe. Retorna `ruta`.
+    """
+    carpeta, nombre = os.path.split(os.path.abspath(ruta))
+    descriptor, temporal = tempfile.mkstemp(dir=carpeta, prefix=f".{nombre}.", suffix=".tmp")
+    os.close(descriptor)
+    try:
+        escribir(temporal)
+        os.replace(temporal, ruta)
+    except BaseException:
+        if os.path.exists(temporal):
+            os.remove(temporal)
+        raise
+    return ruta
+
+def _liberar_vencido(ruta_bloqueo):
+    try:
+        if time.time() - os.path.getmtime(ruta_bloqueo) > BLOQUEO_VENCIDO:
+            os.remove(ruta_bloqueo)
+    except FileNotFoundError:
+        pass
+
+@contextmanager
+def bloqueo(ruta, espera=ESPERA_MAXIMA):
+    """Toma el bloqueo asociado a `ruta` (el archivo `<ruta>.lock`) durante el bloque.
+
+    Es reentrante dentro del mismo hilo. Lanza TimeoutError si no se consigue en
+    `espera` segundos.
+    """
+    ruta_bloqueo = os.path.abspath(ruta) + ".lock"
+    propios = _propios.__dict__.setdefault("rutas", {})
+    if propios.get(ruta_bloqueo):
+        propios[ruta_bloqueo] += 1
+        try:
+            yield
+        finally:
+            propios[ruta_bloqueo] -= 1
+        return
+
+    limite = time.monotonic() + espera
+    while True:
+        try:
+            descriptor = os.open(ruta_bloqueo, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            break
+        except FileExistsError:
+            _liberar_vencido(ruta_bloqueo)
+            if time.monotonic() > limite:
+                raise TimeoutError(f"No se pudo tomar el bloqueo de {ruta}")
+            time.sleep(_PAUSA)
+    try:
+        os.write(descriptor, f"{os.getpid()} {threading.get_ident()}".encode())
+    finally:
+        os.close(descriptor)
+
+    propios[ruta_bloqueo] = 1
+    try:
+        yield
+    finally:
+        propios.pop(ruta_bloqueo, None)
+        try:
+            os.remove(ruta_bloqueo)
+        except FileNotFoundError:
+            pass
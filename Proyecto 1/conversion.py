@@ -0,0 +1,250 @@
+"""Conversión CSV/JSON en streaming, con memoria acotada.
+
+Ninguna de las dos direcciones carga el archivo entero: la tabla se recorre en lotes
+de `TAMANO_LOTE` filas y cada lote se escribe apenas se convierte. Así la memoria
+depende del tamaño del lote y no del tamaño del archivo.
+
+Formatos de salida JSON:
+
+- `json`: un arreglo JSON con un registro por línea.
+- `jsonl` (JSON Lines): un registro por línea, sin arreglo que lo envuelva.
+
+Para mostrar un JSON por páginas sin leerlo entero, cada archivo tiene al lado un
+índice (`<archivo>.idx`) con la posición en bytes donde empieza y termina cada
+registro. La conversión lo escribe mientras genera el JSON; para otros archivos se
+arma recorriéndolo una vez. Con el índice, el total de registros es inmediato y una
+página se lee con un `seek` y una sola lectura, sin parsear el resto del archivo.
+"""
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from cache_tablas import firma
+from concurrencia import escribir_atomico
+
+# Filas por lote al convertir
+TAMANO_LOTE = 50_000
+
+# Caracteres que se leen del archivo JSON por vez
+TAMANO_BLOQUE = 1 << 20
+
+FORMATOS_JSON = {"json": ".json", "jsonl": ".jsonl"}
+
+# Extensión del índice de posiciones que acompaña a cada archivo JSON
+EXTENSION_INDICE = ".idx"
+
+# Cabecera del índice: mtime_ns y tamaño del JSON al indexarlo, y cantidad de registros
+_CABECERA = 3
+
+
+def _escribir_json(lotes, ruta, formato):
+    """Escribe el JSON y retorna (cantidad de registros, posiciones de cada registro)"""
+    separador = ",\n" if formato == "json" else "\n"
+    total = 0
+    posiciones = []
+    with open(ruta, "w", encoding="utf-8", newline="") as f:
+        posicion = f.write("[\n") if formato == "json" else 0
+        for lote in lotes:
+            if lote.empty:
+                continue
+            registros = lote.reset_index().to_json(orient="records", lines=True, force_ascii=False,
+                                                   date_format="iso").rstrip("\n").split("\n")
+            if total:
+                registros[0] = separador + registros[0]
+            texto = separador.join(registros)
+            f.write(texto)
+            # Posiciones en bytes: cada registro termina donde empieza el separador siguiente
+            largos = np.fromiter((len(r.encode("utf-8")) for r in registros), dtype=np.int64, count=len(registros))
+            fines = posicion + np.cumsum(largos) + len(separador) * np.arange(len(registros))
+            inicios = fines - largos
+            if total:
+                inicios[0] += len(separador)
+            posiciones.append(np.column_stack([inicios, fines]))
+            posicion = int(fines[-1])
+            total += len(registros)
+        f.write("\n]\n" if formato == "json" else "\n")
+    return total, np.concatenate(posiciones) if posiciones else np.empty((0, 2), dtype=np.int64)
+
+def escribir_json(lotes, ruta_json, formato="json"):
+    """Escribe los lotes (DataFrames con el id como índice) como JSON o JSON Lines.
+
+    De paso arma el índice de posiciones del archivo (ver `indice_json`).
+    Retorna la cantidad de registros escritos.
+    """
+    if formato not in FORMATOS_JSON:
+        raise ValueError(f"Formato JSON desconocido: {formato}")
+    total, posiciones = 0, None
+
+    def escribir(temporal):
+        nonlocal total, posiciones
+        total, posiciones = _escribir_json(lotes, temporal, formato)
+
+    escribir_atomico(ruta_json, escribir)
+    _escribir_indice(ruta_json, posiciones)
+    return total
+
+def _recorrer_json(f):
+    """Recorre un arreglo JSON o un archivo JSON Lines abierto en modo texto (sin
+    traducir saltos de línea) y produce (registro, inicio, fin) con las posiciones en
+    bytes de cada registro, leyendo el archivo por bloques"""
+    decodificador = json.JSONDecoder()
+    buffer = ""
+    posicion = 0
+    fin_archivo = False
+    dentro_arreglo = None
+    # Posición en bytes del carácter `cursor` del buffer
+    cursor = 0
+    bytes_cursor = 0
+
+    def avanzar(hasta):
+        nonlocal cursor, bytes_cursor
+        bytes_cursor += len(buffer[cursor:hasta].encode("utf-8"))
+        cursor = hasta
+        return bytes_cursor
+
+    while True:
+        # Saltear espacios y separadores entre registros
+        while True:
+            while posicion < len(buffer) and buffer[posicion] in " \t\r\n,":
+                posicion += 1
+            if posicion < len(buffer) or fin_archivo:
+                break
+            avanzar(len(buffer))
+            buffer, posicion, cursor = f.read(TAMANO_BLOQUE), 0, 0
+            fin_archivo = not buffer
+
+        if posicion >= len(buffer):
+            return
+        caracter = buffer[posicion]
+        if dentro_arreglo is None:
+            dentro_arreglo = caracter == "["
+            if dentro_arreglo:
+                posicion += 1
+                continue
+        if caracter == "]" and dentro_arreglo:
+            return
+
+        try:
+            registro, fin = decodificador.raw_decode(buffer, posicion)
+        except json.JSONDecodeError:
+            if fin_archivo:
+                raise
+            # El registro quedó cortado al final del bloque: se lee más y se reintenta
+            bloque = f.read(TAMANO_BLOQUE)
+            fin_archivo = not bloque
+            avanzar(posicion)
+            buffer, posicion, cursor = buffer[posicion:] + bloque, 0, 0
+            continue
+        yield registro, avanzar(posicion), avanzar(fin)
+        posicion = fin
+
+def iterar_registros_json(ruta_json):
+    """Recorre los registros de un arreglo JSON o de un archivo JSON Lines, de a uno,
+    leyendo el archivo por bloques"""
+    with open(ruta_json, "r", encoding="utf-8", newline="") as f:
+        for registro, _, _ in _recorrer_json(f):
+            yield registro
+
+def iterar_lotes_json(ruta_json, tamano_lote=TAMANO_LOTE):
+    """Agrupa los registros del archivo JSON en DataFrames de hasta `tamano_lote` filas"""
+    lote = []
+    for registro in iterar_registros_json(ruta_json):
+        lote.append(registro)
+        if len(lote) >= tamano_lote:
+            yield pd.DataFrame(lote)
+            lote = []
+    if lote:
+        yield pd.DataFrame(lote)
+
+def json_a_csv(ruta_json, ruta_csv, tamano_lote=TAMANO_LOTE):
+    """Convierte un JSON (arreglo o JSON Lines) a CSV por lotes.
+
+    Si el primer campo parece un ID se usa como índice; si no, se numeran las filas.
+    Retorna la cantidad de filas escritas.
+    """
+    total = 0
+
+    def escribir(temporal):
+        nonlocal total
+        columnas = None
+        columna_id = None
+        for lote in iterar_lotes_json(ruta_json, tamano_lote):
+            if columnas is None:
+                # Las columnas y el índice se fijan con el primer lote
+                columnas = list(lote.columns)
+                if columnas and "id" in str(columnas[0]).lower():
+                    columna_id = columnas[0]
+            lote = lote.reindex(columns=columnas)
+            if columna_id is not None:
+                lote = lote.set_index(columna_id)
+            else:
+                lote.index = pd.RangeIndex(total, total + len(lote))
+            lote.to_csv(temporal, mode="w" if total == 0 else "a", header=total == 0)
+            total += len(lote)
+
+    escribir_atomico(ruta_csv, escribir)
+    return total
+
+
+# ==================== ÍNDICE DE POSICIONES ====================
+
+def ruta_indice_json(ruta_json):
+    return ruta_json + EXTENSION_INDICE
+
+def _escribir_indice(ruta_json, posiciones):
+    """Guarda las posiciones (inicio, fin) de cada registro junto con la firma del JSON"""
+    mtime, tamano = firma(ruta_json)
+    cabecera = np.array([mtime, tamano, len(posiciones)], dtype=np.int64)
+
+    def escribir(temporal):
+        with open(temporal, "wb") as f:
+            f.write(cabecera.tobytes())
+            f.write(np.ascontiguousarray(posiciones, dtype=np.int64).tobytes())
+
+    escribir_atomico(ruta_indice_json(ruta_json), escribir)
+
+def _leer_indice(ruta_json):
+    """Posiciones de los registros (mapeadas a memoria), o None si el índice no
+    existe o quedó desactualizado respecto del JSON"""
+    ruta_indice = ruta_indice_json(ruta_json)
+    actual = firma(ruta_json)
+    if actual is None or not os.path.exists(ruta_indice):
+        return None
+    cabecera = np.fromfile(ruta_indice, dtype=np.int64, count=_CABECERA)
+    if len(cabecera) < _CABECERA or tuple(int(x) for x in cabecera[:2]) != actual:
+        return None
+    cantidad = int(cabecera[2])
+    if cantidad == 0:
+        return np.empty((0, 2), dtype=np.int64)
+    return np.memmap(ruta_indice, dtype=np.int64, mode="r", offset=_CABECERA * 8, shape=(cantidad, 2))
+
+def indexar_json(ruta_json):
+    """Recorre el JSON una vez y guarda el índice de posiciones de sus registros"""
+    with open(ruta_json, "r", encoding="utf-8", newline="") as f:
+        posiciones = [(inicio, fin) for _, inicio, fin in _recorrer_json(f)]
+    _escribir_indice(ruta_json, np.array(posiciones, dtype=np.int64).reshape(-1, 2))
+
+def indice_json(ruta_json):
+    """Índice de posiciones del JSON; se arma solo si falta o el archivo cambió"""
+    posiciones = _leer_indice(ruta_json)
+    if posiciones is None:
+        indexar_json(ruta_json)
+        posiciones = _leer_indice(ruta_json)
+    return posiciones
+
+def contar_registros_json(ruta_json):
+    """Cantidad de registros del JSON, tomada del índice"""
+    return len(indice_json(ruta_json))
+
+def leer_registros_json(ruta_json, desde, cantidad):
+    """Lee `cantidad` registros a partir de la posición `desde` sin recorrer el resto"""
+    posiciones = indice_json(ruta_json)[desde:desde + cantidad]
+    if len(posiciones) == 0:
+        return []
+    inicio = int(posiciones[0, 0])
+    with open(ruta_json, "rb") as f:
+        f.seek(inicio)
+        datos = f.read(int(posiciones[-1, 1]) - inicio)
+    return [json.loads(datos[a - inicio:b - inicio]) for a, b in posiciones.tolist()]
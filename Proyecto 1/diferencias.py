@@ -0,0 +1,89 @@
+"""Diferencias entre dos versiones de una tabla, fila por fila y celda por celda.
+
+Las dos versiones se alinean por id (el índice) y se informan las filas agregadas,
+las eliminadas y las modificadas, con una máscara por columna que indica qué celdas
+cambiaron. Todo se calcula con operaciones vectorizadas sobre columnas completas,
+sin recorrer filas en Python.
+
+En tablas grandes (modo "hash") primero se compara un hash por fila para encontrar
+las filas candidatas y las máscaras por celda se calculan solo sobre esas, así que
+la memoria extra depende de la cantidad de filas cambiadas y no del tamaño de la tabla.
+"""
+import numpy as np
+import pandas as pd
+
+# A partir de cuántas celdas comparadas se usa el modo "hash" en "auto"
+UMBRAL_HASH = 5_000_000
+
+MODOS = ("auto", "valores", "hash")
+
+
+def _sin_repetidos(df):
+    """Con ids repetidos vale la primera fila de cada id"""
+    return df if df.index.is_unique else df.loc[~df.index.duplicated()]
+
+def _distintos(a, b):
+    """Máscara de posiciones donde los valores difieren (dos vacíos se consideran iguales)"""
+    try:
+        distintos = np.asarray(a != b, dtype=bool)
+    except TypeError:
+        distintos = np.asarray(pd.Series(a, dtype=object) != pd.Series(b, dtype=object), dtype=bool)
+    return distintos & ~(pd.isna(a) & pd.isna(b))
+
+def _valores(serie):
+    """Valores de la columna como arreglo de numpy; los enteros con vacíos pasan a
+    decimal para que los vacíos sean NaN y se puedan comparar"""
+    if pd.api.types.is_extension_array_dtype(serie.dtype) and pd.api.types.is_numeric_dtype(serie.dtype):
+        return serie.to_numpy(dtype="float64", na_value=np.nan)
+    return serie.to_numpy()
+
+def _hash_filas(df, posiciones, columnas):
+    return pd.util.hash_pandas_object(df[columnas].iloc[posiciones], index=False).to_numpy()
+
+def comparar(anterior, nuevo, modo="auto"):
+    """Compara dos versiones de una tabla alineándolas por id.
+
+    Retorna un dict con:
+
+    - `altas`: ids que están solo en `nuevo`.
+    - `bajas`: ids que están solo en `anterior`.
+    - `modificadas`: ids presentes en ambas con alguna celda distinta.
+    - `mascara`: DataFrame booleano (índice = `modificadas`, columnas en común) con
+      True en cada celda cambiada.
+    - `columnas_agregadas` / `columnas_quitadas`: cambios de estructura.
+    """
+    if modo not in MODOS:
+        raise ValueError(f"Modo de comparación desconocido: {modo}")
+    anterior, nuevo = _sin_repetidos(anterior), _sin_repetidos(nuevo)
+    columnas = [c for c in nuevo.columns if c in anterior.columns]
+
+    comunes = nuevo.index[nuevo.index.isin(anterior.index)]
+    pos_nuevo = nuevo.index.get_indexer(comunes)
+    pos_anterior = anterior.index.get_indexer(comunes)
+
+    if modo == "auto":
+        modo = "hash" if len(comunes) * len(columnas) > UMBRAL_HASH else "valores"
+    if modo == "hash" and columnas:
+        # Solo las filas cuyo hash cambió pasan a la comparación celda por celda; un
+        # cambio de tipo sin cambio de valor (1 -> 1.0) se descarta en ese paso
+        candidatas = _hash_filas(nuevo, pos_nuevo, columnas) != _hash_filas(anterior, pos_anterior, columnas)
+        comunes, pos_nuevo, pos_anterior = comunes[candidatas], pos_nuevo[candidatas], pos_anterior[candidatas]
+
+    mascaras = {}
+    for col in columnas:
+        mascaras[col] = _distintos(_valores(anterior[col])[pos_anterior], _valores(nuevo[col])[pos_nuevo])
+    mascara = pd.DataFrame(mascaras, index=comunes, columns=columnas)
+    mascara = mascara.loc[mascara.to_numpy().any(axis=1)] if columnas else mascara.iloc[:0]
+
+    return {
+        "altas": nuevo.index.difference(anterior.index, sort=False),
+        "bajas": anterior.index.difference(nuevo.index, sort=False),
+        "modificadas": mascara.index,
+        "mascara": mascara,
+        "columnas_agregadas": [c for c in nuevo.columns if c not in anterior.columns],
+        "columnas_quitadas": [c for c in anterior.columns if c not in nuevo.columns],
+    }
+
+def cambios_por_columna(diferencia):
+    """Cantidad de celdas cambiadas en cada columna"""
+    return diferencia["mascara"].sum().astype(int)
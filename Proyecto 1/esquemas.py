@@ -0,0 +1,283 @@
+"""Esquemas de tipos por tabla.
+
+Cada tabla tiene un esquema que fija el tipo de cada columna (incluida la del id). Se
+infiere una sola vez, la primera vez que se usa la tabla, a partir de su CSV en
+`Tables/`, y se guarda en el registro `esquemas.json`, que se puede editar a mano o
+desde la pantalla de inicio. Desde ahí:
+
+- Las tablas se leen con los tipos del esquema (`opciones_lectura`), sin que pandas
+  tenga que adivinarlos en cada carga.
+- Los valores que se escriben se validan y convierten al tipo de su columna
+  (`convertir_valores`), así una edición nunca pasa una columna numérica a texto.
+- Se usan tipos compactos: enteros de 32 bits, decimales de 32 bits cuando no se
+  pierde precisión, categorías para columnas con pocos valores distintos y fechas.
+
+El registro tiene la forma `{tabla: {columna: tipo}}`; la primera columna es la del id.
+"""
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from concurrencia import bloqueo, escribir_atomico
+
+# Tipos que puede tener una columna en el esquema. Los que empiezan con mayúscula
+# son enteros que admiten vacíos.
+TIPOS = ("int32", "int64", "Int32", "Int64", "float32", "float64", "bool", "category",
+         "datetime64[ns]", "object")
+
+# Una columna de texto es categoría si sus valores distintos no pasan esta proporción
+PROPORCION_CATEGORIA = 0.5
+
+# Columnas que describen un dominio cerrado (las tablas de referencia): siempre categoría
+COLUMNAS_CATEGORIA = ("descripcion",)
+
+_FECHA = r"^\d{4}-\d{2}-\d{2}([ T]\d{2}:\d{2}(:\d{2}(\.\d+)?)?)?$"
+
+
+# ==================== INFERENCIA ====================
+
+def _tipo_entero(serie):
+    limites = np.iinfo(np.int32)
+    cabe = serie.empty or (serie.min() >= limites.min and serie.max() <= limites.max)
+    tipo = "int32" if cabe else "int64"
+    return tipo.capitalize() if serie.isna().any() else tipo
+
+def inferir_tipo(serie):
+    """Tipo compacto para una columna leída con la inferencia de pandas"""
+    valores = serie.dropna()
+    if pd.api.types.is_bool_dtype(serie):
+        return "bool"
+    if pd.api.types.is_integer_dtype(serie):
+        return _tipo_entero(serie)
+    if pd.api.types.is_float_dtype(serie):
+        # Enteros con vacíos (pandas los lee como decimales): entero que admite vacíos
+        if serie.isna().any() and len(valores) and (valores == valores.round()).all():
+            return _tipo_entero(serie)
+        # float32 solo si ningún valor cambia al guardarlo con menos precisión
+        compacto = valores.astype("float32").astype("float64")
+        return "float32" if (compacto.astype(str) == valores.astype(str)).all() else "float64"
+    if pd.api.types.is_datetime64_any_dtype(serie):
+        return "datetime64[ns]"
+    texto = valores.astype(str)
+    if len(texto) and texto.str.match(_FECHA).all() and pd.to_datetime(texto, errors="coerce").notna().all():
+        return "datetime64[ns]"
+    if serie.name in COLUMNAS_CATEGORIA or (len(valores) and valores.nunique() <= PROPORCION_CATEGORIA * len(valores)):
+        return "category"
+    return "object"
+
+def inferir_esquema(ruta_csv):
+    """Esquema de un CSV: {columna: tipo}, empezando por la columna del id"""
+    df = pd.read_csv(ruta_csv)
+    return {col: inferir_tipo(df[col]) for col in df.columns}
+
+
+# ==================== REGISTRO ====================
+
+def leer_esquemas(ruta):
+    """Todos los esquemas del registro ({} si todavía no hay ninguno)"""
+    if not os.path.exists(ruta):
+        return {}
+    with open(ruta, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+def _escribir_esquemas(ruta, esquemas):
+    def escribir(temporal):
+        with open(temporal, "w", encoding="utf-8") as f:
+            json.dump(esquemas, f, ensure_ascii=False, indent=2)
+    escribir_atomico(ruta, escribir)
+
+def verificar_esquema(esquema):
+    """Lanza ValueError si algún tipo del esquema no es uno de `TIPOS`"""
+    invalidos = {col: tipo for col, tipo in esquema.items() if tipo not in TIPOS}
+    if invalidos:
+        raise ValueError("Tipos desconocidos: " + ", ".join(f"{c} ({t})" for c, t in invalidos.items()))
+
+def esquema_tabla(ruta, tabla, ruta_csv):
+    """Esquema de la tabla; si no está en el registro se infiere del CSV y se guarda"""
+    esquema = leer_esquemas(ruta).get(tabla)
+    if esquema is not None or not os.path.exists(ruta_csv):
+        return esquema
+    with bloqueo(ruta):
+        esquemas = leer_esquemas(ruta)
+        if tabla not in esquemas:
+            esquemas[tabla] = inferir_esquema(ruta_csv)
+            _escribir_esquemas(ruta, esquemas)
+    return esquemas[tabla]
+
+def guardar_esquema(ruta, tabla, esquema):
+    """Reemplaza el esquema de una tabla en el registro"""
+    verificar_esquema(esquema)
+    with bloqueo(ruta):
+        esquemas = leer_esquemas(ruta)
+        esquemas[tabla] = dict(esquema)
+        _escribir_esquemas(ruta, esquemas)
+
+
+# ==================== LECTURA Y CONVERSIÓN ====================
+
+def opciones_lectura(esquema):
+    """Argumentos de `pd.read_csv` para leer con los tipos del esquema: (dtype, parse_dates)"""
+    fechas = [col for col, tipo in esquema.items() if tipo.startswith("datetime")]
+    tipos = {col: tipo for col, tipo in esquema.items() if col not in fechas}
+    return tipos, fechas
+
+def convertir_serie(serie, tipo):
+    """Convierte una columna al tipo indicado; lanza ValueError o TypeError si algún valor no corresponde"""
+    if str(serie.dtype) == tipo:
+        return serie
+    if tipo.startswith("datetime"):
+        return pd.to_datetime(serie).astype(tipo)
+    if tipo == "category":
+        return serie.astype("category")
+    if tipo.lower().startswith("int"):
+        if not pd.api.types.is_numeric_dtype(serie):
+            serie = pd.to_numeric(serie)
+        # astype truncaría los decimales y daría la vuelta con los desbordes sin avisar
+        valores = serie.dropna()
+        limites = np.iinfo(tipo.lower())
+        if (valores != valores.round()).any() or (valores < limites.min).any() or (valores > limites.max).any():
+            raise ValueError(f"hay valores que no son enteros de {tipo}")
+    return serie.astype(tipo)
+
+def aplicar_esquema(df, esquema, estricto=False):
+    """Lleva la tabla a los tipos del esquema; solo se convierten las columnas que difieren.
+
+    Con `estricto` una columna que no se puede convertir lanza ValueError; si no, queda
+    con el tipo que tenía.
+    """
+    if not esquema:
+        return df
+    nombre_id = df.index.name
+    cambios = {}
+    for col, tipo in esquema.items():
+        if col not in df.columns and col != nombre_id:
+            continue
+        serie = df.index.to_series() if col == nombre_id else df[col]
+        if str(serie.dtype) == tipo:
+            continue
+        try:
+            cambios[col] = convertir_serie(serie, tipo)
+        except (TypeError, ValueError) as e:
+            if estricto:
+                raise ValueError(f"La columna {col} no se puede convertir a {tipo}: {e}") from e
+    if not cambios:
+        return df
+    resultado = df.copy(deep=False)
+    for col, serie in cambios.items():
+        if col == nombre_id:
+            resultado.index = pd.Index(serie.to_numpy(), name=nombre_id, dtype=serie.dtype)
+        else:
+            resultado[col] = serie
+    return resultado
+
+def convertir_valor(texto, tipo, columna=""):
+    """Convierte un valor ingresado como texto al tipo de la columna.
+
+    Un texto vacío es un vacío, salvo en columnas enteras o lógicas sin vacíos.
+    Lanza ValueError con un mensaje para el usuario si el valor no corresponde.
+    """
+    texto = "" if texto is None else str(texto).strip()
+    if texto == "":
+        if tipo in ("int32", "int64", "bool"):
+            raise ValueError(f"la columna {columna} no admite vacíos")
+        return None
+    if tipo.lower().startswith("int"):
+        try:
+            numero = float(texto)
+        except ValueError:
+            raise ValueError(f"'{texto}' no es un número entero (columna {columna})") from None
+        limites = np.iinfo(tipo.lower())
+        if not numero.is_integer() or not limites.min <= numero <= limites.max:
+            raise ValueError(f"'{texto}' no es un número entero válido para la columna {columna}")
+        return int(numero)
+    if tipo.startswith("float"):
+        try:
+            return float(texto)
+        except ValueError:
+            raise ValueError(f"'{texto}' no es un número (columna {columna})") from None
+    if tipo == "bool":
+        valor = {"true": True, "false": False, "1": True, "0": False}.get(texto.lower())
+        if valor is None:
+            raise ValueError(f"'{texto}' no es verdadero o falso (columna {columna})")
+        return valor
+    if tipo.startswith("datetime"):
+        try:
+            return pd.Timestamp(texto)
+        except ValueError:
+            raise ValueError(f"'{texto}' no es una fecha (columna {columna})") from None
+    return texto
+
+def convertir_valores(esquema, valores):
+    """Convierte los valores de una fila ingresados como texto a los tipos del esquema"""
+    return {col: convertir_valor(val, esquema.get(col, "object"), col) for col, val in valores.items()}
+
+
+# ==================== ASIGNACIÓN ====================
+
+def asignar(columna, posiciones, valores):
+    """Asigna valores en las posiciones de una columna manteniendo su tipo si se puede.
+
+    Una categoría suma los valores nuevos a sus categorías y un entero sin vacíos pasa
+    a decimal si recibe un vacío; si el tipo no admite los valores, la columna pasa a
+    `object` (el esquema la vuelve a su tipo al guardar).
+    """
+    if isinstance(columna.dtype, pd.CategoricalDtype):
+        nuevas = pd.Index(pd.unique(pd.Series(valores, dtype=object).dropna()))
+        columna = columna.cat.add_categories(nuevas.difference(columna.cat.categories))
+    elif pd.api.types.is_integer_dtype(columna.dtype) and not pd.api.types.is_extension_array_dtype(columna.dtype):
+        numeros = pd.to_numeric(pd.Series(valores), errors="coerce")
+        if numeros.notna().all() and (numeros == numeros.round()).all():
+            valores = numeros.astype(columna.dtype).to_numpy()
+        else:
+            columna = columna.astype("float64")
+    elif pd.api.types.is_datetime64_any_dtype(columna.dtype):
+        valores = pd.to_datetime(pd.Series(valores), errors="coerce").to_numpy()
+
+    if pd.api.types.is_extension_array_dtype(columna.dtype):
+        resultado = columna.copy()
+        try:
+            resultado.iloc[posiciones] = valores
+            return resultado
+        except (TypeError, ValueError):
+            columna = columna.astype(object)
+    datos = columna.to_numpy(copy=True)
+    try:
+        datos[posiciones] = valores
+    except (TypeError, ValueError):
+        datos = datos.astype(object)
+        datos[posiciones] = valores
+    return pd.Series(datos, index=columna.index, name=columna.name)
+
+def _alinear(columna, nuevos):
+    """Lleva los valores de filas nuevas al tipo de la columna a la que se agregan"""
+    if isinstance(columna.dtype, pd.CategoricalDtype):
+        categorias = columna.cat.categories.union(pd.Index(nuevos.dropna().unique()), sort=False)
+        tipo = pd.CategoricalDtype(categorias)
+        return columna.astype(tipo), nuevos.astype(object).astype(tipo)
+    if pd.api.types.is_numeric_dtype(columna) and not pd.api.types.is_bool_dtype(columna):
+        nuevos = pd.to_numeric(nuevos)
+    elif pd.api.types.is_datetime64_any_dtype(columna):
+        nuevos = pd.to_datetime(nuevos)
+    try:
+        nuevos = nuevos.astype(columna.dtype)
+    except (TypeError, ValueError):
+        pass
+    return columna, nuevos
+
+def concatenar(df, filas):
+    """Agrega filas (con el id como índice) al final de la tabla manteniendo los tipos.
+
+    Un vacío en una columna entera la pasa a decimal en lugar de perder la fila.
+    """
+    filas = filas.reindex(columns=df.columns)
+    resultado = df.copy(deep=False)
+    for col in df.columns:
+        resultado[col], filas[col] = _alinear(df[col], filas[col])
+    try:
+        filas.index = filas.index.astype(df.index.dtype)
+    except (TypeError, ValueError):
+        pass
+    filas.index.name = df.index.name
+    return pd.concat([resultado, filas])
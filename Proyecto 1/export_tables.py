@@ -1,57 +1,346 @@
+"""Exporta las tablas de la base `libreria` a CSV y/o Parquet.
+
+Las tablas se exportan en paralelo, cada una en un hilo, sobre un pool de conexiones
+acotado (tantas conexiones como hilos). Cada tabla se lee con un cursor del lado del
+servidor (`stream_results`) en lotes de `TAMANO_LOTE` filas que se van escribiendo
+a medida que llegan, así que la memoria usada no depende del tamaño de la tabla.
+Los archivos se escriben en temporales y reemplazan a los anteriores solo al
+terminar, así que un corte nunca deja una exportación a medias.
+
+La exportación es incremental: por cada tabla se guarda en `estado_exportacion.json`
+(en la carpeta de destino) una marca de agua, el mayor id exportado (o la mayor
+`fecha_emision` en `factura`, ver `COLUMNAS_MARCA`). En la corrida siguiente solo se
+traen las filas posteriores a la marca y se agregan a las copias locales. Antes de
+agregar se compara una suma de control de las filas ya exportadas (cantidad y suma de
+ids, calculadas en la base); si no coincide (filas borradas o insertadas por debajo de
+la marca) o las copias locales cambiaron, la tabla se vuelve a exportar entera.
+
+Uso:
+
+    python export_tables.py                                  # MySQL local -> CSV en la carpeta actual
+    python export_tables.py --destino Tables --formato ambos --hilos 4
+    python export_tables.py --preparar-sqlite libreria.db    # base SQLite de prueba armada con Tables/
+    python export_tables.py --url sqlite:///libreria.db --destino /tmp/export
+    python export_tables.py --completo                        # ignora las marcas y exporta todo
+"""
+import argparse
+import glob
+import importlib.util
+import json
+import os
+import shutil
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime
+
 import pandas as pd 
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, inspect, text
+
+from concurrencia import escribir_atomico
+
+# El acceso a la base (motor, tablas, lectura por lotes) es el compartido con Proyecto 3
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from libreria.acceso_datos import COLUMNAS_FECHA, TABLAS, URL_PREDETERMINADA, crear_motor, leer_lotes
+
+HAY_PYARROW = importlib.util.find_spec("pyarrow") is not None
+
+# Columna de la marca de agua de cada tabla; las demás usan su primera columna (el id)
+COLUMNAS_MARCA = dict(COLUMNAS_FECHA)
+
+FORMATOS = ("csv", "parquet")
+
+# Estado de la exportación incremental, dentro de la carpeta de destino
+ARCHIVO_ESTADO = "estado_exportacion.json"
+
+# Filas que se traen y escriben por vez
+TAMANO_LOTE = 50_000
+
+# Tablas que se exportan a la vez (y conexiones abiertas como máximo)
+HILOS = 4
+
+
+# ==================== ESCRITURA POR LOTES ====================
+
+class _EscritorCsv:
+    def __init__(self, ruta, anterior=None):
+        if anterior is not None:
+            # Se agrega sobre una copia del archivo anterior, que no se toca hasta el final
+            shutil.copyfile(anterior, ruta)
+        self.archivo = open(ruta, "a" if anterior is not None else "w", encoding="utf-8", newline="")
+        self.encabezado = anterior is None
+
+    def escribir(self, lote):
+        lote.to_csv(self.archivo, index=False, header=self.encabezado)
+        self.encabezado = False
+
+    def cerrar(self):
+        self.archivo.close()
+
+class _EscritorParquet:
+    def __init__(self, ruta, anterior=None):
+        self.ruta = ruta
+        self.escritor = None
+        if anterior is not None:
+            # Parquet no admite agregar al final: se copian primero los grupos de filas
+            # del archivo anterior, sin pasar por pandas
+            import pyarrow.parquet as pq
+            archivo = pq.ParquetFile(anterior)
+            self.escritor = pq.ParquetWriter(ruta, archivo.schema_arrow)
+            for i in range(archivo.num_row_groups):
+                self.escritor.write_table(archivo.read_row_group(i))
+
+    def escribir(self, lote):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        if self.escritor is None:
+            # El esquema lo fija el primer lote; los siguientes se convierten a él
+            tabla = pa.Table.from_pandas(lote, preserve_index=False)
+            self.escritor = pq.ParquetWriter(self.ruta, tabla.schema)
+        else:
+            tabla = pa.Table.from_pandas(lote, schema=self.escritor.schema, preserve_index=False)
+        self.escritor.write_table(tabla)
+
+    def cerrar(self):
+        if self.escritor is not None:
+            self.escritor.close()
+
+def _escribir_atomico_varios(rutas, escribir):
+    """Como `escribir_atomico` pero para varios archivos: llama a
+    `escribir({formato: ruta_temporal})` y después reemplaza cada destino"""
+    formatos = list(rutas)
+
+    def paso(i, temporales):
+        if i == len(formatos):
+            escribir(temporales)
+            return
+        escribir_atomico(rutas[formatos[i]], lambda temporal: paso(i + 1, {**temporales, formatos[i]: temporal}))
+    paso(0, {})
+
+def volcar_lotes(lotes, rutas, agregar=False, al_escribir=None):
+    """Escribe los lotes en cada formato de `rutas` ({formato: ruta}) y retorna la
+    cantidad de filas.
+
+    Con `agregar` los lotes se suman al final de los archivos existentes: cada uno se
+    reescribe en un temporal con sus filas anteriores primero (el CSV copiando el
+    archivo, el Parquet sus grupos de filas) y reemplaza al anterior solo al terminar.
+    `al_escribir(lote)` se llama con cada lote escrito.
+    """
+    filas = 0
+    escritor_de = {"csv": _EscritorCsv, "parquet": _EscritorParquet}
+
+    def escribir(temporales):
+        nonlocal filas
+        escritores = {f: escritor_de[f](temporal, rutas[f] if agregar else None)
+                      for f, temporal in temporales.items()}
+        try:
+            for lote in lotes:
+                for escritor in escritores.values():
+                    escritor.escribir(lote)
+                filas += len(lote)
+                if al_escribir is not None:
+                    al_escribir(lote)
+        finally:
+            for escritor in escritores.values():
+                escritor.cerrar()
+
+    _escribir_atomico_varios(rutas, escribir)
+    return filas
+
+
+# ==================== ESTADO INCREMENTAL ====================
+
+def leer_estado(destino):
+    """Estado de la última exportación en `destino`: {tabla: marca} ({} si no hay)"""
+    ruta = os.path.join(destino, ARCHIVO_ESTADO)
+    if not os.path.exists(ruta):
+        return {}
+    with open(ruta, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+def guardar_estado(destino, estado):
+    def escribir(temporal):
+        with open(temporal, "w", encoding="utf-8") as f:
+            json.dump(estado, f, ensure_ascii=False, indent=2)
+    escribir_atomico(os.path.join(destino, ARCHIVO_ESTADO), escribir)
+
+def _a_json(valor):
+    """Valor de la base guardable en el estado; las fechas quedan como
+    `AAAA-MM-DD HH:MM:SS`, que se compara bien también como texto (SQLite)"""
+    if valor is None or (pd.api.types.is_scalar(valor) and pd.isna(valor)):
+        return None
+    if isinstance(valor, (datetime, date)):
+        return str(pd.Timestamp(valor))
+    if hasattr(valor, "item"):
+        valor = valor.item()
+    if isinstance(valor, float) and valor.is_integer():
+        return int(valor)
+    return valor
+
+def _suma(valor):
+    # MySQL devuelve las sumas como Decimal
+    return 0 if valor is None else int(valor)
+
+def columnas_control(motor, tabla):
+    """(columna de la marca, columna del id) de una tabla"""
+    clave = inspect(motor).get_columns(tabla)[0]["name"]
+    return COLUMNAS_MARCA.get(tabla, clave), clave
+
+def _copias_intactas(anterior, rutas):
+    """Las copias locales son las que dejó la última exportación (mismos tamaños)"""
+    archivos = anterior.get("archivos", {})
+    return set(archivos) == set(rutas) and all(
+        os.path.exists(ruta) and os.path.getsize(ruta) == archivos[formato] for formato, ruta in rutas.items())
+
+def _motivo_completa(motor, tabla, anterior, rutas, marca, clave, q):
+    """Por qué la tabla se exporta entera (None si alcanza con agregar lo nuevo)"""
+    if anterior is None:
+        return "primera exportación"
+    if anterior.get("columna") != marca:
+        return "cambió la columna de la marca"
+    if not _copias_intactas(anterior, rutas):
+        return "las copias locales cambiaron"
+    with motor.connect() as conexion:
+        filas, suma = conexion.execute(
+            text(f"SELECT COUNT(*), SUM({q(clave)}) FROM {q(tabla)} WHERE {q(marca)} <= :marca OR {q(marca)} IS NULL"),
+            {"marca": anterior["marca"]}).one()
+    if (filas, _suma(suma)) != (anterior["filas"], anterior["suma"]):
+        return "la suma de control no coincide"
+    return None
+
+
+# ==================== EXPORTACIÓN ====================
+
+def rutas_exportacion(destino, nombre, formatos):
+    """Archivo de salida de una tabla en cada formato"""
+    return {formato: os.path.join(destino, f"{nombre}.{formato}") for formato in formatos}
+
+def exportar_tabla(motor, tabla, destino=".", formatos=("csv",), tamano_lote=TAMANO_LOTE, anterior=None,
+                   completo=False):
+    """Exporta una tabla y retorna sus estadísticas y su nuevo estado (en `estado`).
+
+    Con el estado de la exportación `anterior` solo se agregan las filas con la marca
+    mayor a la guardada, salvo que la suma de control no coincida o se pida `completo`.
+    """
+    inicio = time.perf_counter()
+    q = motor.dialect.identifier_preparer.quote
+    rutas = rutas_exportacion(destino, TABLAS.get(tabla, tabla), formatos)
+    marca, clave = columnas_control(motor, tabla)
+    with motor.connect() as conexion:
+        tope = _a_json(conexion.execute(text(f"SELECT MAX({q(marca)}) FROM {q(tabla)}")).scalar())
+
+    motivo = "exportación completa pedida" if completo else _motivo_completa(motor, tabla, anterior, rutas, marca, clave, q)
+    # Se fija el tope al empezar: lo que llegue durante la exportación queda para la próxima
+    hasta = f"{q(marca)} <= :tope" if tope is not None else "1 = 0"
+    if motivo is None:
+        consulta = f"SELECT * FROM {q(tabla)} WHERE {q(marca)} > :marca AND {hasta} ORDER BY {q(marca)}"
+        parametros = {"marca": anterior["marca"], "tope": tope}
+        filas, suma = anterior["filas"], anterior["suma"]
+    else:
+        consulta = f"SELECT * FROM {q(tabla)} WHERE {hasta} OR {q(marca)} IS NULL"
+        parametros = {"tope": tope}
+        filas, suma = 0, 0
+
+    def sumar(lote):
+        nonlocal suma
+        suma += _suma(pd.to_numeric(lote[clave]).sum())
+
+    nuevas = volcar_lotes(leer_lotes(motor, consulta, tamano_lote, parametros), rutas,
+                          agregar=motivo is None, al_escribir=sumar)
+    marca_nueva = tope if tope is not None else (anterior or {}).get("marca")
+    estado = {"columna": marca, "marca": marca_nueva, "filas": filas + nuevas, "suma": suma,
+              "archivos": {formato: os.path.getsize(ruta) for formato, ruta in rutas.items()}}
+    return {"tabla": tabla, "filas": nuevas, "segundos": time.perf_counter() - inicio,
+            "modo": "completa" if motivo else "incremental", "motivo": motivo,
+            "archivos": list(rutas.values()), "estado": estado}
 
-# Motor de conexión
-host = "localhost"
-user = "root"
-password = ""
-port = 3306
-database = "libreria"
+def exportar(url=URL_PREDETERMINADA, destino=".", formatos=("csv",), tablas=None, hilos=HILOS,
+             tamano_lote=TAMANO_LOTE, completo=False):
+    """Exporta las tablas en paralelo y retorna las estadísticas de cada una.
 
-engine = create_engine(f"mysql+pymysql://{user}:{password}@{host}:{port}/{database}?charset=utf8mb4")
+    Una tabla que falla no detiene a las demás: su error queda en `error` y su marca
+    no se mueve. El estado se guarda después de cada tabla.
+    """
+    if "parquet" in formatos and not HAY_PYARROW:
+        raise RuntimeError("Exportar a Parquet requiere pyarrow (pip install pyarrow)")
+    os.makedirs(destino, exist_ok=True)
+    tablas = list(tablas or TABLAS)
+    motor = crear_motor(url, hilos)
+    estado = leer_estado(destino)
+    cerrojo = threading.Lock()
 
-# Importación y lectura de las tablas
+    def una(tabla):
+        inicio = time.perf_counter()
+        try:
+            resultado = exportar_tabla(motor, tabla, destino, formatos, tamano_lote, estado.get(tabla), completo)
+        except Exception as e:
+            return {"tabla": tabla, "filas": 0, "segundos": time.perf_counter() - inicio, "error": str(e)}
+        with cerrojo:
+            estado[tabla] = resultado.pop("estado")
+            guardar_estado(destino, estado)
+        return resultado
 
-# clientes
-df_clientes = pd.read_sql_query("SELECT * FROM clientes;", engine)
-df_clientes.to_csv("clientes.csv", index=False)
+    try:
+        with ThreadPoolExecutor(max_workers=hilos) as pool:
+            return list(pool.map(una, tablas))
+    finally:
+        motor.dispose()
 
-# autores
-df_autores = pd.read_sql_query("SELECT * FROM autores;", engine)
-df_autores.to_csv("autores.csv", index=False)
+def imprimir_estadisticas(estadisticas, segundos_totales):
+    for e in estadisticas:
+        if e.get("error"):
+            detalle = f"ERROR: {e['error']}"
+        else:
+            detalle = f"{e['filas']:>10,} filas  {e['segundos']:7.2f} s  {e['modo']}"
+            if e["modo"] == "completa":
+                detalle += f" ({e['motivo']})"
+        print(f"{e['tabla']:<16} {detalle}")
+    total = sum(e["filas"] for e in estadisticas)
+    print(f"{'Total':<16} {total:>10,} filas  {segundos_totales:7.2f} s")
 
-# factura
-df_factura = pd.read_sql_query("SELECT * FROM factura;", engine)
-df_factura.to_csv("factura.csv", index=False)
 
-# formatos
-df_formatos = pd.read_sql_query("SELECT * FROM formatos;", engine)
-df_formatos.to_csv("formato.csv", index=False)
+# ==================== BASE DE PRUEBA ====================
 
-# genero
-df_generos = pd.read_sql_query("SELECT * FROM generos;", engine)
-df_generos.to_csv("genero.csv", index=False)
+def preparar_sqlite(ruta_db, carpeta_csv="Tables"):
+    """Arma una base SQLite con los CSV de `carpeta_csv`, con los mismos nombres de
+    tabla que la base MySQL, para probar la exportación sin servidor"""
+    motor = create_engine(f"sqlite:///{ruta_db}")
+    nombres = {archivo: tabla for tabla, archivo in TABLAS.items()}
+    try:
+        for ruta in sorted(glob.glob(os.path.join(carpeta_csv, "*.csv"))):
+            nombre = os.path.splitext(os.path.basename(ruta))[0]
+            pd.read_csv(ruta).to_sql(nombres.get(nombre, nombre), motor, if_exists="replace", index=False)
+    finally:
+        motor.dispose()
+    return ruta_db
 
-# libros
-df_libros = pd.read_sql_query("SELECT * FROM libros;", engine)
-df_libros.to_csv("libros.csv", index=False)
 
-# localidades
-df_localidades = pd.read_sql_query("SELECT * FROM localidades;", engine)
-df_localidades.to_csv("localidades.csv", index=False)
+def main(argumentos=None):
+    parser = argparse.ArgumentParser(description="Exporta las tablas de la base libreria")
+    parser.add_argument("--url", default=URL_PREDETERMINADA, help="URL de SQLAlchemy de la base")
+    parser.add_argument("--destino", default=".", help="Carpeta de salida")
+    parser.add_argument("--formato", choices=FORMATOS + ("ambos",), default="csv")
+    parser.add_argument("--hilos", type=int, default=HILOS, help="Tablas en paralelo (y conexiones del pool)")
+    parser.add_argument("--lote", type=int, default=TAMANO_LOTE, help="Filas por lote")
+    parser.add_argument("--tablas", nargs="*", help="Tablas a exportar (todas si no se indican)")
+    parser.add_argument("--completo", action="store_true",
+                        help="Exporta las tablas enteras sin usar las marcas de la exportación anterior")
+    parser.add_argument("--preparar-sqlite", metavar="RUTA_DB",
+                        help="Arma una base SQLite de prueba con los CSV de Tables/ y termina")
+    args = parser.parse_args(argumentos)
 
-# métodos de pago
-df_metodos_de_pago = pd.read_sql_query("SELECT * FROM metodos_de_pago;", engine)
-df_metodos_de_pago.to_csv("metodos_de_pago.csv", index=False)
+    if args.preparar_sqlite:
+        print(f"Base de prueba: {preparar_sqlite(args.preparar_sqlite)}")
+        return 0
 
-# paises
-df_paises = pd.read_sql_query("SELECT * FROM paises;", engine)
-df_paises.to_csv("paises.csv", index=False)
+    formatos = FORMATOS if args.formato == "ambos" else (args.formato,)
+    inicio = time.perf_counter()
+    estadisticas = exportar(args.url, args.destino, formatos, args.tablas, args.hilos, args.lote,
+                            args.completo)
+    imprimir_estadisticas(estadisticas, time.perf_counter() - inicio)
+    return 1 if any(e.get("error") for e in estadisticas) else 0
 
-# proveedores
-df_proveedores = pd.read_sql_query("SELECT * FROM proveedores;", engine)
-df_proveedores.to_csv("proovedores.csv", index=False)
 
-# ventas
-df_ventas = pd.read_sql_query("SELECT * FROM ventas;", engine)
-df_ventas.to_csv("ventas.csv", index=False)
\ No newline at end of file
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,212 @@
+"""Historial de versiones de las tablas basado en diferencias por fila.
+
+En lugar de guardar una copia completa de la tabla en cada cambio, cada tabla tiene
+una carpeta `historico/<tabla>/` con:
+
+- `manifiesto.json`: la lista de versiones (número, fecha, tipo, filas, hash y tipos
+  de las columnas).
+- Una foto completa (`vNNNNNN.foto.*`) para la primera versión retenida y cada
+  `FOTO_CADA` versiones, para acotar lo que hay que aplicar al reconstruir.
+- Para el resto, solo la diferencia con la versión anterior: las filas nuevas o
+  cambiadas (`vNNNNNN.cambios.*`) y los ids eliminados (`vNNNNNN.eliminados.*`).
+
+Cualquier versión se reconstruye partiendo de la foto anterior más cercana y
+aplicando las diferencias; al final las columnas se llevan a los tipos guardados en
+el manifiesto. Un cambio que solo toca tipos (p. ej. `int64` -> `float64`) no cambia
+el hash de las filas, así que se guarda como foto. Al superar `MAX_VERSIONES` se descartan las más viejas.
+"""
+import json
+import os
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from almacenamiento import leer_tabla, escribir_tabla, ruta_tabla
+from concurrencia import escribir_atomico
+from diferencias import comparar
+from esquemas import asignar, concatenar
+
+# Cantidad máxima de versiones retenidas por tabla
+MAX_VERSIONES = 50
+
+# Cada cuántas versiones se guarda una foto completa en lugar de una diferencia
+FOTO_CADA = 20
+
+MANIFIESTO = "manifiesto.json"
+
+
+def _carpeta(carpeta_historico, nombre):
+    return os.path.join(carpeta_historico, nombre)
+
+def _nombre_archivo(version, parte):
+    return f"v{version:06d}.{parte}"
+
+def hash_tabla(df):
+    """Hash del contenido de la tabla (índice, columnas y valores), vectorizado"""
+    filas = pd.util.hash_pandas_object(df, index=True).to_numpy()
+    # Se pondera por posición para que el orden de las filas también cuente
+    ponderado = (filas * (np.arange(len(filas), dtype=np.uint64) * 2 + 1)).sum()
+    return f"{int(ponderado) & 0xFFFFFFFFFFFFFFFF:016x}-{'|'.join(map(str, df.columns))}"
+
+def tipos_columnas(df):
+    """{columna: tipo} de la tabla, tal como se guarda en el manifiesto"""
+    return {str(col): str(tipo) for col, tipo in df.dtypes.items()}
+
+def _con_tipos(df, tipos):
+    """La tabla con las columnas en los tipos guardados (si la versión los tiene)"""
+    distintos = {col: tipo for col, tipo in (tipos or {}).items()
+                 if col in df.columns and str(df[col].dtype) != tipo}
+    return df.astype(distintos) if distintos else df
+
+def diferencia_filas(anterior, nuevo):
+    """Retorna (cambios, eliminados) para pasar de `anterior` a `nuevo`.
+
+    `cambios` tiene las filas de `nuevo` que no existían o cuyo contenido cambió y
+    `eliminados` los ids que ya no están (ver `diferencias.comparar`).
+    """
+    diferencia = comparar(anterior, nuevo, modo="hash")
+    cambios = nuevo.loc[nuevo.index.isin(diferencia["altas"].append(diferencia["modificadas"]))]
+    return cambios, diferencia["bajas"]
+
+def aplicar_diferencia(df, cambios, eliminados):
+    """Aplica una diferencia guardada; las filas existentes conservan su posición.
+
+    Los valores se asignan con `esquemas.asignar` (una categoría suma los valores
+    nuevos a sus categorías); el tipo final lo fija `_con_tipos` con el manifiesto.
+    """
+    resultado = df.drop(index=df.index.intersection(eliminados))
+    existentes = cambios.index.intersection(resultado.index)
+    if len(existentes):
+        posiciones = resultado.index.get_indexer(existentes)
+        for col in cambios.columns:
+            resultado[col] = asignar(resultado[col], posiciones, cambios.loc[existentes, col].to_numpy())
+    nuevas = cambios.loc[~cambios.index.isin(resultado.index)]
+    if len(nuevas):
+        resultado = concatenar(resultado, nuevas)
+    return resultado
+
+
+# ==================== MANIFIESTO ====================
+
+def leer_manifiesto(carpeta_historico, nombre):
+    """Versiones guardadas de una tabla, de la más vieja a la más nueva (vacía si no tiene historial)"""
+    ruta = os.path.join(_carpeta(carpeta_historico, nombre), MANIFIESTO)
+    if not os.path.exists(ruta):
+        return []
+    with open(ruta, "r", encoding="utf-8") as f:
+        return json.load(f)["versiones"]
+
+def _escribir_manifiesto(carpeta_historico, nombre, versiones):
+    def escribir(temporal):
+        with open(temporal, "w", encoding="utf-8") as f:
+            json.dump({"tabla": nombre, "versiones": versiones}, f, ensure_ascii=False, indent=2)
+    escribir_atomico(os.path.join(_carpeta(carpeta_historico, nombre), MANIFIESTO), escribir)
+
+def contar_versiones(carpeta_historico):
+    """Cantidad total de versiones guardadas entre todas las tablas"""
+    if not os.path.exists(carpeta_historico):
+        return 0
+    return sum(len(leer_manifiesto(carpeta_historico, nombre))
+               for nombre in os.listdir(carpeta_historico)
+               if os.path.isdir(_carpeta(carpeta_historico, nombre)))
+
+
+# ==================== ESCRITURA ====================
+
+def _guardar_foto(carpeta, entrada, df):
+    entrada["tipo"] = "foto"
+    entrada["archivos"] = [os.path.basename(escribir_tabla(df, ruta_tabla(carpeta, _nombre_archivo(entrada["version"], "foto"))))]
+
+def _guardar_delta(carpeta, entrada, cambios, eliminados):
+    entrada["tipo"] = "delta"
+    ruta_cambios = ruta_tabla(carpeta, _nombre_archivo(entrada["version"], "cambios"))
+    ruta_eliminados = ruta_tabla(carpeta, _nombre_archivo(entrada["version"], "eliminados"))
+    escribir_tabla(cambios, ruta_cambios)
+    escribir_tabla(pd.DataFrame(index=eliminados), ruta_eliminados)
+    entrada["archivos"] = [os.path.basename(ruta_cambios), os.path.basename(ruta_eliminados)]
+    entrada["cambios"] = len(cambios)
+    entrada["eliminados"] = len(eliminados)
+
+def _borrar_archivos(carpeta, entrada):
+    for archivo in entrada.get("archivos", []):
+        ruta = os.path.join(carpeta, archivo)
+        if os.path.exists(ruta):
+            os.remove(ruta)
+
+def registrar_version(carpeta_historico, nombre, df, anterior):
+    """Guarda `df` como nueva versión de la tabla y retorna su número.
+
+    `anterior` es el contenido de la última versión guardada: la primera vez se guarda
+    como foto inicial y después se usa para calcular la diferencia. Si el contenido
+    no cambió no se crea una versión nueva y se retorna None.
+    """
+    carpeta = _carpeta(carpeta_historico, nombre)
+    os.makedirs(carpeta, exist_ok=True)
+    versiones = leer_manifiesto(carpeta_historico, nombre)
+
+    if not versiones:
+        # Primera vez: la versión de partida se guarda como foto
+        inicial = {"version": 0, "fecha": datetime.now().isoformat(timespec="seconds"),
+                   "filas": len(anterior), "hash": hash_tabla(anterior), "tipos": tipos_columnas(anterior)}
+        _guardar_foto(carpeta, inicial, anterior)
+        versiones.append(inicial)
+
+    hash_nuevo = hash_tabla(df)
+    tipos = tipos_columnas(df)
+    if hash_nuevo == versiones[-1]["hash"] and versiones[-1].get("tipos", tipos) == tipos:
+        _escribir_manifiesto(carpeta_historico, nombre, versiones)
+        return None
+
+    entrada = {"version": versiones[-1]["version"] + 1,
+               "fecha": datetime.now().isoformat(timespec="seconds"),
+               "filas": len(df), "hash": hash_nuevo, "tipos": tipos}
+    desde_foto = next(i for i in range(len(versiones) - 1, -1, -1) if versiones[i]["tipo"] == "foto")
+    # Las diferencias por fila no registran tipos: si cambian se guarda una foto
+    misma_estructura = list(anterior.columns) == list(df.columns) and tipos_columnas(anterior) == tipos
+    if not misma_estructura or len(versiones) - desde_foto >= FOTO_CADA:
+        _guardar_foto(carpeta, entrada, df)
+    else:
+        cambios, eliminados = diferencia_filas(anterior, df)
+        _guardar_delta(carpeta, entrada, cambios, eliminados)
+    versiones.append(entrada)
+
+    versiones = _aplicar_retencion(carpeta, versiones)
+    _escribir_manifiesto(carpeta_historico, nombre, versiones)
+    return entrada["version"]
+
+def _aplicar_retencion(carpeta, versiones):
+    """Descarta las versiones más viejas por encima de MAX_VERSIONES"""
+    sobrantes = len(versiones) - MAX_VERSIONES
+    if sobrantes <= 0:
+        return versiones
+    # La versión más vieja que queda pasa a ser foto (salvo que ya lo sea)
+    primera = versiones[sobrantes]
+    if primera["tipo"] != "foto":
+        df = _reconstruir(carpeta, versiones, sobrantes)
+        _borrar_archivos(carpeta, primera)
+        _guardar_foto(carpeta, primera, df)
+        primera.pop("cambios", None)
+        primera.pop("eliminados", None)
+    for entrada in versiones[:sobrantes]:
+        _borrar_archivos(carpeta, entrada)
+    return versiones[sobrantes:]
+
+
+# ==================== LECTURA ====================
+
+def _reconstruir(carpeta, versiones, posicion):
+    inicio = next(i for i in range(posicion, -1, -1) if versiones[i]["tipo"] == "foto")
+    df = leer_tabla(os.path.join(carpeta, versiones[inicio]["archivos"][0]))
+    for entrada in versiones[inicio + 1:posicion + 1]:
+        ruta_cambios, ruta_eliminados = (os.path.join(carpeta, a) for a in entrada["archivos"])
+        df = aplicar_diferencia(df, leer_tabla(ruta_cambios), leer_tabla(ruta_eliminados).index)
+    return _con_tipos(df, versiones[posicion].get("tipos"))
+
+def cargar_version(carpeta_historico, nombre, version):
+    """Reconstruye el contenido de la tabla en una versión dada"""
+    versiones = leer_manifiesto(carpeta_historico, nombre)
+    posiciones = [i for i, v in enumerate(versiones) if v["version"] == version]
+    if not posiciones:
+        raise KeyError(f"La versión {version} de {nombre} no está en el historial")
+    return _reconstruir(_carpeta(carpeta_historico, nombre), versiones, posiciones[0])
@@ -0,0 +1,151 @@
+"""Índice invertido de trigramas para las búsquedas de texto.
+
+Para cada columna se guardan los valores distintos (en minúsculas), el código del
+valor de cada fila y un índice trigrama -> valores que lo contienen. Una búsqueda
+por subcadena intersecta los trigramas del texto buscado, verifica solo los valores
+candidatos y después marca las filas con `np.isin` sobre los códigos, sin recorrer
+la tabla fila por fila ni convertirla a texto en cada consulta.
+
+El índice se construye una vez por tabla y se actualiza con cada alta, edición o
+baja (`indexar_fila` / `quitar_fila`). Las búsquedas retornan los ids de las filas.
+"""
+import numpy as np
+import pandas as pd
+
+LARGO_TRIGRAMA = 3
+
+
+def _texto(valor, es_float=False):
+    """Texto normalizado (minúsculas) con que se indexa un valor"""
+    if valor is None or (pd.api.types.is_scalar(valor) and pd.isna(valor)):
+        return ""
+    if es_float:
+        try:
+            valor = float(valor)
+        except (TypeError, ValueError):
+            pass
+    return str(valor).lower()
+
+def _trigramas(texto):
+    return {texto[i:i + LARGO_TRIGRAMA] for i in range(len(texto) - LARGO_TRIGRAMA + 1)}
+
+def _codigo(columna, texto):
+    """Código del valor en la columna; si es nuevo lo agrega al diccionario y a los trigramas"""
+    codigo = columna["codigo_de"].get(texto)
+    if codigo is None:
+        codigo = len(columna["valores"])
+        columna["valores"].append(texto)
+        columna["codigo_de"][texto] = codigo
+        for trigrama in _trigramas(texto):
+            columna["trigramas"].setdefault(trigrama, set()).add(codigo)
+    return codigo
+
+def _indexar_columna(serie):
+    es_float = pd.api.types.is_float_dtype(serie)
+    textos = serie.astype(str).str.lower()
+    textos = textos.where(serie.notna(), "")
+    codigos, valores = pd.factorize(textos, sort=False)
+    columna = {"es_float": es_float, "valores": list(valores), "codigos": codigos.astype(np.int64),
+               "trigramas": {}}
+    columna["codigo_de"] = {texto: i for i, texto in enumerate(columna["valores"])}
+    for codigo, texto in enumerate(columna["valores"]):
+        for trigrama in _trigramas(texto):
+            columna["trigramas"].setdefault(trigrama, set()).add(codigo)
+    return columna
+
+def construir_indice(df):
+    """Construye el índice de todas las columnas de la tabla"""
+    n = len(df)
+    return {
+        "ids": df.index.to_numpy(dtype=object).copy(),
+        "vivos": np.ones(n, dtype=bool),
+        "n": n,
+        "posicion": {id_fila: i for i, id_fila in enumerate(df.index)},
+        "columnas": {col: _indexar_columna(df[col]) for col in df.columns},
+    }
+
+def tamano_indice(indice):
+    """Bytes aproximados que ocupa el índice (para el límite de memoria del caché)"""
+    total = indice["ids"].nbytes + indice["vivos"].nbytes + 100 * len(indice["posicion"])
+    for columna in indice["columnas"].values():
+        total += columna["codigos"].nbytes
+        total += sum(60 + len(v) for v in columna["valores"]) * 2
+        total += 250 * len(columna["trigramas"])
+    return total
+
+
+# ==================== ACTUALIZACIÓN ====================
+
+def _asegurar_capacidad(indice, n):
+    """Agranda los arreglos al doble cuando hace falta (altas en tiempo amortizado constante)"""
+    capacidad = len(indice["vivos"])
+    if n <= capacidad:
+        return
+    nueva = max(n, capacidad * 2, 16)
+    indice["ids"] = np.concatenate([indice["ids"], np.empty(nueva - capacidad, dtype=object)])
+    indice["vivos"] = np.concatenate([indice["vivos"], np.zeros(nueva - capacidad, dtype=bool)])
+    for columna in indice["columnas"].values():
+        columna["codigos"] = np.concatenate([columna["codigos"], np.full(nueva - capacidad, -1, dtype=np.int64)])
+
+def indexar_fila(indice, id_fila, valores):
+    """Agrega o actualiza una fila; solo se reindexan las columnas presentes en `valores`"""
+    posicion = indice["posicion"].get(id_fila)
+    if posicion is None:
+        posicion = indice["n"]
+        _asegurar_capacidad(indice, posicion + 1)
+        indice["n"] += 1
+        indice["posicion"][id_fila] = posicion
+        indice["ids"][posicion] = id_fila
+        # Una fila nueva arranca vacía en todas las columnas
+        for columna in indice["columnas"].values():
+            columna["codigos"][posicion] = _codigo(columna, "")
+    indice["vivos"][posicion] = True
+    for col, valor in valores.items():
+        columna = indice["columnas"].get(col)
+        if columna is not None:
+            columna["codigos"][posicion] = _codigo(columna, _texto(valor, columna["es_float"]))
+    return indice
+
+def quitar_fila(indice, id_fila):
+    """Marca una fila como eliminada"""
+    posicion = indice["posicion"].pop(id_fila, None)
+    if posicion is not None:
+        indice["vivos"][posicion] = False
+    return indice
+
+def aplicar_operacion(indice, entrada):
+    """Actualiza el índice con una entrada de la bitácora"""
+    if entrada["op"] == "delete":
+        return quitar_fila(indice, entrada["id"])
+    if entrada["op"] == "insert" and entrada["id"] in indice["posicion"]:
+        # Un alta sobre un id existente reemplaza la fila completa
+        quitar_fila(indice, entrada["id"])
+    return indexar_fila(indice, entrada["id"], entrada.get("valores", {}))
+
+
+# ==================== CONSULTA ====================
+
+def _valores_que_contienen(columna, texto):
+    """Códigos de los valores distintos que contienen el texto"""
+    trigramas = _trigramas(texto)
+    if trigramas:
+        listas = sorted((columna["trigramas"].get(t, set()) for t in trigramas), key=len)
+        candidatos = set.intersection(*listas) if listas[0] else set()
+    else:
+        # Textos más cortos que un trigrama: se revisan los valores distintos, no las filas
+        candidatos = range(len(columna["valores"]))
+    return [c for c in candidatos if texto in columna["valores"][c]]
+
+def buscar(indice, texto, columnas=None):
+    """Retorna los ids de las filas que contienen `texto` (sin distinguir mayúsculas)
+    en alguna de las columnas indicadas (todas si no se indican), en orden de tabla"""
+    texto = texto.lower()
+    n = indice["n"]
+    coincide = np.zeros(n, dtype=bool)
+    for col in columnas or list(indice["columnas"]):
+        columna = indice["columnas"][col]
+        codigos = _valores_que_contienen(columna, texto)
+        if codigos:
+            coincide |= np.isin(columna["codigos"][:n], codigos)
+    coincide &= indice["vivos"][:n]
+    return indice["ids"][:n][coincide].tolist()
@@ -0,0 +1,247 @@
+"""Relaciones entre las tablas de la librería: claves foráneas y vistas combinadas.
+
+Las tablas de `Tables/` forman un esquema (`ventas` -> `libros` -> `autores` -> `paises`,
+`factura` -> `clientes` -> `localidades`, ...). `RELACIONES` declara cada clave foránea
+y con eso se valida la integridad de cada cambio:
+
+- Un alta o una edición solo puede apuntar a filas que existen: se busca el id en la
+  tabla referenciada con su índice hash (`claves.existe_id`), O(1) por clave.
+- Una fila no se puede eliminar mientras otra tabla la referencia. Para no recorrer
+  la tabla hija en cada baja se lleva un conteo de referencias por valor
+  (`contar_referencias`), que se arma una vez y se ajusta con cada cambio.
+
+Las vistas de `VISTAS` son tablas desnormalizadas (p. ej. ventas con el nombre y el
+precio del libro). Se arman una vez con un join por índice y después se mantienen
+con cada alta, edición o baja (`aplicar_a_vista`) en lugar de volver a unir las
+tablas en cada consulta.
+"""
+import numpy as np
+import pandas as pd
+
+from bitacora import aplicar_operaciones
+from claves import existe_id, posicion_id
+from esquemas import asignar
+
+# (tabla hija, columna, tabla padre): la columna de la hija guarda ids de la padre
+RELACIONES = (
+    ("ventas", "id_libro", "libros"),
+    ("ventas", "id_factura", "factura"),
+    ("libros", "id_autores", "autores"),
+    ("libros", "id_generos", "genero"),
+    ("libros", "id_formatos", "formato"),
+    ("autores", "id_paises", "paises"),
+    ("factura", "id_cliente", "clientes"),
+    ("clientes", "id_localidades", "localidades"),
+)
+
+# Vistas combinadas: la tabla base más columnas de las tablas a las que apunta,
+# como (clave foránea, tabla padre, {columna de la padre: nombre en la vista})
+VISTAS = {
+    "ventas_detalle": {
+        "base": "ventas",
+        "uniones": (
+            ("id_libro", "libros", {"nombre": "libro", "precio": "precio"}),
+            ("id_factura", "factura", {"fecha_emision": "fecha_emision", "id_cliente": "id_cliente"}),
+        ),
+    },
+    "libros_detalle": {
+        "base": "libros",
+        "uniones": (
+            ("id_autores", "autores", {"nombre": "autor"}),
+            ("id_generos", "genero", {"descripcion": "genero"}),
+            ("id_formatos", "formato", {"descripcion": "formato"}),
+        ),
+    },
+    "facturas_detalle": {
+        "base": "factura",
+        "uniones": (
+            ("id_cliente", "clientes", {"nombre": "cliente", "domicilio": "domicilio"}),
+        ),
+    },
+}
+
+# Cantidad máxima de errores de integridad que se informan de un lote
+MAX_ERRORES = 20
+
+
+class ErrorIntegridad(ValueError):
+    """El cambio dejaría una clave foránea apuntando a una fila que no existe"""
+
+
+def padres_de(tabla):
+    """Claves foráneas de la tabla: lista de (columna, tabla padre)"""
+    return [(columna, padre) for hija, columna, padre in RELACIONES if hija == tabla]
+
+def hijas_de(tabla):
+    """Tablas que referencian a esta: lista de (tabla hija, columna)"""
+    return [(hija, columna) for hija, columna, padre in RELACIONES if padre == tabla]
+
+
+# ==================== REFERENCIAS ====================
+
+def contar_referencias(df, columna):
+    """Cantidad de filas que apuntan a cada valor de la clave foránea"""
+    return df[columna].value_counts(dropna=True).to_dict()
+
+def _sumar(conteo, valor, cantidad):
+    if valor is None or (pd.api.types.is_scalar(valor) and pd.isna(valor)):
+        return
+    total = conteo.get(valor, 0) + cantidad
+    if total > 0:
+        conteo[valor] = total
+    else:
+        conteo.pop(valor, None)
+
+def aplicar_operacion_referencias(conteo, columna, entrada, anterior):
+    """Ajusta el conteo con una entrada de la bitácora.
+
+    `anterior` son los valores de la fila antes del cambio (None si no existía).
+    """
+    valor_anterior = None if anterior is None else anterior.get(columna)
+    if entrada["op"] == "delete":
+        valor_nuevo = None
+    elif entrada["op"] == "insert" or columna in entrada["valores"]:
+        valor_nuevo = entrada["valores"].get(columna)
+    else:
+        valor_nuevo = valor_anterior
+    _sumar(conteo, valor_anterior, -1)
+    _sumar(conteo, valor_nuevo, 1)
+    return conteo
+
+
+# ==================== VALIDACIÓN ====================
+
+def verificar_fila(tabla, valores, cargar):
+    """Lanza ErrorIntegridad si alguna clave foránea de `valores` no existe en su tabla.
+
+    `cargar(tabla)` retorna la tabla vigente (o None si no está disponible).
+    """
+    faltantes = []
+    for columna, padre in padres_de(tabla):
+        valor = valores.get(columna)
+        if valor is None or (pd.api.types.is_scalar(valor) and pd.isna(valor)):
+            continue
+        df_padre = cargar(padre)
+        if df_padre is not None and not existe_id(df_padre, valor):
+            faltantes.append(f"{columna} = {valor} no existe en {padre}")
+    if faltantes:
+        raise ErrorIntegridad("; ".join(faltantes))
+
+def verificar_baja(tabla, id_fila, referencias):
+    """Lanza ErrorIntegridad si alguna tabla referencia la fila.
+
+    `referencias(hija, columna)` retorna el conteo de referencias de esa clave.
+    """
+    usos = []
+    for hija, columna in hijas_de(tabla):
+        cantidad = referencias(hija, columna).get(id_fila, 0)
+        if cantidad:
+            usos.append(f"{cantidad} filas de {hija} ({columna})")
+    if usos:
+        raise ErrorIntegridad(f"La fila {id_fila} está referenciada por " + ", ".join(usos))
+
+def verificar_lote(tabla, filas, bajas, cargar, referencias):
+    """Errores de integridad de un lote: claves foráneas inexistentes en `filas` (altas y
+    correcciones, con los ids como índice) e ids referenciados en `bajas`"""
+    errores = []
+    for columna, padre in padres_de(tabla):
+        df_padre = cargar(padre)
+        if df_padre is None:
+            continue
+        for df in filas:
+            if df is None or columna not in df.columns:
+                continue
+            valores = df[columna].dropna()
+            faltantes = valores[~valores.isin(df_padre.index)]
+            for id_fila, valor in faltantes.items():
+                errores.append(f"Fila {'nueva' if pd.isna(id_fila) else id_fila}: {columna} = {valor} no existe en {padre}")
+    for id_fila in bajas if bajas is not None else []:
+        try:
+            verificar_baja(tabla, id_fila, referencias)
+        except ErrorIntegridad as e:
+            errores.append(str(e))
+    if len(errores) > MAX_ERRORES:
+        errores = errores[:MAX_ERRORES] + [f"... y {len(errores) - MAX_ERRORES} errores más"]
+    return errores
+
+
+# ==================== VISTAS ====================
+
+def tablas_de_vista(nombre):
+    """Tablas de las que depende una vista (la base primero)"""
+    definicion = VISTAS[nombre]
+    return [definicion["base"]] + [padre for _, padre, _ in definicion["uniones"]]
+
+def vistas_de(tabla):
+    """Vistas en las que participa la tabla"""
+    return [nombre for nombre in VISTAS if tabla in tablas_de_vista(nombre)]
+
+def construir_vista(nombre, cargar):
+    """Arma la vista uniendo la tabla base con sus tablas padre por índice"""
+    definicion = VISTAS[nombre]
+    base = cargar(definicion["base"])
+    if base is None:
+        return None
+    resultado = base.copy(deep=False)
+    for clave_foranea, padre, columnas in definicion["uniones"]:
+        df_padre = cargar(padre)
+        if df_padre is None or clave_foranea not in base.columns:
+            continue
+        df_padre = df_padre if df_padre.index.is_unique else df_padre.loc[~df_padre.index.duplicated()]
+        columnas = {c: alias for c, alias in columnas.items() if c in df_padre.columns}
+        # Join por la tabla hash del índice de la padre: una búsqueda por fila, sin ordenar
+        unidas = df_padre[list(columnas)].reindex(base[clave_foranea].to_numpy())
+        for columna, alias in columnas.items():
+            resultado[alias] = unidas[columna].set_axis(base.index)
+    return resultado
+
+def _valores_unidos(definicion, valores, cargar, todas):
+    """Columnas de las tablas padre para una fila de la base (solo las uniones cuya
+    clave está en `valores`, o todas si `todas`)"""
+    unidos = {}
+    for clave_foranea, padre, columnas in definicion["uniones"]:
+        if not todas and clave_foranea not in valores:
+            continue
+        df_padre = cargar(padre)
+        if df_padre is None:
+            continue
+        posicion = posicion_id(df_padre, valores.get(clave_foranea))
+        for columna, alias in columnas.items():
+            if columna in df_padre.columns:
+                unidos[alias] = None if posicion is None else df_padre[columna].iloc[posicion]
+    return unidos
+
+def aplicar_a_vista(vista, nombre, tabla, entrada, cargar):
+    """Retorna una copia de la vista con un cambio de una de sus tablas aplicado.
+
+    Un cambio en la base toca solo esa fila (buscando sus columnas unidas por id); un
+    cambio en una tabla padre actualiza las filas de la vista que la referencian.
+    """
+    definicion = VISTAS[nombre]
+    if tabla == definicion["base"]:
+        if entrada["op"] != "delete":
+            valores = dict(entrada["valores"])
+            valores.update(_valores_unidos(definicion, valores, cargar, entrada["op"] == "insert"))
+            entrada = {**entrada, "valores": {c: v for c, v in valores.items() if c in vista.columns}}
+        return aplicar_operaciones(vista, [entrada])
+
+    resultado = vista.copy(deep=False)
+    for clave_foranea, padre, columnas in definicion["uniones"]:
+        if padre != tabla or clave_foranea not in vista.columns:
+            continue
+        posiciones = np.flatnonzero(vista[clave_foranea].to_numpy() == entrada["id"])
+        if not len(posiciones):
+            continue
+        for columna, alias in columnas.items():
+            if alias not in resultado.columns:
+                continue
+            if entrada["op"] == "delete":
+                valor = None
+            elif columna in entrada["valores"]:
+                valor = entrada["valores"][columna]
+            elif entrada["op"] == "insert":
+                valor = None
+            else:
+                continue
+            resultado[alias] = asignar(resultado[alias], posiciones, [valor] * len(posiciones))
+    return resultado
@@ -0,0 +1,101 @@
+"""Vista paginada de tablas: ordenar, filtrar y recortar del lado del servidor.
+
+En lugar de mandar la tabla completa al navegador en cada interacción, se calcula en
+el servidor qué filas corresponden a la página pedida (con el orden y el filtro
+elegidos) y solo esas se muestran. Lo que se envía tiene siempre el tamaño de una
+página, sin importar el tamaño de la tabla.
+
+El orden de cada columna (`argsort`) y su factorización en valores distintos se
+calculan una vez por tabla cargada y se reutilizan mientras el caché conserve la
+misma tabla; al cambiar la tabla el caché entrega un objeto nuevo y se recalculan.
+"""
+import weakref
+
+import numpy as np
+import pandas as pd
+
+from indice_busqueda import buscar
+
+# Opción de orden que respeta el orden de la tabla
+ORDEN_TABLA = None
+
+_calculos = {}  # (id(df), tipo, columna) -> (referencia débil a df, resultado)
+
+
+def _memorizar(df, tipo, columna, calcular):
+    """Resultado de `calcular()` para esta tabla, reutilizado mientras la tabla exista"""
+    clave = (id(df), tipo, columna)
+    guardado = _calculos.get(clave)
+    if guardado is not None and guardado[0]() is df:
+        return guardado[1]
+    resultado = calcular()
+    # Se descartan los cálculos de tablas que ya no existen
+    for k in [k for k, (ref, _) in _calculos.items() if ref() is None]:
+        _calculos.pop(k, None)
+    _calculos[clave] = (weakref.ref(df), resultado)
+    return resultado
+
+def _valores(df, columna):
+    return df.index if columna == df.index.name else df[columna]
+
+def orden(df, columna, ascendente=True):
+    """Posiciones de las filas ordenadas por la columna (o por el índice si `columna`
+    es su nombre); los vacíos quedan al final"""
+    def calcular():
+        valores = _valores(df, columna)
+        try:
+            return np.asarray(pd.Series(valores).reset_index(drop=True)
+                              .sort_values(kind="stable", na_position="last").index)
+        except TypeError:
+            # Columnas con tipos mezclados: se ordenan como texto
+            texto = pd.Series(valores).reset_index(drop=True)
+            texto = texto.astype(str).where(texto.notna())
+            return np.asarray(texto.sort_values(kind="stable", na_position="last").index)
+
+    posiciones = _memorizar(df, "orden", columna, calcular)
+    if ascendente:
+        return posiciones
+    # Descendente: se invierte el orden de los valores, pero los vacíos siguen al final
+    vacios = int(pd.isna(_valores(df, columna)).sum())
+    return np.concatenate([posiciones[:len(posiciones) - vacios][::-1], posiciones[len(posiciones) - vacios:]])
+
+def _factorizar(df, columna):
+    """Códigos por fila y valores distintos de la columna en minúsculas"""
+    def calcular():
+        codigos, distintos = pd.factorize(_valores(df, columna), sort=False)
+        return codigos, pd.Index(distintos).astype(str).str.lower()
+    return _memorizar(df, "factorizacion", columna, calcular)
+
+def filtrar(df, texto, columnas=None, indice=None):
+    """Máscara de las filas que contienen `texto` (sin distinguir mayúsculas) en alguna
+    de las columnas indicadas (todas si no se indican).
+
+    Si se pasa el índice de búsqueda de la tabla se usa directamente; si no, el texto
+    se busca solo entre los valores distintos de cada columna.
+    """
+    texto = texto.lower()
+    if indice is not None and df.index.is_unique:
+        posiciones = df.index.get_indexer(buscar(indice, texto, columnas))
+        mascara = np.zeros(len(df), dtype=bool)
+        mascara[posiciones[posiciones >= 0]] = True
+        return mascara
+
+    mascara = np.zeros(len(df), dtype=bool)
+    for col in columnas or list(df.columns):
+        codigos, distintos = _factorizar(df, col)
+        coincide = np.asarray(distintos.str.contains(texto, regex=False), dtype=bool)
+        # Los vacíos tienen código -1 y no coinciden nunca
+        mascara |= np.append(coincide, False)[codigos]
+    return mascara
+
+def posiciones_visibles(df, columna_orden=ORDEN_TABLA, ascendente=True, texto="",
+                        columnas_filtro=None, indice=None):
+    """Posiciones de las filas que cumplen el filtro, en el orden pedido; la página
+    se obtiene recortando este arreglo"""
+    if columna_orden is ORDEN_TABLA:
+        posiciones = np.arange(len(df)) if ascendente else np.arange(len(df))[::-1]
+    else:
+        posiciones = orden(df, columna_orden, ascendente)
+    if texto:
+        posiciones = posiciones[filtrar(df, texto, columnas_filtro, indice)[posiciones]]
+    return posiciones
@@ -0,0 +1,167 @@
+"""Cruces y agregados de ventas resueltos en una sola consulta SQL.
+
+En lugar de traer cada tabla con `SELECT *` y unirlas con ocho `.merge` de pandas
+(cada uno copia el DataFrame que va creciendo), los joins y los `GROUP BY` se
+arman como una consulta y los resuelve el motor: la base de datos o, sobre las
+tablas exportadas a Parquet/CSV, DuckDB (opcional, `pip install duckdb`). A pandas
+llegan solo los resultados agregados.
+
+Cada consulta une únicamente las tablas que necesita su dimensión (el agregado por
+género no toca clientes ni localidades), y su resultado queda en la caché de
+`libreria.consultar` hasta que cambie alguna de esas tablas.
+"""
+import importlib.util
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from libreria import TABLAS, consultar
+
+HAY_DUCKDB = importlib.util.find_spec("duckdb") is not None
+
+# Alias -> (tabla, condición del join, alias de los que depende)
+UNIONES = {
+    "l": ("libros", "l.id_libro = v.id_libro", ()),
+    "a": ("autores", "a.id_autores = l.id_autores", ("l",)),
+    "g": ("generos", "g.id_generos = l.id_generos", ("l",)),
+    "fo": ("formatos", "fo.id_formatos = l.id_formatos", ("l",)),
+    "p": ("paises", "p.id_paises = a.id_paises", ("a",)),
+    "f": ("factura", "f.id_factura = v.id_factura", ()),
+    "c": ("clientes", "c.id_clientes = f.id_cliente", ("f",)),
+    "lo": ("localidades", "lo.id_localidades = c.id_localidades", ("c",)),
+}
+
+# Dimensión -> expresión SQL
+DIMENSIONES = {
+    "libro": "l.nombre",
+    "autor": "a.nombre",
+    "genero": "g.descripcion",
+    "formato": "fo.descripcion",
+    "pais": "p.descripcion",
+    "cliente": "c.nombre",
+    "localidad": "lo.descripcion",
+}
+
+# Agregados del notebook: dimensión, columna por la que se ordena (descendente; None
+# ordena por la dimensión) y cantidad de filas (None: todas)
+AGREGADOS = {
+    "ventas_por_genero": {"dimension": "genero", "orden": "monto_venta", "limite": None},
+    "top_libros": {"dimension": "libro", "orden": "cantidad", "limite": 10},
+    "ventas_por_autor": {"dimension": "autor", "orden": "monto_venta", "limite": 10},
+    "ventas_por_formato": {"dimension": "formato", "orden": None, "limite": None},
+    "ventas_por_localidad": {"dimension": "localidad", "orden": "monto_venta", "limite": 10},
+    "top_clientes": {"dimension": "cliente", "orden": "monto_venta", "limite": 10, "facturas": True},
+}
+
+# Columnas de `top_clientes` como se muestran en el notebook
+COLUMNAS_CLIENTES = {"facturas": "Facturas", "cantidad": "Libros comprados", "monto_venta": "Total gastado"}
+
+# Columnas de la tabla de ventas completa (una fila por línea de venta)
+COLUMNAS_VENTAS = {
+    "id_ventas": "v.id_ventas",
+    "id_factura": "v.id_factura",
+    "id_libro": "v.id_libro",
+    "cantidad": "v.cantidad",
+    "libro": "l.nombre",
+    "precio": "l.precio",
+    "autor": "a.nombre",
+    "genero": "g.descripcion",
+    "formato": "fo.descripcion",
+    "pais": "p.descripcion",
+    "fecha_emision": "f.fecha_emision",
+    "id_cliente": "f.id_cliente",
+    "cliente": "c.nombre",
+    "localidad": "lo.descripcion",
+}
+
+
+def _alias_usados(expresiones):
+    """Alias de `UNIONES` que aparecen en las expresiones, con sus dependencias"""
+    usados = set()
+    pendientes = [alias for alias in UNIONES if any(expr.startswith(f"{alias}.") for expr in expresiones)]
+    while pendientes:
+        alias = pendientes.pop()
+        if alias not in usados:
+            usados.add(alias)
+            pendientes.extend(UNIONES[alias][2])
+    return [alias for alias in UNIONES if alias in usados]  # en el orden de UNIONES
+
+def desde_ventas(expresiones):
+    """Cláusula FROM con los joins necesarios y las tablas que lee"""
+    alias = _alias_usados(expresiones)
+    joins = "".join(f"\nLEFT JOIN {UNIONES[a][0]} {a} ON {UNIONES[a][1]}" for a in alias)
+    return f"FROM ventas v{joins}", ["ventas"] + [UNIONES[a][0] for a in alias]
+
+def consulta_agregado(nombre):
+    """SQL de un agregado de `AGREGADOS` y las tablas que lee"""
+    definicion = AGREGADOS[nombre]
+    dimension = definicion["dimension"]
+    expresion = DIMENSIONES[dimension]
+    medidas = ["SUM(v.cantidad) AS cantidad", "SUM(v.cantidad * l.precio) AS monto_venta"]
+    if definicion.get("facturas"):
+        medidas.insert(0, "COUNT(DISTINCT v.id_factura) AS facturas")
+    desde, tablas = desde_ventas([expresion, "l.precio"])
+    orden = f"{definicion['orden']} DESC, {dimension}" if definicion["orden"] else dimension
+    consulta = (f"SELECT {expresion} AS {dimension}, {', '.join(medidas)}\n{desde}\n"
+                f"WHERE {expresion} IS NOT NULL\nGROUP BY {expresion}\nORDER BY {orden}")
+    if definicion["limite"]:
+        consulta += f"\nLIMIT {int(definicion['limite'])}"
+    return consulta, tablas
+
+def consulta_ventas(columnas=None):
+    """SQL de la tabla de ventas completa (solo con las `columnas` pedidas) y las tablas que lee"""
+    columnas = {c: COLUMNAS_VENTAS[c] for c in (columnas or COLUMNAS_VENTAS)}
+    desde, tablas = desde_ventas(columnas.values())
+    return f"SELECT {', '.join(f'{expr} AS {col}' for col, expr in columnas.items())}\n{desde}", tablas
+
+
+# ==================== EJECUCIÓN ====================
+
+def _archivo(carpeta, tabla):
+    """Archivo exportado de una tabla (Parquet si existe, si no CSV)"""
+    for extension in ("parquet", "csv"):
+        ruta = os.path.join(carpeta, f"{TABLAS.get(tabla, tabla)}.{extension}")
+        if os.path.exists(ruta):
+            return ruta
+    raise FileNotFoundError(f"No se encontró la tabla {tabla} en {carpeta}")
+
+def consultar_archivos(consulta, tablas, carpeta):
+    """Ejecuta la consulta con DuckDB sobre las tablas exportadas en `carpeta`"""
+    if not HAY_DUCKDB:
+        raise ImportError("Consultar los archivos exportados requiere duckdb (pip install duckdb)")
+    import duckdb
+    conexion = duckdb.connect()
+    try:
+        for tabla in dict.fromkeys(tablas):
+            ruta = _archivo(carpeta, tabla).replace("'", "''")
+            lector = "read_parquet" if ruta.endswith(".parquet") else "read_csv_auto"
+            conexion.execute(f"CREATE VIEW {tabla} AS SELECT * FROM {lector}('{ruta}')")
+        return conexion.execute(consulta).df()
+    finally:
+        conexion.close()
+
+def _ejecutar(consulta, tablas, origen, carpeta):
+    if carpeta is not None:
+        return consultar_archivos(consulta, tablas, carpeta)
+    return consultar(consulta, tablas=tablas, origen=origen)
+
+def agregado(nombre, origen=None, carpeta=None):
+    """Resultado de un agregado de `AGREGADOS`, con la dimensión como índice.
+
+    Se consulta la base de `origen` (motor o URL; la predeterminada si no se indica)
+    o, si se pasa `carpeta`, las tablas exportadas ahí con DuckDB.
+    """
+    consulta, tablas = consulta_agregado(nombre)
+    df = _ejecutar(consulta, tablas, origen, carpeta).set_index(AGREGADOS[nombre]["dimension"])
+    # Los tipos de las sumas dependen del motor (DuckDB suma enteros como HUGEINT)
+    df["cantidad"] = df["cantidad"].astype("int64")
+    df["monto_venta"] = df["monto_venta"].astype("float64")
+    if AGREGADOS[nombre].get("facturas"):
+        df = df.rename(columns=COLUMNAS_CLIENTES)
+    return df
+
+def ventas_completo(columnas=None, origen=None, carpeta=None):
+    """Tabla de ventas unida con libros, autores, géneros, formatos, países, facturas,
+    clientes y localidades, en una sola consulta"""
+    consulta, tablas = consulta_ventas(columnas)
+    return _ejecutar(consulta, tablas, origen, carpeta)
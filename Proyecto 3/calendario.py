@@ -0,0 +1,133 @@
+"""Dimensión calendario.
+
+Una fila por día, indexada por la clave entera `AAAAMMDD`, con los atributos de
+fecha que usan los análisis: año, mes, nombre del mes, trimestre, semana ISO, día
+de la semana, fin de semana y feriados nacionales de Argentina.
+
+La tabla de hechos guarda la clave de la fecha de cada venta (`clave_fecha`), así
+que esos atributos se agregan con un join por entero en lugar de formatear cada
+fecha (`strftime('%B')` formatea fila por fila y depende del locale del sistema).
+Los nombres de meses y días están en castellano, sin depender del locale.
+
+El calendario se genera una vez por años completos y se guarda en
+`datos/calendario.parquet`; se vuelve a generar solo si se piden fechas fuera de él.
+"""
+import os
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+CARPETA_DATOS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "datos")
+NOMBRE_CALENDARIO = "calendario"
+
+MESES = ["enero", "febrero", "marzo", "abril", "mayo", "junio", "julio", "agosto",
+         "septiembre", "octubre", "noviembre", "diciembre"]
+DIAS = ["lunes", "martes", "miércoles", "jueves", "viernes", "sábado", "domingo"]
+
+# Feriados nacionales de fecha fija (mes, día). Los trasladables se toman en su fecha nominal.
+FERIADOS_FIJOS = {
+    (1, 1): "Año Nuevo",
+    (3, 24): "Día de la Memoria por la Verdad y la Justicia",
+    (4, 2): "Día del Veterano y de los Caídos en la Guerra de Malvinas",
+    (5, 1): "Día del Trabajador",
+    (5, 25): "Día de la Revolución de Mayo",
+    (6, 17): "Paso a la Inmortalidad del General Güemes",
+    (6, 20): "Paso a la Inmortalidad del General Belgrano",
+    (7, 9): "Día de la Independencia",
+    (8, 17): "Paso a la Inmortalidad del General San Martín",
+    (10, 12): "Día del Respeto a la Diversidad Cultural",
+    (11, 20): "Día de la Soberanía Nacional",
+    (12, 8): "Inmaculada Concepción de María",
+    (12, 25): "Navidad",
+}
+
+# Feriados que dependen de la Pascua: días respecto del domingo de Pascua
+FERIADOS_PASCUA = {-48: "Carnaval", -47: "Carnaval", -2: "Viernes Santo"}
+
+
+def clave_fecha(fechas):
+    """Clave entera `AAAAMMDD` de una serie de fechas (vacía donde no hay fecha)"""
+    fechas = pd.Series(fechas)
+    clave = fechas.dt.year * 10000 + fechas.dt.month * 100 + fechas.dt.day
+    return clave.astype("Int32")
+
+def pascua(año):
+    """Domingo de Pascua del año (calendario gregoriano)"""
+    a, b, c = año % 19, año // 100, año % 100
+    d, e = divmod(b, 4)
+    g = (8 * b + 13) // 25
+    h = (19 * a + b - d - g + 15) % 30
+    i, k = divmod(c, 4)
+    l = (32 + 2 * e + 2 * i - h - k) % 7
+    m = (a + 11 * h + 22 * l) // 451
+    mes, dia = divmod(h + l - 7 * m + 114, 31)
+    return pd.Timestamp(año, mes, dia + 1)
+
+def feriados(año_desde, año_hasta):
+    """Serie fecha -> nombre de los feriados nacionales de esos años"""
+    dias = {}
+    for año in range(año_desde, año_hasta + 1):
+        for (mes, dia), nombre in FERIADOS_FIJOS.items():
+            dias[pd.Timestamp(año, mes, dia)] = nombre
+        domingo = pascua(año)
+        for desplazamiento, nombre in FERIADOS_PASCUA.items():
+            dias[domingo + pd.Timedelta(days=desplazamiento)] = nombre
+    return pd.Series(dias, dtype="string").sort_index()
+
+def construir_calendario(año_desde, año_hasta):
+    """Calendario de los años completos `año_desde` a `año_hasta`"""
+    fechas = pd.date_range(f"{año_desde}-01-01", f"{año_hasta}-12-31", freq="D")
+    dia_semana = fechas.dayofweek
+    nombres_feriados = feriados(año_desde, año_hasta).reindex(fechas)
+    calendario = pd.DataFrame({
+        "fecha": fechas,
+        "año": fechas.year.astype("int16"),
+        "mes": fechas.month.astype("int8"),
+        "mes_nombre": pd.Categorical.from_codes(fechas.month - 1, MESES),
+        "trimestre": fechas.quarter.astype("int8"),
+        "semana": fechas.isocalendar().week.to_numpy().astype("int8"),
+        "dia": fechas.day.astype("int8"),
+        "dia_semana": dia_semana.astype("int8"),
+        "dia_nombre": pd.Categorical.from_codes(dia_semana, DIAS),
+        "fin_de_semana": np.asarray(dia_semana >= 5),
+        "feriado": nombres_feriados.notna().to_numpy(),
+        "nombre_feriado": nombres_feriados.array,
+    }, index=pd.Index(clave_fecha(fechas).to_numpy("int32"), name="clave_fecha"))
+    calendario["laborable"] = ~(calendario["fin_de_semana"] | calendario["feriado"])
+    return calendario
+
+def _ruta(carpeta):
+    return os.path.join(carpeta, f"{NOMBRE_CALENDARIO}.parquet")
+
+def calendario(desde, hasta, carpeta=CARPETA_DATOS):
+    """Calendario que cubre las fechas `desde` a `hasta` (el guardado, si alcanza)"""
+    año_desde, año_hasta = pd.Timestamp(desde).year, pd.Timestamp(hasta).year
+    ruta = _ruta(carpeta)
+    if os.path.exists(ruta):
+        guardado = pd.read_parquet(ruta)
+        if guardado["año"].min() <= año_desde and guardado["año"].max() >= año_hasta:
+            return guardado
+        año_desde = min(año_desde, int(guardado["año"].min()))
+        año_hasta = max(año_hasta, int(guardado["año"].max()))
+    nuevo = construir_calendario(año_desde, año_hasta)
+    os.makedirs(carpeta, exist_ok=True)
+    descriptor, temporal = tempfile.mkstemp(dir=carpeta, suffix=".tmp")
+    os.close(descriptor)
+    nuevo.to_parquet(temporal)
+    os.replace(temporal, ruta)
+    return nuevo
+
+def unir_calendario(df, columnas=None, carpeta=CARPETA_DATOS):
+    """`df` con los atributos del calendario (`columnas`, o todos menos la fecha)
+    de su `clave_fecha` (o, si no la tiene, de su `fecha_emision`)"""
+    if "clave_fecha" not in df.columns:
+        df = df.assign(clave_fecha=clave_fecha(df["fecha_emision"]))
+    fechas = df["clave_fecha"].dropna()
+    hoy = pd.Timestamp.today()
+    desde, hasta = (hoy, hoy) if fechas.empty else \
+        (pd.to_datetime(str(int(f)), format="%Y%m%d") for f in (fechas.min(), fechas.max()))
+    cal = calendario(desde, hasta, carpeta)
+    columnas = columnas or [c for c in cal.columns if c != "fecha" and c not in df.columns]
+    # Join por clave entera: el calendario tiene una fila por día, no por venta
+    return df.join(cal[columnas], on="clave_fecha")
@@ -0,0 +1,286 @@
+"""Análisis de canasta: libros que se compran juntos.
+
+Cada factura es una canasta con los libros de sus ventas. Se buscan los conjuntos
+de libros que aparecen juntos en al menos `soporte_minimo` de las facturas
+(conjuntos frecuentes) y de ellos salen las reglas "quien compra A también compra B"
+con su confianza y lift.
+
+- Representación dispersa: por cada libro se guarda la lista ordenada de las
+  facturas (posiciones) en que aparece. Nunca se arma la matriz facturas x libros,
+  así que el catálogo puede tener cientos de miles de libros: la memoria depende de
+  la cantidad de líneas de venta.
+- Eclat: el soporte de un conjunto es el largo de la intersección de las listas de
+  sus libros. Se recorre en profundidad, por prefijo, y cada prefijo de un libro es
+  independiente de los demás, así que se reparten entre procesos.
+- Actualización incremental: además de los conjuntos frecuentes se guarda su
+  borde negativo (los que no llegan al soporte pero todos sus subconjuntos sí). Con
+  ventas nuevas solo se cuentan esos conjuntos en las facturas que cambiaron; si
+  ninguno cruza el umbral, el resultado es exacto sin recorrer las demás facturas.
+  Si alguno lo cruza, o la tabla de hechos se reconstruyó, se vuelve a minar todo.
+"""
+import json
+import math
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from itertools import combinations
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+from hechos import CARPETA_DATOS, iterar_hechos, leer_estado, leer_hechos, nombres_dimension
+
+NOMBRE_CANASTA = "canasta"
+
+# Parte de las facturas en que tiene que aparecer un conjunto para ser frecuente
+SOPORTE_MINIMO = 0.02
+
+# Confianza mínima de las reglas: P(consecuente | antecedente)
+CONFIANZA_MINIMA = 0.3
+
+# Cantidad máxima de libros por conjunto (None: sin límite)
+LARGO_MAXIMO = 4
+
+# Procesos para minar; con pocos libros frecuentes no conviene repartir
+PROCESOS = os.cpu_count() or 1
+MIN_LIBROS_PARALELO = 64
+
+
+# ==================== CANASTAS ====================
+
+def listas_por_libro(pares):
+    """(facturas, conteos, listas) de los pares id_factura/id_libro.
+
+    `facturas` son los ids de factura en orden (la posición de cada una es su índice),
+    `conteos` la cantidad de facturas por libro y `listas` {libro: posiciones ordenadas}.
+    """
+    pares = pares.dropna(subset=["id_factura", "id_libro"])
+    facturas, posicion = np.unique(pares["id_factura"].to_numpy("int64"), return_inverse=True)
+    libros = pares["id_libro"].to_numpy("int64")
+    # Sin repetidos (el mismo libro en dos líneas de una factura), ordenado por libro y posición
+    clave = np.unique(libros * len(facturas) + posicion) if len(facturas) else np.empty(0, "int64")
+    libros, posicion = np.divmod(clave, max(len(facturas), 1))
+    cortes = np.flatnonzero(np.diff(libros)) + 1
+    inicios = np.concatenate([[0], cortes]) if len(libros) else np.empty(0, "int64")
+    conteos = pd.Series(np.diff(np.append(inicios, len(libros))), index=libros[inicios], dtype="int64")
+    listas = {int(libro): tids for libro, tids in zip(libros[inicios], np.split(posicion, cortes))}
+    return facturas, conteos, listas
+
+def _pares(lotes):
+    lotes = [lote[["id_factura", "id_libro"]] for lote in lotes]
+    if not lotes:
+        return pd.DataFrame({"id_factura": pd.Series(dtype="int64"), "id_libro": pd.Series(dtype="int64")})
+    return pd.concat(lotes, ignore_index=True)
+
+
+# ==================== ECLAT ====================
+
+# Libros frecuentes de cada proceso (se pasan una sola vez, al iniciarlo)
+_LIBROS, _MINIMO, _LARGO = [], 1, None
+
+def _iniciar(libros, minimo, largo):
+    global _LIBROS, _MINIMO, _LARGO
+    _LIBROS, _MINIMO, _LARGO = libros, minimo, largo
+
+def _extender(conjunto, tids, resto, frecuentes, candidatos):
+    """Registra `conjunto` (que aparece en las facturas `tids`) y lo extiende en
+    profundidad con cada libro de `resto`: [(libro, posiciones)] posteriores a él"""
+    frecuentes[conjunto] = len(tids)
+    if _LARGO is not None and len(conjunto) >= _LARGO:
+        return
+    siguiente = []
+    for otro, tids_otro in resto:
+        comun = np.intersect1d(tids, tids_otro, assume_unique=True)
+        if len(comun) >= _MINIMO:
+            siguiente.append((otro, comun))
+        else:
+            candidatos[conjunto + (otro,)] = len(comun)
+    for j, (otro, comun) in enumerate(siguiente):
+        _extender(conjunto + (otro,), comun, siguiente[j + 1:], frecuentes, candidatos)
+
+def _clase(i):
+    """Conjuntos frecuentes que empiezan por el libro `i` y candidatos al borde"""
+    frecuentes, candidatos = {}, {}
+    libro, tids = _LIBROS[i]
+    _extender((libro,), tids, _LIBROS[i + 1:], frecuentes, candidatos)
+    return frecuentes, candidatos
+
+def minimo_facturas(soporte_minimo, facturas):
+    """Cantidad de facturas que corresponde al soporte mínimo"""
+    return max(1, math.ceil(soporte_minimo * facturas))
+
+def minar(pares, soporte_minimo=SOPORTE_MINIMO, largo_maximo=LARGO_MAXIMO, procesos=PROCESOS):
+    """Conjuntos frecuentes de las canastas y su borde negativo.
+
+    Retorna {"facturas": cantidad de canastas, "frecuentes": {conjunto: facturas},
+    "borde": {conjunto: facturas}}, con los conjuntos como tuplas ordenadas de ids.
+    """
+    facturas, conteos, listas = listas_por_libro(pares)
+    minimo = minimo_facturas(soporte_minimo, len(facturas))
+    # Solo los libros frecuentes, por soporte creciente: las intersecciones se achican antes
+    libros = sorted(((libro, tids) for libro, tids in listas.items() if len(tids) >= minimo),
+                    key=lambda par: (len(par[1]), par[0]))
+    frecuentes, candidatos = {}, {}
+    if procesos > 1 and len(libros) >= MIN_LIBROS_PARALELO:
+        with ProcessPoolExecutor(procesos, initializer=_iniciar, initargs=(libros, minimo, largo_maximo)) as pool:
+            for f, c in pool.map(_clase, range(len(libros))):
+                frecuentes.update(f)
+                candidatos.update(c)
+    else:
+        _iniciar(libros, minimo, largo_maximo)
+        for i in range(len(libros)):
+            f, c = _clase(i)
+            frecuentes.update(f)
+            candidatos.update(c)
+    frecuentes = {tuple(sorted(c)): n for c, n in frecuentes.items()}
+    # Borde negativo: libros sueltos no frecuentes y candidatos con todos sus subconjuntos frecuentes
+    borde = {(int(libro),): int(n) for libro, n in conteos.items() if n < minimo}
+    for conjunto, n in candidatos.items():
+        conjunto = tuple(sorted(conjunto))
+        if all(sub in frecuentes for sub in combinations(conjunto, len(conjunto) - 1)):
+            borde[conjunto] = n
+    return {"facturas": len(facturas), "frecuentes": frecuentes, "borde": borde}
+
+
+# ==================== ACTUALIZACIÓN ====================
+
+def _contar(conjuntos, listas):
+    """Facturas que contienen cada conjunto, según las listas por libro dadas"""
+    vacia = np.empty(0, "int64")
+    cuentas = {}
+    for conjunto in conjuntos:
+        tids = listas.get(conjunto[0], vacia)
+        for libro in conjunto[1:]:
+            if not len(tids):
+                break
+            tids = np.intersect1d(tids, listas.get(libro, vacia), assume_unique=True)
+        cuentas[conjunto] = len(tids)
+    return cuentas
+
+def sumar_ventas(modelo, nuevas, anteriores, soporte_minimo):
+    """Suma al modelo las ventas `nuevas`; `anteriores` son las líneas ya contadas
+    de las mismas facturas. Retorna False si el conjunto de frecuentes cambia y hay
+    que volver a minar."""
+    canastas_antes, _, listas_antes = listas_por_libro(anteriores)
+    canastas_despues, conteos, listas_despues = listas_por_libro(pd.concat([anteriores, nuevas]))
+    facturas = modelo["facturas"] + len(canastas_despues) - len(canastas_antes)
+    minimo = minimo_facturas(soporte_minimo, facturas)
+    # Libros que aparecen por primera vez: su conteo anterior era 0
+    for libro in conteos.index:
+        if (int(libro),) not in modelo["frecuentes"]:
+            modelo["borde"].setdefault((int(libro),), 0)
+    for grupo in ("frecuentes", "borde"):
+        despues = _contar(modelo[grupo], listas_despues)
+        antes = _contar(modelo[grupo], listas_antes)
+        for conjunto in modelo[grupo]:
+            modelo[grupo][conjunto] += despues[conjunto] - antes[conjunto]
+    modelo["facturas"] = facturas
+    return all(n >= minimo for n in modelo["frecuentes"].values()) \
+        and all(n < minimo for n in modelo["borde"].values())
+
+def _carpeta_canasta(carpeta):
+    return os.path.join(carpeta, NOMBRE_CANASTA)
+
+def guardar_canasta(modelo, carpeta=CARPETA_DATOS):
+    """Guarda los conjuntos (frecuentes y del borde) en Parquet y el estado en `canasta.json`"""
+    destino = _carpeta_canasta(carpeta)
+    os.makedirs(destino, exist_ok=True)
+    conjuntos = list(modelo["frecuentes"].items()) + list(modelo["borde"].items())
+    tabla = pa.table({
+        "libros": pa.array([list(c) for c, _ in conjuntos], pa.list_(pa.int64())),
+        "facturas": pa.array([n for _, n in conjuntos], pa.int64()),
+        "frecuente": pa.array([True] * len(modelo["frecuentes"]) + [False] * len(modelo["borde"])),
+    })
+    descriptor, temporal = tempfile.mkstemp(dir=destino, suffix=".tmp")
+    os.close(descriptor)
+    pq.write_table(tabla, temporal)
+    os.replace(temporal, os.path.join(destino, "conjuntos.parquet"))
+    descriptor, temporal = tempfile.mkstemp(dir=destino, suffix=".tmp")
+    with os.fdopen(descriptor, "w", encoding="utf-8") as f:
+        json.dump({**modelo["estado"], "facturas": modelo["facturas"]}, f, indent=2)
+    os.replace(temporal, os.path.join(destino, f"{NOMBRE_CANASTA}.json"))
+
+def cargar_canasta(carpeta=CARPETA_DATOS):
+    """Modelo guardado (None si todavía no se minó)"""
+    destino = _carpeta_canasta(carpeta)
+    ruta_estado = os.path.join(destino, f"{NOMBRE_CANASTA}.json")
+    if not os.path.exists(ruta_estado):
+        return None
+    with open(ruta_estado, "r", encoding="utf-8") as f:
+        estado = json.load(f)
+    tabla = pq.read_table(os.path.join(destino, "conjuntos.parquet")).to_pydict()
+    modelo = {"estado": estado, "facturas": estado.pop("facturas"), "frecuentes": {}, "borde": {}}
+    for libros, n, frecuente in zip(tabla["libros"], tabla["facturas"], tabla["frecuente"]):
+        modelo["frecuentes" if frecuente else "borde"][tuple(libros)] = n
+    return modelo
+
+def actualizar_canasta(carpeta=CARPETA_DATOS, soporte_minimo=SOPORTE_MINIMO, largo_maximo=LARGO_MAXIMO,
+                       procesos=PROCESOS):
+    """Pone los conjuntos frecuentes al día con la tabla de hechos (que se actualiza
+    aparte, con `hechos.actualizar_hechos`) y retorna el modelo.
+
+    `modelo["actualizacion"]` indica el `modo` ("incremental", "completa" o
+    "vigente") y el `motivo` de volver a minar.
+    """
+    estado_hechos = leer_estado(carpeta)
+    if estado_hechos is None:
+        raise FileNotFoundError("La tabla de hechos no existe: correr actualizar_hechos() primero")
+    config = {"soporte_minimo": soporte_minimo, "largo_maximo": largo_maximo}
+    modelo = cargar_canasta(carpeta)
+    motivo = None
+    if modelo is None:
+        motivo = "primera construcción"
+    elif modelo["estado"]["generacion"] != estado_hechos.get("generacion"):
+        motivo = "se reconstruyó la tabla de hechos"
+    elif modelo["estado"]["config"] != config:
+        motivo = "cambió el soporte mínimo o el largo máximo"
+    elif modelo["estado"]["marca"] == estado_hechos["marca"]:
+        modelo["actualizacion"] = {"modo": "vigente", "motivo": None}
+        return modelo
+    else:
+        columnas = ["id_ventas", "id_factura", "id_libro"]
+        nuevas = leer_hechos(columnas, carpeta, desde_id=modelo["estado"]["marca"])
+        tocadas = pa.array(nuevas["id_factura"].dropna().unique().astype("int64"))
+        filtro = (ds.field("id_ventas") <= modelo["estado"]["marca"]) & ds.field("id_factura").isin(tocadas)
+        anteriores = _pares(iterar_hechos(columnas, filtro, carpeta))
+        if not sumar_ventas(modelo, _pares([nuevas]), anteriores, soporte_minimo):
+            motivo = "cambiaron los conjuntos frecuentes"
+
+    if motivo is not None:
+        modelo = minar(_pares(iterar_hechos(["id_factura", "id_libro"], carpeta=carpeta)),
+                       soporte_minimo, largo_maximo, procesos)
+    modelo["estado"] = {"generacion": estado_hechos.get("generacion"), "marca": estado_hechos["marca"],
+                        "config": config}
+    guardar_canasta(modelo, carpeta)
+    modelo["actualizacion"] = {"modo": "completa" if motivo else "incremental", "motivo": motivo}
+    return modelo
+
+
+# ==================== REGLAS ====================
+
+def reglas(modelo, confianza_minima=CONFIANZA_MINIMA, origen=None):
+    """Reglas antecedente -> consecuente de los conjuntos frecuentes con al menos
+    `confianza_minima`, con los nombres de los libros, de mayor a menor lift"""
+    frecuentes, total = modelo["frecuentes"], modelo["facturas"]
+    nombres = nombres_dimension("libro", origen)
+    filas = []
+    for conjunto, n in frecuentes.items():
+        for largo in range(1, len(conjunto)):
+            for antecedente in combinations(conjunto, largo):
+                consecuente = tuple(libro for libro in conjunto if libro not in antecedente)
+                confianza = n / frecuentes[antecedente]
+                if confianza >= confianza_minima:
+                    filas.append({
+                        "antecedente": " + ".join(str(nombres.get(libro, libro)) for libro in antecedente),
+                        "consecuente": " + ".join(str(nombres.get(libro, libro)) for libro in consecuente),
+                        "facturas": n,
+                        "soporte": n / total,
+                        "confianza": confianza,
+                        "lift": confianza / (frecuentes[consecuente] / total),
+                    })
+    columnas = ["antecedente", "consecuente", "facturas", "soporte", "confianza", "lift"]
+    df = pd.DataFrame(filas, columns=columnas)
+    return df.sort_values(["lift", "confianza", "facturas"], ascending=False, kind="stable").reset_index(drop=True)
@@ -0,0 +1,296 @@
+"""Cubo OLAP de ventas preagregado.
+
+En lugar de un `groupby` sobre todas las ventas por cada análisis, el cubo guarda
+ya sumadas (`cantidad`, `monto_venta`, `lineas` y, donde se puede, `facturas`) todas
+las combinaciones configuradas de dimensiones (`DIMENSIONES_CUBO`, hasta
+`MAX_DIMENSIONES` a la vez) en cada grano de tiempo (`GRANOS`: total, año, mes).
+Cada combinación es un "cuboide", una tabla chica indexada por las claves de sus
+dimensiones.
+
+- Construcción en una pasada: las ventas se recorren una sola vez para armar el
+  cuboide base (todas las dimensiones por mes); los demás se obtienen sumando el
+  base, que es mucho más chico que las ventas.
+- Actualización incremental: las ventas nuevas de la tabla de hechos se resumen en
+  un cuboide base delta que se suma a cada cuboide. Si la tabla de hechos se
+  reconstruyó, el cubo también.
+- Consultas (`rollup`, `drill_down`): se elige el cuboide que tiene las
+  dimensiones pedidas y se filtra; nunca se tocan las ventas. Los nombres (género,
+  cliente, ...) se agregan solo a las filas del resultado.
+
+`facturas` (facturas distintas) no se puede sumar entre celdas que parten una
+misma factura (una factura con libros de dos géneros), así que solo está en los
+cuboides de dimensiones propias de la factura: cliente, localidad y tiempo. Para
+eso se lleva aparte un cuboide base de facturas.
+"""
+import json
+import os
+import tempfile
+from itertools import combinations
+
+import numpy as np
+import pandas as pd
+
+from agregados import AGREGADOS, COLUMNAS_CLIENTES
+from hechos import CARPETA_DATOS, DIMENSIONES, leer_estado, leer_hechos, nombres_dimension
+
+# Dimensiones del cubo
+DIMENSIONES_CUBO = ("genero", "formato", "autor", "libro", "localidad", "cliente")
+
+# Dimensiones que son de la factura (cada factura tiene un solo valor)
+DIMENSIONES_FACTURA = ("cliente", "localidad")
+
+# Granos de tiempo, del más grueso al más fino. `mes` es AAAAMM y `año` es AAAA.
+GRANOS = ("total", "año", "mes")
+
+# Combinaciones de dimensiones que se precalculan (además de las que se piden
+# directamente al cuboide base)
+MAX_DIMENSIONES = 2
+
+MEDIDAS = ("cantidad", "monto_venta", "lineas")
+
+NOMBRE_CUBO = "cubo"
+
+
+def cuboides():
+    """Combinaciones que guarda el cubo: lista de (dimensiones, grano)"""
+    combinaciones = [()]
+    for n in range(1, MAX_DIMENSIONES + 1):
+        combinaciones.extend(combinations(DIMENSIONES_CUBO, n))
+    return [(dims, grano) for dims in combinaciones for grano in GRANOS]
+
+def _nombre_cuboide(dims, grano):
+    return "__".join(dims + (grano,))
+
+def _claves(dims, grano):
+    """Columnas que indexan un cuboide"""
+    claves = list(dims)
+    if grano != "total":
+        claves.append(grano)
+    return claves
+
+
+# ==================== CONSTRUCCIÓN ====================
+
+def _base(hechos, marca_factura=None):
+    """Cuboides base de un lote de hechos: (ventas por todas las dimensiones y mes,
+    facturas por las dimensiones de la factura y mes). Es la única pasada por las ventas.
+
+    Las facturas con id hasta `marca_factura` ya están contadas (un lote nuevo puede
+    traer más líneas de una factura anterior) y no se vuelven a contar.
+    """
+    mes = (hechos["año"].astype("Int32") * 100 + hechos["mes"].astype("Int32")).rename("mes")
+    claves = {dim: hechos[DIMENSIONES[dim][0]] for dim in DIMENSIONES_CUBO}
+    ventas = pd.DataFrame({**claves, "mes": mes, "cantidad": hechos["cantidad"].astype("int64"),
+                           "monto_venta": hechos["monto_venta"], "lineas": np.ones(len(hechos), dtype="int64")})
+    base = ventas.groupby(list(DIMENSIONES_CUBO) + ["mes"], dropna=False)[list(MEDIDAS)].sum()
+
+    columnas_factura = list(DIMENSIONES_FACTURA) + ["mes"]
+    facturas = ventas[columnas_factura].assign(id_factura=hechos["id_factura"]).drop_duplicates("id_factura")
+    if marca_factura is not None:
+        facturas = facturas[facturas["id_factura"] > marca_factura]
+    base_facturas = facturas.groupby(columnas_factura, dropna=False).size().rename("facturas").to_frame()
+    return base, base_facturas
+
+def _sumar_a(base, dims, grano):
+    """Cuboide (dims, grano) sumando un cuboide base"""
+    tabla = base.reset_index()
+    if grano == "año":
+        tabla["año"] = tabla["mes"] // 100
+    claves = _claves(dims, grano)
+    if not claves:
+        return tabla[list(base.columns)].sum().to_frame().T.astype(base.dtypes.to_dict())
+    return tabla.groupby(claves, dropna=False)[list(base.columns)].sum()
+
+def _cuboide(base, base_facturas, dims, grano):
+    resultado = _sumar_a(base, dims, grano)
+    if set(dims) <= set(DIMENSIONES_FACTURA):
+        resultado = resultado.join(_sumar_a(base_facturas, dims, grano))
+    return resultado.sort_index()
+
+def construir_cubo(hechos, marca_factura=None):
+    """Cubo completo a partir de la tabla de hechos"""
+    base, base_facturas = _base(hechos, marca_factura)
+    return {
+        "base": base,
+        "base_facturas": base_facturas,
+        "cuboides": {(dims, grano): _cuboide(base, base_facturas, dims, grano) for dims, grano in cuboides()},
+    }
+
+def _sumar_cuboides(a, b):
+    if a.index.nlevels == 1 and a.index.name is None:  # cuboide total: una sola fila
+        return a.add(b, fill_value=0)
+    return a.add(b, fill_value=0).astype(a.dtypes.to_dict()).sort_index()
+
+def sumar_ventas(cubo, hechos):
+    """Suma al cubo un lote de ventas nuevas (sin recorrer las anteriores)"""
+    delta = construir_cubo(hechos, cubo["estado"]["marca_factura"])
+    cubo["base"] = _sumar_cuboides(cubo["base"], delta["base"])
+    cubo["base_facturas"] = _sumar_cuboides(cubo["base_facturas"], delta["base_facturas"])
+    for clave, cuboide in delta["cuboides"].items():
+        cubo["cuboides"][clave] = _sumar_cuboides(cubo["cuboides"][clave], cuboide)
+    return cubo
+
+
+# ==================== PERSISTENCIA ====================
+
+def _carpeta_cubo(carpeta):
+    return os.path.join(carpeta, NOMBRE_CUBO)
+
+def guardar_cubo(cubo, carpeta=CARPETA_DATOS):
+    """Guarda cada cuboide en Parquet y el estado en `cubo.json`"""
+    destino = _carpeta_cubo(carpeta)
+    os.makedirs(destino, exist_ok=True)
+    tablas = {"base": cubo["base"], "base_facturas": cubo["base_facturas"]}
+    tablas.update({_nombre_cuboide(dims, grano): df for (dims, grano), df in cubo["cuboides"].items()})
+    for nombre, df in tablas.items():
+        descriptor, temporal = tempfile.mkstemp(dir=destino, suffix=".tmp")
+        os.close(descriptor)
+        df.reset_index(drop=df.index.names == [None]).to_parquet(temporal, index=False)
+        os.replace(temporal, os.path.join(destino, f"{nombre}.parquet"))
+    descriptor, temporal = tempfile.mkstemp(dir=destino, suffix=".tmp")
+    with os.fdopen(descriptor, "w", encoding="utf-8") as f:
+        json.dump(cubo["estado"], f, indent=2)
+    os.replace(temporal, os.path.join(destino, f"{NOMBRE_CUBO}.json"))
+
+def _leer(destino, nombre, claves):
+    df = pd.read_parquet(os.path.join(destino, f"{nombre}.parquet"))
+    return df.set_index(claves) if claves else df
+
+def cargar_cubo(carpeta=CARPETA_DATOS, origen=None):
+    """Cubo guardado, con los nombres de sus dimensiones (None si no hay uno vigente)"""
+    destino = _carpeta_cubo(carpeta)
+    ruta_estado = os.path.join(destino, f"{NOMBRE_CUBO}.json")
+    if not os.path.exists(ruta_estado):
+        return None
+    with open(ruta_estado, "r", encoding="utf-8") as f:
+        estado = json.load(f)
+    cubo = {
+        "estado": estado,
+        "base": _leer(destino, "base", list(DIMENSIONES_CUBO) + ["mes"]),
+        "base_facturas": _leer(destino, "base_facturas", list(DIMENSIONES_FACTURA) + ["mes"]),
+        "cuboides": {(dims, grano): _leer(destino, _nombre_cuboide(dims, grano), _claves(dims, grano))
+                     for dims, grano in cuboides()},
+    }
+    return _con_nombres(cubo, origen)
+
+def _nombrar(cuboide, dims, grano, nombres):
+    """El cuboide indexado por los nombres de sus dimensiones en lugar de las claves
+    (claves distintas con el mismo nombre se suman; las que no tienen nombre se descartan)"""
+    if not dims:
+        return cuboide
+    tabla = cuboide.reset_index()
+    for dim in dims:
+        tabla[dim] = tabla[dim].map(nombres[dim])
+    return tabla.groupby(_claves(dims, grano), sort=True)[list(cuboide.columns)].sum()
+
+def _con_nombres(cubo, origen):
+    """Agrega al cubo los nombres de las dimensiones y cada cuboide indexado por
+    nombre, que es lo que responden las consultas"""
+    cubo["nombres"] = {dim: nombres_dimension(dim, origen) for dim in DIMENSIONES_CUBO}
+    cubo["vistas"] = {(dims, grano): _nombrar(df, dims, grano, cubo["nombres"])
+                      for (dims, grano), df in cubo["cuboides"].items()}
+    return cubo
+
+def actualizar_cubo(carpeta=CARPETA_DATOS, origen=None):
+    """Pone el cubo al día con la tabla de hechos (que se actualiza aparte, con
+    `hechos.actualizar_hechos`) y lo retorna listo para consultar"""
+    estado_hechos = leer_estado(carpeta)
+    if estado_hechos is None:
+        raise FileNotFoundError("La tabla de hechos no existe: correr actualizar_hechos() primero")
+    cubo = cargar_cubo(carpeta, origen)
+    vigente = cubo is not None and cubo["estado"]["generacion"] == estado_hechos.get("generacion") \
+        and cubo["estado"]["config"] == _configuracion()
+    if vigente and cubo["estado"]["marca"] == estado_hechos["marca"]:
+        return cubo
+    if vigente:
+        hechos = leer_hechos(carpeta=carpeta, desde_id=cubo["estado"]["marca"])
+        if len(hechos):
+            sumar_ventas(cubo, hechos)
+        cubo = _con_nombres(cubo, origen)
+        marca_factura = cubo["estado"]["marca_factura"]
+    else:
+        hechos = leer_hechos(carpeta=carpeta)
+        cubo = _con_nombres(construir_cubo(hechos), origen)
+        marca_factura = None
+    facturas = hechos["id_factura"].dropna()
+    if len(facturas):
+        marca_factura = max(int(facturas.max()), marca_factura or 0)
+    cubo["estado"] = {"generacion": estado_hechos.get("generacion"), "marca": estado_hechos["marca"],
+                      "marca_factura": marca_factura, "config": _configuracion()}
+    guardar_cubo(cubo, carpeta)
+    return cubo
+
+def _configuracion():
+    return {"dimensiones": list(DIMENSIONES_CUBO), "granos": list(GRANOS), "max_dimensiones": MAX_DIMENSIONES}
+
+
+# ==================== CONSULTAS ====================
+
+def _grano_filtros(filtros):
+    if "mes" in filtros:
+        return "mes"
+    return "año" if "año" in filtros else "total"
+
+def rollup(cubo, dimensiones=(), grano="total", filtros=None):
+    """Medidas agrupadas por `dimensiones` y `grano`, con las celdas que cumplen
+    `filtros` ({dimensión: nombre o lista de nombres}, o {"año"/"mes": valor}).
+
+    Retorna un DataFrame indexado por los nombres de las dimensiones (y el período).
+    """
+    filtros = dict(filtros or {})
+    dims = tuple(d for d in DIMENSIONES_CUBO if d in dimensiones or d in filtros)
+    grano_tabla = max(grano, _grano_filtros(filtros), key=GRANOS.index)
+    df = cubo["vistas"].get((dims, grano_tabla))
+    if df is None:
+        # Combinación no precalculada: se suma el cuboide base (no las ventas)
+        df = _nombrar(_sumar_a(cubo["base"], dims, grano_tabla), dims, grano_tabla, cubo["nombres"])
+
+    claves = list(dimensiones) + ([grano] if grano != "total" else [])
+    filtros = {clave: list(v) if isinstance(v, (list, tuple, set)) else [v] for clave, v in filtros.items()}
+    for clave, valores in list(filtros.items()):
+        if len(valores) == 1 and clave not in claves and clave in df.index.names and df.index.nlevels > 1:
+            # Un solo valor de una dimensión que no se pide: se toma esa rebanada del índice
+            try:
+                df = df.xs(valores[0], level=clave)
+            except KeyError:
+                df = df.iloc[:0].droplevel(clave)
+            del filtros[clave]
+    if filtros:
+        mascara = np.ones(len(df), dtype=bool)
+        for clave, valores in filtros.items():
+            if clave == "año" and grano_tabla == "mes":
+                nivel = df.index.get_level_values("mes") // 100
+            else:
+                nivel = df.index.get_level_values(clave)
+            mascara &= nivel.isin(valores)
+        df = df.loc[mascara]
+
+    if list(df.index.names) == claves or (not claves and not dims and grano_tabla == "total"):
+        return df
+    if not claves:
+        return pd.DataFrame({columna: [df[columna].sum()] for columna in df.columns})
+    # Quedan dimensiones o períodos de los filtros que no se piden: se suman
+    if grano == "año" and grano_tabla == "mes":
+        tabla = df.reset_index()
+        tabla["año"] = tabla["mes"] // 100
+        return tabla.groupby(claves, sort=True)[list(df.columns)].sum()
+    return df.groupby(level=claves, sort=True).sum()
+
+def drill_down(cubo, camino, hacia, grano="total"):
+    """Baja un nivel: `camino` es {dimensión: nombre} de la celda actual y `hacia` la
+    dimensión por la que se abre"""
+    return rollup(cubo, (hacia,), grano, camino)
+
+def agregado_cubo(cubo, nombre):
+    """Un agregado de `agregados.AGREGADOS` respondido desde el cubo"""
+    definicion = AGREGADOS[nombre]
+    df = rollup(cubo, (definicion["dimension"],))
+    columnas = (["facturas"] if definicion.get("facturas") else []) + ["cantidad", "monto_venta"]
+    df = df[columnas].astype({"cantidad": "int64", "monto_venta": "float64"})
+    if definicion["orden"]:
+        df = df.sort_values(definicion["orden"], ascending=False, kind="stable")
+    if definicion["limite"]:
+        df = df.head(definicion["limite"])
+    if definicion.get("facturas"):
+        df = df.rename(columns=COLUMNAS_CLIENTES)
+    return df
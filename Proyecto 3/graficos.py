@@ -0,0 +1,142 @@
+"""Gráficos del análisis de ventas.
+
+Cada función recibe el agregado ya calculado (ver `agregados.AGREGADOS`) y retorna
+una `Figure` de matplotlib armada sin `pyplot`: no depende del backend ni de una
+ventana, así que sirve igual en el notebook (se muestra al ser la última expresión
+de la celda) y en `reporte.py`, que las dibuja en procesos aparte y las guarda.
+"""
+import matplotlib.ticker as ticker
+from matplotlib.figure import Figure
+
+
+def _bordes_limpios(ax):
+    ax.spines['top'].set_visible(False)
+    ax.spines['right'].set_visible(False)
+    ax.spines['left'].set_color('#636e72')
+    ax.spines['bottom'].set_color('#636e72')
+
+def facturacion_por_genero(ventas_por_genero):
+    """Gráfico 1: Facturación por género"""
+    fig = Figure(figsize=(10, 6), layout="tight")
+    ax = fig.subplots()
+    ax.barh(ventas_por_genero.index, ventas_por_genero['monto_venta'],
+            color='#4682b4', edgecolor='#2c5282', linewidth=1.5)
+
+    ax.set_title('Facturación por Género', fontsize=16, fontweight='bold', pad=20)
+    ax.set_xlabel('Monto ($)', fontsize=12, fontweight='bold')
+    ax.grid(axis='x', alpha=0.3, linestyle='--', linewidth=0.8)
+    _bordes_limpios(ax)
+    return fig
+
+def top_libros(top_libros):
+    """Gráfico 2: Top 10 libros más vendidos"""
+    fig = Figure(figsize=(12, 7), layout="tight")
+    ax = fig.subplots()
+    ax.barh(top_libros.index, top_libros['cantidad'],
+            color='#FF6B6B', edgecolor='#C92A2A', linewidth=1.5, alpha=0.85)
+
+    ax.set_title('Top 10 Libros Más Vendidos', fontsize=20, fontweight='bold', pad=25, color='#2d3436')
+    ax.set_xlabel('Cantidad vendida', fontsize=14, fontweight='bold', color='#2d3436')
+    ax.grid(axis='x', alpha=0.4, linestyle='-', linewidth=0.5, color='gray')
+    ax.set_axisbelow(True)
+    _bordes_limpios(ax)
+
+    # Números en las barras
+    for i, val in enumerate(top_libros['cantidad']):
+        ax.text(val + 0.15, i, f'{int(val)}', va='center', ha='left',
+                fontsize=11, fontweight='bold', color='#2d3436')
+
+    ax.set_xlim(0, top_libros['cantidad'].max() * 1.12)
+    return fig
+
+def fisico_vs_digital(ventas_por_formato):
+    """Gráfico 3: Ventas físico vs digital"""
+    fig = Figure(figsize=(10, 7), layout="tight")
+    ax = fig.subplots()
+
+    # Naranja vibrante y azul; se separa la primera porción
+    colors = ['#FF8C42', '#4A90E2']
+    explode = [0.08] + [0] * (len(ventas_por_formato) - 1)
+    wedges, texts, autotexts = ax.pie(
+        ventas_por_formato['monto_venta'],
+        labels=ventas_por_formato.index,
+        autopct='%1.1f%%',
+        startangle=90,
+        colors=colors,
+        explode=explode,
+        wedgeprops={'edgecolor': 'white', 'linewidth': 2, 'antialiased': True}
+    )
+
+    # Estilo de porcentajes y etiquetas
+    for autotext in autotexts:
+        autotext.set_color('white')
+        autotext.set_fontsize(16)
+        autotext.set_fontweight('bold')
+    for text in texts:
+        text.set_fontsize(15)
+        text.set_fontweight('bold')
+        text.set_color('#2d3436')
+
+    ax.set_title('Distribución de Ventas: Físico vs Digital',
+                 fontsize=20, fontweight='bold', pad=25, color='#2d3436')
+    return fig
+
+def top_autores(ventas_por_autor, cantidad=8):
+    """Gráfico 4: Top 8 autores por facturación"""
+    autores = ventas_por_autor.head(cantidad)
+    fig = Figure(figsize=(12, 8), layout="tight")
+    ax = fig.subplots()
+    ax.barh(autores.index, autores['monto_venta'],
+            color='#52b788', edgecolor='#2d6a4f', linewidth=1.5, alpha=0.9)
+
+    ax.set_title(f'Top {cantidad} Autores por Facturación', fontsize=20, fontweight='bold', pad=25,
+                 color='#2d3436')
+    ax.set_xlabel('Monto ($)', fontsize=14, fontweight='bold', color='#2d3436')
+    ax.grid(axis='x', alpha=0.4, linestyle='-', linewidth=0.5, color='gray')
+    ax.set_axisbelow(True)
+    _bordes_limpios(ax)
+
+    # Montos en miles
+    ax.xaxis.set_major_formatter(ticker.FuncFormatter(lambda x, p: f'${x/1000:.0f}K'))
+    for i, val in enumerate(autores['monto_venta']):
+        ax.text(val + (autores['monto_venta'].max() * 0.02), i,
+                f'${val/1000:.0f}K', va='center', ha='left',
+                fontsize=11, fontweight='bold', color='#2d3436')
+
+    ax.set_xlim(0, autores['monto_venta'].max() * 1.18)
+    return fig
+
+def top_localidades(ventas_por_localidad, cantidad=8):
+    """Gráfico 5: Top 8 localidades por unidades vendidas"""
+    localidades = ventas_por_localidad.head(cantidad)
+    fig = Figure(figsize=(13, 8), layout="tight")
+    ax = fig.subplots()
+    ax.bar(range(len(localidades)), localidades['cantidad'],
+           color='#9b59b6', edgecolor='#6c3483', linewidth=1.5, alpha=0.85)
+
+    ax.set_title(f'Top {cantidad} Localidades por Unidades Vendidas', fontsize=20, fontweight='bold', pad=25,
+                 color='#2d3436')
+    ax.set_xlabel('Localidad', fontsize=14, fontweight='bold', color='#2d3436')
+    ax.set_ylabel('Unidades', fontsize=14, fontweight='bold', color='#2d3436')
+
+    ax.set_xticks(range(len(localidades)))
+    ax.set_xticklabels(localidades.index, rotation=45, ha='right', fontsize=12)
+    ax.grid(axis='y', alpha=0.4, linestyle='-', linewidth=0.5, color='gray')
+    ax.set_axisbelow(True)
+    _bordes_limpios(ax)
+
+    # Valores encima de las barras
+    for i, val in enumerate(localidades['cantidad']):
+        ax.text(i, val + 0.2, f'{int(val)}', ha='center', va='bottom',
+                fontsize=11, fontweight='bold', color='#2d3436')
+    return fig
+
+
+# Gráfico -> (título, agregado de `agregados.AGREGADOS` que dibuja, función)
+GRAFICOS = {
+    "facturacion_por_genero": ("Facturación por género", "ventas_por_genero", facturacion_por_genero),
+    "top_libros": ("Top 10 libros más vendidos", "top_libros", top_libros),
+    "fisico_vs_digital": ("Ventas físico vs digital", "ventas_por_formato", fisico_vs_digital),
+    "top_autores": ("Top 8 autores por facturación", "ventas_por_autor", top_autores),
+    "top_localidades": ("Top 8 localidades por unidades vendidas", "ventas_por_localidad", top_localidades),
+}
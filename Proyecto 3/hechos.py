@@ -0,0 +1,327 @@
+"""Tabla de hechos de ventas materializada (esquema estrella).
+
+`datos/hechos_ventas/` guarda una fila por línea de venta con todo lo que los
+análisis necesitan y que antes se recalculaba en cada corrida:
+
+- las claves de las dimensiones ya resueltas (libro, autor, género, formato, país,
+  cliente, localidad), para unir nombres con un `map` por clave en lugar de ocho joins;
+- la fecha de la factura ya convertida a fecha (una sola vez, con formato explícito)
+  y su clave `clave_fecha` (`AAAAMMDD`) para unir el calendario (`calendario.py`);
+- `monto_venta`, `año` y `mes` precalculados.
+
+Se guarda en Parquet, en partes: `actualizar_hechos` trae de la base solo las ventas
+con id mayor al último cargado (con el join resuelto en la base) y las escribe como
+una parte nueva. La tabla se reconstruye entera cuando:
+
+- no coincide la suma de control de las ventas ya cargadas (cantidad y suma de ids),
+  o sea que se borraron o insertaron ventas por debajo de la marca;
+- cambiaron las claves o precios de libros, autores o clientes que se copiaron en
+  los hechos (se compara una firma de esas columnas, que son tablas chicas);
+- cambiaron las columnas de los hechos (`TIPOS_HECHOS`).
+
+Un cambio en una factura ya cargada (su fecha o su cliente) no se detecta: para eso
+está `actualizar_hechos(completo=True)`.
+"""
+import hashlib
+import json
+import os
+import sys
+import tempfile
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from sqlalchemy import text
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from libreria import cargar_tabla, leer_lotes, motor
+
+from agregados import AGREGADOS, COLUMNAS_CLIENTES, desde_ventas
+from calendario import clave_fecha
+
+CARPETA_DATOS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "datos")
+NOMBRE_HECHOS = "hechos_ventas"
+
+# Columna de los hechos -> expresión SQL sobre ventas y sus tablas unidas
+COLUMNAS_HECHOS = {
+    "id_ventas": "v.id_ventas",
+    "id_factura": "v.id_factura",
+    "id_libro": "v.id_libro",
+    "id_autores": "l.id_autores",
+    "id_generos": "l.id_generos",
+    "id_formatos": "l.id_formatos",
+    "id_paises": "a.id_paises",
+    "id_cliente": "f.id_cliente",
+    "id_localidades": "c.id_localidades",
+    "fecha_emision": "f.fecha_emision",
+    "cantidad": "v.cantidad",
+    "precio": "l.precio",
+}
+
+# Tipos de las columnas guardadas; las claves admiten vacíos (un join sin pareja)
+TIPOS_HECHOS = {
+    "id_ventas": "int64",
+    "id_factura": "Int32",
+    "id_libro": "Int32",
+    "id_autores": "Int32",
+    "id_generos": "Int32",
+    "id_formatos": "Int32",
+    "id_paises": "Int32",
+    "id_cliente": "Int32",
+    "id_localidades": "Int32",
+    "cantidad": "Int32",
+    "precio": "float64",
+    "monto_venta": "float64",
+    "año": "Int16",
+    "mes": "Int8",
+    "clave_fecha": "Int32",
+}
+
+# Columnas de las dimensiones que se copian en los hechos: si cambian, se reconstruye
+COLUMNAS_COPIADAS = {
+    "libros": ["id_libro", "id_autores", "id_generos", "id_formatos", "precio"],
+    "autores": ["id_autores", "id_paises"],
+    "clientes": ["id_clientes", "id_localidades"],
+}
+
+# Dimensión -> (clave en los hechos, tabla, columna del id en la tabla, columna del nombre)
+DIMENSIONES = {
+    "libro": ("id_libro", "libros", "id_libro", "nombre"),
+    "autor": ("id_autores", "autores", "id_autores", "nombre"),
+    "genero": ("id_generos", "generos", "id_generos", "descripcion"),
+    "formato": ("id_formatos", "formatos", "id_formatos", "descripcion"),
+    "pais": ("id_paises", "paises", "id_paises", "descripcion"),
+    "cliente": ("id_cliente", "clientes", "id_clientes", "nombre"),
+    "localidad": ("id_localidades", "localidades", "id_localidades", "descripcion"),
+}
+
+# Formato de `fecha_emision` cuando la base la devuelve como texto (SQLite)
+FORMATO_FECHA = "%Y-%m-%d %H:%M:%S"
+
+# Filas que se traen de la base por vez
+TAMANO_LOTE = 100_000
+
+# Con más partes que esto se reescriben en una sola
+MAX_PARTES = 16
+
+
+# ==================== ESTADO ====================
+
+def _numero(parte):
+    return int(parte[len("parte-"):-len(".parquet")])
+
+def _ruta_estado(carpeta):
+    return os.path.join(carpeta, f"{NOMBRE_HECHOS}.json")
+
+def _carpeta_partes(carpeta):
+    return os.path.join(carpeta, NOMBRE_HECHOS)
+
+def leer_estado(carpeta=CARPETA_DATOS):
+    """Estado de la tabla de hechos (None si todavía no se armó)"""
+    ruta = _ruta_estado(carpeta)
+    if not os.path.exists(ruta):
+        return None
+    with open(ruta, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+def _guardar_estado(carpeta, estado):
+    descriptor, temporal = tempfile.mkstemp(dir=carpeta, suffix=".tmp")
+    with os.fdopen(descriptor, "w", encoding="utf-8") as f:
+        json.dump(estado, f, ensure_ascii=False, indent=2)
+    os.replace(temporal, _ruta_estado(carpeta))
+
+def firma_dimensiones(origen=None):
+    """Firma de las columnas de dimensiones copiadas en los hechos"""
+    firma = hashlib.sha256()
+    for tabla, columnas in COLUMNAS_COPIADAS.items():
+        df = cargar_tabla(tabla, columnas=columnas, origen=origen).sort_values(columnas[0])
+        firma.update(pd.util.hash_pandas_object(df, index=False).to_numpy().tobytes())
+    return firma.hexdigest()
+
+
+# ==================== CONSTRUCCIÓN ====================
+
+def _preparar(lote):
+    """Convierte un lote traído de la base a las columnas y tipos de los hechos"""
+    fecha = lote["fecha_emision"]
+    if not pd.api.types.is_datetime64_any_dtype(fecha):
+        fecha = pd.to_datetime(fecha, format=FORMATO_FECHA)
+    lote = lote.assign(fecha_emision=fecha, monto_venta=lote["cantidad"] * lote["precio"],
+                       año=fecha.dt.year, mes=fecha.dt.month, clave_fecha=clave_fecha(fecha))
+    return lote.astype(TIPOS_HECHOS)
+
+def _escribir_parte(carpeta, numero, lotes):
+    """Escribe los lotes como la parte `numero`; retorna (nombre, filas, suma de ids)
+    o None si no había filas"""
+    partes = _carpeta_partes(carpeta)
+    os.makedirs(partes, exist_ok=True)
+    nombre = f"parte-{numero:05d}.parquet"
+    descriptor, temporal = tempfile.mkstemp(dir=partes, suffix=".tmp")
+    os.close(descriptor)
+    escritor, filas, suma = None, 0, 0
+    try:
+        for lote in lotes:
+            tabla = pa.Table.from_pandas(_preparar(lote), preserve_index=False)
+            if escritor is None:
+                escritor = pq.ParquetWriter(temporal, tabla.schema)
+            escritor.write_table(tabla.cast(escritor.schema))
+            filas += len(lote)
+            suma += int(lote["id_ventas"].sum())
+        if escritor is not None:
+            escritor.close()
+            os.replace(temporal, os.path.join(partes, nombre))
+    finally:
+        if os.path.exists(temporal):
+            os.remove(temporal)
+    return (nombre, filas, suma) if filas else None
+
+def _compactar(carpeta, estado):
+    """Reescribe todas las partes en una sola"""
+    partes = _carpeta_partes(carpeta)
+    rutas = [os.path.join(partes, p) for p in estado["partes"]]
+    nombre = f"parte-{_numero(estado['partes'][-1]) + 1:05d}.parquet"
+    descriptor, temporal = tempfile.mkstemp(dir=partes, suffix=".tmp")
+    os.close(descriptor)
+    pq.write_table(pq.read_table(rutas), temporal)
+    os.replace(temporal, os.path.join(partes, nombre))
+    anteriores, estado["partes"] = estado["partes"], [nombre]
+    _guardar_estado(carpeta, estado)
+    for parte in anteriores:
+        os.remove(os.path.join(partes, parte))
+
+def actualizar_hechos(origen=None, carpeta=CARPETA_DATOS, completo=False, tamano_lote=TAMANO_LOTE):
+    """Agrega a la tabla de hechos las ventas nuevas, o la reconstruye si hace falta.
+
+    Retorna un resumen con `modo` ("incremental" o "completa"), `motivo` de la
+    reconstrucción, `filas` agregadas y `total` de filas.
+    """
+    m = motor(origen) if origen is None or isinstance(origen, str) else origen
+    os.makedirs(carpeta, exist_ok=True)
+    estado = leer_estado(carpeta)
+    firma = firma_dimensiones(m)
+    with m.connect() as conexion:
+        tope = conexion.execute(text("SELECT MAX(id_ventas) FROM ventas")).scalar()
+    tope = 0 if tope is None else int(tope)
+
+    motivo = None
+    if completo:
+        motivo = "reconstrucción pedida"
+    elif estado is None:
+        motivo = "primera construcción"
+    elif estado["firma"] != firma:
+        motivo = "cambiaron libros, autores o clientes"
+    elif estado.get("columnas") != list(TIPOS_HECHOS):
+        motivo = "cambiaron las columnas de la tabla de hechos"
+    else:
+        with m.connect() as conexion:
+            filas, suma = conexion.execute(
+                text("SELECT COUNT(*), SUM(id_ventas) FROM ventas WHERE id_ventas <= :marca"),
+                {"marca": estado["marca"]}).one()
+        if (filas, int(suma or 0)) != (estado["filas"], estado["suma"]):
+            motivo = "la suma de control de ventas no coincide"
+
+    # Las partes nuevas siguen la numeración, así nunca pisan una parte vigente
+    anteriores = estado["partes"] if estado else []
+    numero = _numero(anteriores[-1]) + 1 if anteriores else 1
+    if motivo is not None:
+        # La generación cambia con cada reconstrucción: lo derivado de los hechos
+        # (el cubo) la compara para saber si puede seguir sumando filas nuevas
+        generacion = estado.get("generacion", 0) + 1 if estado else 1
+        estado = {"marca": -1, "filas": 0, "suma": 0, "partes": [], "generacion": generacion}
+    estado["firma"] = firma
+    estado["columnas"] = list(TIPOS_HECHOS)
+
+    seleccion = ", ".join(f"{expr} AS {col}" for col, expr in COLUMNAS_HECHOS.items())
+    desde_sql, _ = desde_ventas(COLUMNAS_HECHOS.values())
+    consulta = (f"SELECT {seleccion}\n{desde_sql}\n"
+                f"WHERE v.id_ventas > :desde AND v.id_ventas <= :tope\nORDER BY v.id_ventas")
+    parametros = {"desde": estado["marca"], "tope": tope}
+    parte = _escribir_parte(carpeta, numero, leer_lotes(m, consulta, tamano_lote, parametros))
+    nuevas = 0
+    if parte is not None:
+        nombre, nuevas, suma = parte
+        estado["partes"].append(nombre)
+        estado["filas"] += nuevas
+        estado["suma"] += suma
+    estado["marca"] = max(estado["marca"], tope)
+    _guardar_estado(carpeta, estado)
+
+    if motivo is not None:
+        # Las partes de la versión anterior se borran recién con el estado nuevo guardado
+        for anterior in anteriores:
+            os.remove(os.path.join(_carpeta_partes(carpeta), anterior))
+    elif len(estado["partes"]) > MAX_PARTES:
+        _compactar(carpeta, estado)
+    return {"modo": "completa" if motivo else "incremental", "motivo": motivo,
+            "filas": nuevas, "total": estado["filas"]}
+
+
+# ==================== LECTURA ====================
+
+def leer_hechos(columnas=None, carpeta=CARPETA_DATOS, desde_id=None):
+    """Tabla de hechos (solo las `columnas` pedidas, si se indican).
+
+    Con `desde_id` trae solo las ventas con id mayor; el filtro usa las estadísticas
+    de cada parte y no lee las que quedan afuera.
+    """
+    estado = leer_estado(carpeta)
+    if estado is None:
+        raise FileNotFoundError("La tabla de hechos no existe: correr actualizar_hechos() primero")
+    if not estado["partes"]:
+        return pd.DataFrame({c: pd.Series(dtype=t) for c, t in TIPOS_HECHOS.items()})
+    rutas = [os.path.join(_carpeta_partes(carpeta), p) for p in estado["partes"]]
+    filtros = None if desde_id is None else [("id_ventas", ">", desde_id)]
+    return pq.read_table(rutas, columns=columnas, filters=filtros).to_pandas()
+
+def iterar_hechos(columnas=None, filtro=None, carpeta=CARPETA_DATOS, tamano_lote=TAMANO_LOTE):
+    """Recorre la tabla de hechos en lotes, sin cargarla entera. `filtro` es una
+    expresión de `pyarrow.dataset` que se evalúa al leer cada parte."""
+    import pyarrow.dataset as ds
+    estado = leer_estado(carpeta)
+    if estado is None:
+        raise FileNotFoundError("La tabla de hechos no existe: correr actualizar_hechos() primero")
+    rutas = [os.path.join(_carpeta_partes(carpeta), p) for p in estado["partes"]]
+    if not rutas:
+        return
+    for lote in ds.dataset(rutas, format="parquet").to_batches(columns=columnas, filter=filtro, batch_size=tamano_lote):
+        if lote.num_rows:
+            yield lote.to_pandas()
+
+def nombres_dimension(dimension, origen=None):
+    """Serie clave -> nombre de una dimensión"""
+    _, tabla, id_tabla, columna = DIMENSIONES[dimension]
+    df = cargar_tabla(tabla, columnas=[id_tabla, columna], origen=origen)
+    return df.drop_duplicates(id_tabla).set_index(id_tabla)[columna]
+
+def con_nombres(hechos, dimensiones=None, origen=None):
+    """Los hechos con el nombre de cada dimensión (libro, autor, genero, ...) agregado
+    por búsqueda de su clave"""
+    resultado = hechos.copy(deep=False)
+    for dimension in dimensiones or DIMENSIONES:
+        clave = DIMENSIONES[dimension][0]
+        resultado[dimension] = hechos[clave].map(nombres_dimension(dimension, origen))
+    return resultado
+
+def agregado_hechos(hechos, nombre, origen=None):
+    """Un agregado de `agregados.AGREGADOS` calculado sobre la tabla de hechos: se
+    agrupa por la clave de la dimensión y solo las filas agrupadas reciben su nombre"""
+    definicion = AGREGADOS[nombre]
+    dimension = definicion["dimension"]
+    clave = DIMENSIONES[dimension][0]
+    nombres = nombres_dimension(dimension, origen)
+    sumas = hechos.groupby(clave)[["cantidad", "monto_venta"]].sum()
+    # Claves distintas pueden compartir nombre: se vuelve a agrupar por nombre
+    df = sumas.groupby(sumas.index.map(nombres)).sum()
+    df.index.name = dimension
+    if definicion.get("facturas"):
+        pares = hechos[[clave, "id_factura"]].drop_duplicates()
+        pares = pares.assign(**{dimension: pares[clave].map(nombres)}).drop_duplicates([dimension, "id_factura"])
+        df.insert(0, "facturas", pares.groupby(dimension).size())
+    df["cantidad"] = df["cantidad"].astype("int64")
+    if definicion["orden"]:
+        df = df.sort_values([definicion["orden"]], ascending=False, kind="stable")
+    if definicion["limite"]:
+        df = df.head(definicion["limite"])
+    if definicion.get("facturas"):
+        df = df.rename(columns=COLUMNAS_CLIENTES)
+    return df
@@ -0,0 +1,149 @@
+"""Reporte de ventas sin abrir el notebook.
+
+Dibuja los gráficos de `graficos.GRAFICOS` a partir de los agregados del cubo
+(`cubo.actualizar_cubo`, que solo suma las ventas nuevas) y los guarda como PNG y
+SVG junto con un `reporte.html` que los reúne.
+
+- Sin pantalla: las figuras se arman sin `pyplot` y se guardan directamente en archivos.
+- En paralelo: cada gráfico se dibuja en un proceso aparte.
+- Con caché: cada gráfico tiene una clave con el hash de sus datos y del código de
+  su función. Si la clave coincide con la del último reporte y están los archivos
+  de los formatos pedidos, el gráfico no se vuelve a dibujar.
+
+Uso:
+    python reporte.py [--destino reporte] [--formatos png svg] [--procesos 4]
+"""
+import argparse
+import hashlib
+import html
+import inspect
+import json
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import matplotlib
+import pandas as pd
+
+from cubo import actualizar_cubo, agregado_cubo
+from graficos import GRAFICOS
+from hechos import CARPETA_DATOS, actualizar_hechos
+
+CARPETA_REPORTE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "reporte")
+FORMATOS = ("png", "svg")
+PROCESOS = min(len(GRAFICOS), os.cpu_count() or 1)
+
+# Resolución de los PNG
+DPI = 100
+
+
+def clave_grafico(nombre, datos):
+    """Hash de lo que determina la imagen: los datos y el código del gráfico"""
+    funcion = GRAFICOS[nombre][2]
+    clave = hashlib.sha256()
+    clave.update(json.dumps([nombre, list(map(str, datos.columns)), datos.index.name,
+                             matplotlib.__version__]).encode("utf-8"))
+    clave.update(pd.util.hash_pandas_object(datos, index=True).to_numpy().tobytes())
+    clave.update(inspect.getsource(funcion).encode("utf-8"))
+    return clave.hexdigest()
+
+def _dibujar(nombre, datos, destino, formatos):
+    """Dibuja un gráfico y lo guarda en cada formato (se corre en un proceso aparte)"""
+    # Las figuras de graficos.py no usan pyplot: savefig elige el backend del formato
+    # (Agg para PNG), sin tocar el del proceso que llama (el notebook, por ejemplo)
+    figura = GRAFICOS[nombre][2](datos)
+    for formato in formatos:
+        descriptor, temporal = tempfile.mkstemp(dir=destino, suffix=f".{formato}")
+        os.close(descriptor)
+        figura.savefig(temporal, format=formato, dpi=DPI)
+        os.chmod(temporal, 0o644)
+        os.replace(temporal, os.path.join(destino, f"{nombre}.{formato}"))
+    return nombre
+
+def _leer_manifiesto(destino):
+    ruta = os.path.join(destino, "reporte.json")
+    if not os.path.exists(ruta):
+        return {}
+    with open(ruta, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+def _escribir(destino, nombre, contenido):
+    descriptor, temporal = tempfile.mkstemp(dir=destino, suffix=".tmp")
+    with os.fdopen(descriptor, "w", encoding="utf-8") as f:
+        f.write(contenido)
+    os.chmod(temporal, 0o644)
+    os.replace(temporal, os.path.join(destino, nombre))
+
+def pagina_html(datos, formatos):
+    """HTML del reporte: cada gráfico (SVG si se generó, si no PNG) con su tabla"""
+    imagen = "svg" if "svg" in formatos else formatos[0]
+    secciones = []
+    for nombre, (titulo, _, _) in GRAFICOS.items():
+        secciones.append(
+            f'<section id="{nombre}">\n<h2>{html.escape(titulo)}</h2>\n'
+            f'<img src="{nombre}.{imagen}" alt="{html.escape(titulo)}">\n'
+            f'{datos[nombre].to_html(float_format=lambda x: f"{x:,.2f}", border=0)}\n</section>')
+    return (
+        '<!DOCTYPE html>\n<html lang="es">\n<head>\n<meta charset="utf-8">\n'
+        '<title>Reporte de ventas</title>\n<style>\n'
+        'body { font-family: sans-serif; max-width: 1100px; margin: 2em auto; color: #2d3436; }\n'
+        'img { max-width: 100%; }\n'
+        'table { border-collapse: collapse; margin-bottom: 3em; }\n'
+        'th, td { padding: 0.2em 0.8em; text-align: right; border-bottom: 1px solid #dfe6e9; }\n'
+        '</style>\n</head>\n<body>\n<h1>Reporte de ventas</h1>\n'
+        f'<p>Generado el {time.strftime("%Y-%m-%d %H:%M")}</p>\n'
+        + "\n".join(secciones) + "\n</body>\n</html>\n")
+
+def construir_reporte(cubo=None, destino=CARPETA_REPORTE, formatos=FORMATOS, procesos=PROCESOS,
+                      origen=None, carpeta=CARPETA_DATOS):
+    """Genera los gráficos que cambiaron y el HTML del reporte en `destino`.
+
+    Sin `cubo`, pone al día la tabla de hechos y el cubo de `carpeta`. Retorna
+    {gráfico: "generado" o "sin cambios"}.
+    """
+    if cubo is None:
+        actualizar_hechos(origen=origen, carpeta=carpeta)
+        cubo = actualizar_cubo(carpeta, origen)
+    formatos = tuple(formatos)
+    os.makedirs(destino, exist_ok=True)
+    datos = {nombre: agregado_cubo(cubo, agregado) for nombre, (_, agregado, _) in GRAFICOS.items()}
+    claves = {nombre: clave_grafico(nombre, df) for nombre, df in datos.items()}
+    anterior = _leer_manifiesto(destino)
+    pendientes = [nombre for nombre in GRAFICOS
+                  if anterior.get(nombre) != claves[nombre]
+                  or not all(os.path.exists(os.path.join(destino, f"{nombre}.{f}")) for f in formatos)]
+
+    if procesos > 1 and len(pendientes) > 1:
+        with ProcessPoolExecutor(min(procesos, len(pendientes))) as pool:
+            list(pool.map(_dibujar, pendientes, [datos[n] for n in pendientes],
+                          [destino] * len(pendientes), [formatos] * len(pendientes)))
+    else:
+        for nombre in pendientes:
+            _dibujar(nombre, datos[nombre], destino, formatos)
+
+    _escribir(destino, "reporte.html", pagina_html(datos, formatos))
+    _escribir(destino, "reporte.json", json.dumps(claves, indent=2))
+    return {nombre: "generado" if nombre in pendientes else "sin cambios" for nombre in GRAFICOS}
+
+
+def main(argumentos=None):
+    parser = argparse.ArgumentParser(description="Genera el reporte de ventas con los gráficos del análisis")
+    parser.add_argument("--url", default=None, help="URL de SQLAlchemy de la base (la de libreria si no se indica)")
+    parser.add_argument("--destino", default=CARPETA_REPORTE, help="Carpeta de salida")
+    parser.add_argument("--formatos", nargs="+", choices=FORMATOS, default=list(FORMATOS))
+    parser.add_argument("--procesos", type=int, default=PROCESOS, help="Gráficos que se dibujan en paralelo")
+    args = parser.parse_args(argumentos)
+
+    inicio = time.perf_counter()
+    resultado = construir_reporte(destino=args.destino, formatos=args.formatos, procesos=args.procesos,
+                                  origen=args.url)
+    for nombre, estado in resultado.items():
+        print(f"{nombre:<24} {estado}")
+    print(f"Reporte: {os.path.join(args.destino, 'reporte.html')}  ({time.perf_counter() - inicio:.2f} s)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,206 @@
+"""Análisis de clientes: RFM y cohortes de adquisición.
+
+Para cada cliente, a una fecha de corte:
+
+- Recencia: días desde su última compra.
+- Frecuencia: cantidad de facturas.
+- Monto: total gastado (suma de `monto_venta` de sus ventas, como `top_clientes`).
+
+Cada uno se lleva también a un puntaje de 1 a 5 por quintiles (5 es lo mejor: la
+compra más reciente, la mayor frecuencia o el mayor monto).
+
+Las cohortes agrupan a los clientes por el mes de su primera compra. La matriz de
+retención indica qué parte de cada cohorte volvió a comprar 0, 1, 2, ... meses después.
+
+Todo se calcula en una pasada en lotes, sin cargar las tablas enteras:
+
+- las facturas se leen de la base con el corte resuelto en la consulta;
+- los montos se leen de la tabla de hechos con el corte aplicado al leer cada parte.
+
+De cada lote queda solo un resumen por cliente (primera y última compra, facturas,
+monto) y los pares cliente-mes con compras. Así la memoria depende de la cantidad
+de clientes y no de la de facturas.
+
+Los resultados se guardan en `datos/rfm/` por fecha de corte, con la versión de las
+facturas y de la tabla de hechos en la clave. Volver a pedir el mismo corte sin
+cambios en los datos no recalcula nada (si la base no da la versión de las facturas,
+ver `libreria.version_tabla`, se calcula siempre).
+"""
+import glob
+import hashlib
+import json
+import os
+import sys
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from libreria import cargar_tabla, leer_lotes, motor, version_tabla
+from libreria.acceso_datos import consulta_tabla
+
+from hechos import CARPETA_DATOS, FORMATO_FECHA, TAMANO_LOTE, iterar_hechos, leer_estado
+
+# Cantidad de grupos de los puntajes R, F y M
+QUINTILES = 5
+
+NOMBRE_RFM = "rfm"
+
+
+def _fechas(serie):
+    if pd.api.types.is_datetime64_any_dtype(serie):
+        return serie
+    return pd.to_datetime(serie, format=FORMATO_FECHA)
+
+def fecha_corte_predeterminada(origen=None):
+    """El día siguiente a la última factura"""
+    m = motor(origen) if origen is None or isinstance(origen, str) else origen
+    ultima = cargar_tabla("factura", columnas=["fecha_emision"], origen=m)["fecha_emision"]
+    if ultima.empty:
+        return pd.Timestamp.today().normalize()
+    return _fechas(ultima).max().normalize() + pd.Timedelta(days=1)
+
+
+# ==================== PASADA POR LOS DATOS ====================
+
+def _combinar(acumulado, parcial):
+    """Junta dos resúmenes por cliente (primera y última compra, facturas)"""
+    if acumulado is None:
+        return parcial
+    return pd.concat([acumulado, parcial]).groupby(level=0).agg(
+        primera=("primera", "min"), ultima=("ultima", "max"), frecuencia=("frecuencia", "sum"))
+
+def _recorrer_facturas(m, corte, tamano_lote):
+    """Resumen por cliente de las facturas anteriores al corte y pares cliente-mes
+    (meses contados como año * 12 + mes - 1) con al menos una compra"""
+    consulta, parametros = consulta_tabla(m, "factura", ["id_cliente", "fecha_emision"],
+                                          {"fecha_emision": (None, str(corte))})
+    resumen, actividad = None, None
+    for lote in leer_lotes(m, consulta, tamano_lote, parametros):
+        lote = lote.dropna(subset=["id_cliente"]).assign(fecha=lambda df: _fechas(df["fecha_emision"]))
+        parcial = lote.groupby("id_cliente")["fecha"].agg(primera="min", ultima="max", frecuencia="size")
+        resumen = _combinar(resumen, parcial)
+        pares = pd.DataFrame({"id_cliente": lote["id_cliente"],
+                              "mes": lote["fecha"].dt.year * 12 + lote["fecha"].dt.month - 1}).drop_duplicates()
+        actividad = pares if actividad is None else pd.concat([actividad, pares]).drop_duplicates()
+    if resumen is None:
+        resumen = pd.DataFrame({"primera": pd.Series(dtype="datetime64[ns]"),
+                                "ultima": pd.Series(dtype="datetime64[ns]"),
+                                "frecuencia": pd.Series(dtype="int64")})
+        actividad = pd.DataFrame({"id_cliente": pd.Series(dtype="int64"), "mes": pd.Series(dtype="int64")})
+    return resumen, actividad
+
+def _montos(corte, carpeta, tamano_lote):
+    """Monto gastado por cliente antes del corte, sumado lote a lote"""
+    filtro = ds.field("fecha_emision") < pa.scalar(corte.to_pydatetime(), type=pa.timestamp("ns"))
+    total = pd.Series(dtype="float64")
+    for lote in iterar_hechos(["id_cliente", "monto_venta"], filtro, carpeta, tamano_lote):
+        total = total.add(lote.groupby("id_cliente")["monto_venta"].sum(), fill_value=0)
+    return total
+
+
+# ==================== RFM Y COHORTES ====================
+
+def puntaje(serie, mayor_es_mejor=True):
+    """Puntaje de 1 a `QUINTILES` por cuantiles (con menos valores, menos grupos)"""
+    if serie.empty:
+        return pd.Series(dtype="Int8", index=serie.index)
+    grupos = min(QUINTILES, len(serie))
+    # El rango desempata los valores repetidos para que los cortes sean parejos
+    rango = serie.rank(method="first", ascending=mayor_es_mejor)
+    return (pd.qcut(rango, grupos, labels=False) + 1).astype("Int8")
+
+def tabla_rfm(resumen, montos, clientes, corte):
+    """RFM de todos los clientes; los que no compraron quedan sin recencia ni puntajes"""
+    rfm = pd.DataFrame(index=clientes.index.rename("id_cliente"))
+    rfm["cliente"] = clientes
+    rfm["primera_compra"] = resumen["primera"]
+    rfm["ultima_compra"] = resumen["ultima"]
+    rfm["recencia"] = (corte - rfm["ultima_compra"]).dt.days
+    rfm["frecuencia"] = resumen["frecuencia"].reindex(rfm.index, fill_value=0).astype("int64")
+    rfm["monto"] = montos.reindex(rfm.index, fill_value=0.0).astype("float64")
+
+    compradores = rfm["frecuencia"] > 0
+    rfm["r"] = puntaje(rfm.loc[compradores, "recencia"], mayor_es_mejor=False)
+    rfm["f"] = puntaje(rfm.loc[compradores, "frecuencia"])
+    rfm["m"] = puntaje(rfm.loc[compradores, "monto"])
+    rfm[["r", "f", "m"]] = rfm[["r", "f", "m"]].astype("Int8")
+    rfm["rfm"] = (rfm["r"].astype("string") + rfm["f"].astype("string") + rfm["m"].astype("string"))
+    return rfm
+
+def matrices_cohortes(resumen, actividad):
+    """(clientes activos por cohorte y meses desde la primera compra, retención).
+
+    Las cohortes son el mes de la primera compra (`AAAA-MM`).
+    """
+    primera = resumen["primera"]
+    cohorte = primera.dt.year * 12 + primera.dt.month - 1
+    actividad = actividad.assign(cohorte=actividad["id_cliente"].map(cohorte))
+    actividad["periodo"] = actividad["mes"] - actividad["cohorte"]
+    activos = actividad.groupby(["cohorte", "periodo"]).size().unstack(fill_value=0)
+    activos.index = [f"{c // 12:04d}-{c % 12 + 1:02d}" for c in activos.index]
+    activos.index.name = "cohorte"
+    activos.columns.name = "meses"
+    retencion = activos.div(activos[0], axis=0) if 0 in activos.columns else activos.astype("float64")
+    return activos, retencion
+
+
+# ==================== CACHÉ POR FECHA DE CORTE ====================
+
+def _clave(m, corte, carpeta):
+    """Clave del resultado guardado, o None si las facturas no tienen versión"""
+    version = version_tabla(m, "factura")
+    if version is None:
+        return None
+    estado = leer_estado(carpeta) or {}
+    datos = {"factura": version, "hechos": [estado.get("generacion"), estado.get("marca")],
+             "quintiles": QUINTILES}
+    firma = hashlib.sha256(json.dumps(datos, sort_keys=True).encode("utf-8")).hexdigest()[:16]
+    return f"{corte:%Y%m%d}-{firma}"
+
+def _ruta(carpeta, clave, nombre):
+    return os.path.join(carpeta, NOMBRE_RFM, f"{clave}-{nombre}.parquet")
+
+def _leer_cache(carpeta, clave):
+    rutas = {nombre: _ruta(carpeta, clave, nombre) for nombre in ("rfm", "cohortes", "retencion")}
+    if not all(os.path.exists(ruta) for ruta in rutas.values()):
+        return None
+    resultado = {nombre: pd.read_parquet(ruta) for nombre, ruta in rutas.items()}
+    for nombre in ("cohortes", "retencion"):
+        resultado[nombre].columns = resultado[nombre].columns.astype(int).rename("meses")
+    return resultado
+
+def _guardar_cache(carpeta, clave, resultado):
+    destino = os.path.join(carpeta, NOMBRE_RFM)
+    os.makedirs(destino, exist_ok=True)
+    # Un corte se guarda una sola vez: se borran sus versiones de datos anteriores
+    for vieja in glob.glob(os.path.join(destino, f"{clave.split('-')[0]}-*.parquet")):
+        os.remove(vieja)
+    for nombre in ("rfm", "cohortes", "retencion"):
+        df = resultado[nombre]
+        if nombre != "rfm":
+            df = df.set_axis(df.columns.astype(str), axis=1)
+        df.to_parquet(_ruta(carpeta, clave, nombre))
+
+
+def analizar_clientes(fecha_corte=None, origen=None, carpeta=CARPETA_DATOS, tamano_lote=TAMANO_LOTE):
+    """RFM y cohortes de los clientes a la fecha de corte (sin incluirla).
+
+    Retorna {"fecha_corte", "rfm", "cohortes", "retencion"}. Usa la tabla de hechos,
+    que se actualiza aparte con `hechos.actualizar_hechos`.
+    """
+    m = motor(origen) if origen is None or isinstance(origen, str) else origen
+    corte = pd.Timestamp(fecha_corte) if fecha_corte is not None else fecha_corte_predeterminada(m)
+    clave = _clave(m, corte, carpeta)
+    resultado = _leer_cache(carpeta, clave) if clave else None
+    if resultado is None:
+        resumen, actividad = _recorrer_facturas(m, corte, tamano_lote)
+        clientes = cargar_tabla("clientes", columnas=["id_clientes", "nombre"], origen=m)
+        clientes = clientes.drop_duplicates("id_clientes").set_index("id_clientes")["nombre"]
+        activos, retencion = matrices_cohortes(resumen, actividad)
+        resultado = {"rfm": tabla_rfm(resumen, _montos(corte, carpeta, tamano_lote), clientes, corte),
+                     "cohortes": activos, "retencion": retencion}
+        if clave:
+            _guardar_cache(carpeta, clave, resultado)
+    return {"fecha_corte": corte, **resultado}
@@ -0,0 +1,225 @@
+"""Mediciones de rendimiento de Proyecto 1 y Proyecto 3 sobre datos sintéticos.
+
+Siguen la convención de asv: cada clase es una suite con `params` y
+`param_names`, `setup` prepara los datos (no se mide) y cada método `time_*` es
+una medición. `correr.py` las ejecuta y compara con la corrida anterior; también
+se pueden correr con asv.
+
+Las escalas se eligen con la variable `BENCH_ESCALAS` (por defecto "10k 100k"; las
+disponibles están en `generar_datos.ESCALAS`). Los datos de cada escala se generan
+la primera vez en `benchmarks/datos/` (o en `BENCH_DATOS`) y se reutilizan: con la
+misma semilla son siempre los mismos.
+"""
+import importlib.util
+import os
+import shutil
+import sys
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+CARPETA = os.path.dirname(os.path.abspath(__file__))
+RAIZ = os.path.dirname(CARPETA)
+for ruta in (CARPETA, RAIZ, os.path.join(RAIZ, "Proyecto 1"), os.path.join(RAIZ, "Proyecto 3")):
+    if ruta not in sys.path:
+        sys.path.insert(0, ruta)
+
+# La caché de consultas de libreria no debe mezclarse con la del repositorio
+os.environ.setdefault("LIBRERIA_CACHE", os.path.join(tempfile.gettempdir(), "libreria_benchmarks"))
+
+from generar_datos import SEMILLA, generar
+
+from libreria import TABLAS, consultar, motor
+from libreria.acceso_datos import cargar_tabla
+
+from almacenamiento import escribir_tabla, leer_tabla, ruta_tabla
+from diferencias import comparar
+from indice_busqueda import buscar, construir_indice
+from relaciones import construir_vista
+
+from agregados import consulta_agregado, consulta_ventas, consultar_archivos
+from cubo import actualizar_cubo, construir_cubo, rollup
+from hechos import actualizar_hechos, agregado_hechos, leer_hechos
+
+HAY_DUCKDB = importlib.util.find_spec("duckdb") is not None
+
+ESCALAS = os.environ.get("BENCH_ESCALAS", "10k 100k").split()
+CARPETA_DATOS = os.environ.get("BENCH_DATOS", os.path.join(CARPETA, "datos"))
+
+
+def datos(escala, formato):
+    """Carpeta (o base SQLite) con los datos de la escala; se generan la primera vez"""
+    destino = os.path.join(CARPETA_DATOS, f"{escala}-s{SEMILLA}", "libreria.db" if formato == "sqlite" else formato)
+    listo = f"{destino}.listo"
+    if not os.path.exists(listo):
+        generar(destino, escala, formato)
+        open(listo, "w").close()
+    return destino
+
+def url_sqlite(escala):
+    return f"sqlite:///{datos(escala, 'sqlite')}"
+
+def tablas(escala, nombres):
+    """{archivo: DataFrame indexado por id} leídos del Parquet de la escala"""
+    carpeta = datos(escala, "parquet")
+    return {TABLAS[t]: leer_tabla(ruta_tabla(carpeta, TABLAS[t], "parquet")) for t in nombres}
+
+def hechos(escala):
+    """Carpeta con la tabla de hechos (y el cubo) de la escala"""
+    carpeta = os.path.join(CARPETA_DATOS, f"{escala}-s{SEMILLA}", "hechos")
+    actualizar_hechos(origen=url_sqlite(escala), carpeta=carpeta)
+    return carpeta
+
+
+# ==================== CARGA ====================
+
+class Carga:
+    """Lectura de la tabla de ventas con la capa de almacenamiento de Proyecto 1"""
+    params = (ESCALAS, ["csv", "parquet"])
+    param_names = ["escala", "formato"]
+
+    def setup(self, escala, formato):
+        self.ruta = ruta_tabla(datos(escala, formato), "ventas", formato)
+
+    def time_leer_ventas(self, escala, formato):
+        leer_tabla(self.ruta)
+
+    def time_leer_dos_columnas(self, escala, formato):
+        leer_tabla(self.ruta, columnas=["id_libro", "cantidad"])
+
+
+class CargaBase:
+    """Lectura desde la base con `libreria.cargar_tabla`, sin caché"""
+    params = (ESCALAS,)
+    param_names = ["escala"]
+
+    def setup(self, escala):
+        self.motor = motor(url_sqlite(escala))
+
+    def time_cargar_ventas(self, escala):
+        cargar_tabla("ventas", origen=self.motor, cache=False)
+
+    def time_cargar_facturas_un_mes(self, escala):
+        cargar_tabla("factura", desde="2022-03-01", hasta="2022-04-01", origen=self.motor, cache=False)
+
+
+# ==================== UNIONES ====================
+
+class Union:
+    """Ventas unidas con sus dimensiones"""
+    params = (ESCALAS,)
+    param_names = ["escala"]
+
+    def setup(self, escala):
+        self.tablas = tablas(escala, ["ventas", "libros", "factura"])
+        self.motor = motor(url_sqlite(escala))
+        self.consulta, self.leidas = consulta_ventas()
+
+    def time_vista_ventas_detalle(self, escala):
+        construir_vista("ventas_detalle", self.tablas.get)
+
+    def time_ventas_completo_sql(self, escala):
+        consultar(self.consulta, tablas=self.leidas, origen=self.motor, cache=False)
+
+
+class UnionDuckDB:
+    """Ventas unidas con DuckDB sobre los archivos Parquet"""
+    params = (ESCALAS,)
+    param_names = ["escala"]
+
+    def setup(self, escala):
+        if not HAY_DUCKDB:
+            raise NotImplementedError("duckdb no está instalado")
+        self.carpeta = datos(escala, "parquet")
+        self.consulta, self.leidas = consulta_ventas()
+
+    def time_ventas_completo_duckdb(self, escala):
+        consultar_archivos(self.consulta, self.leidas, self.carpeta)
+
+
+# ==================== AGRUPAMIENTOS ====================
+
+class Agrupamiento:
+    """Ventas por género: en SQL, sobre la tabla de hechos y desde el cubo"""
+    params = (ESCALAS,)
+    param_names = ["escala"]
+
+    def setup(self, escala):
+        self.motor = motor(url_sqlite(escala))
+        carpeta = hechos(escala)
+        self.hechos = leer_hechos(carpeta=carpeta)
+        self.cubo = actualizar_cubo(carpeta, self.motor)
+        self.consulta, self.leidas = consulta_agregado("ventas_por_genero")
+
+    def time_agregado_sql(self, escala):
+        consultar(self.consulta, tablas=self.leidas, origen=self.motor, cache=False)
+
+    def time_agregado_hechos(self, escala):
+        agregado_hechos(self.hechos, "ventas_por_genero", origen=self.motor)
+
+    def time_construir_cubo(self, escala):
+        construir_cubo(self.hechos)
+
+    def time_rollup_genero_mes(self, escala):
+        rollup(self.cubo, ("genero",), "mes")
+
+
+# ==================== BÚSQUEDA ====================
+
+class Busqueda:
+    """Índice de trigramas de Proyecto 1 sobre la tabla de clientes"""
+    params = (ESCALAS,)
+    param_names = ["escala"]
+
+    def setup(self, escala):
+        self.clientes = tablas(escala, ["clientes"])["clientes"]
+        self.indice = construir_indice(self.clientes)
+
+    def time_construir_indice(self, escala):
+        construir_indice(self.clientes)
+
+    def time_buscar(self, escala):
+        buscar(self.indice, "ente 12")
+
+
+# ==================== GUARDADO ====================
+
+class Guardado:
+    """Escritura de la tabla de ventas con la capa de almacenamiento de Proyecto 1"""
+    params = (ESCALAS, ["csv", "parquet"])
+    param_names = ["escala", "formato"]
+
+    def setup(self, escala, formato):
+        self.ventas = tablas(escala, ["ventas"])["ventas"]
+        self.carpeta = tempfile.mkdtemp()
+
+    def teardown(self, escala, formato):
+        shutil.rmtree(self.carpeta, ignore_errors=True)
+
+    def time_escribir_ventas(self, escala, formato):
+        escribir_tabla(self.ventas, ruta_tabla(self.carpeta, "ventas", formato))
+
+
+# ==================== DIFERENCIAS ====================
+
+class Diferencias:
+    """Comparación de dos versiones de ventas (1% de filas editadas, 0,5% agregadas
+    y 0,5% borradas)"""
+    params = (ESCALAS, ["valores", "hash"])
+    param_names = ["escala", "modo"]
+
+    def setup(self, escala, modo):
+        self.anterior = tablas(escala, ["ventas"])["ventas"]
+        rng = np.random.default_rng(SEMILLA)
+        n = len(self.anterior)
+        nuevo = self.anterior.copy()
+        editadas = rng.choice(n, max(1, n // 100), replace=False)
+        nuevo.iloc[editadas, nuevo.columns.get_loc("cantidad")] += 1
+        nuevo = nuevo.drop(nuevo.index[rng.choice(n, max(1, n // 200), replace=False)])
+        altas = self.anterior.iloc[: max(1, n // 200)]
+        altas = altas.set_axis(altas.index + self.anterior.index.max())
+        self.nuevo = pd.concat([nuevo, altas])
+
+    def time_comparar(self, escala, modo):
+        comparar(self.anterior, self.nuevo, modo)
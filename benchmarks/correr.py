@@ -0,0 +1,149 @@
+"""Corre las mediciones de `benchmarks.py` y las compara con una corrida anterior.
+
+Cada combinación de parámetros se mide con `time.perf_counter`: al menos
+`REPETICIONES_MINIMAS` veces y hasta juntar `TIEMPO_MINIMO` segundos (sin pasar de
+`REPETICIONES_MAXIMAS`); se guardan el mínimo y la mediana. El resultado queda en
+`resultados/<fecha>-<commit>.json` y se compara con `--base` (o con el último
+resultado guardado): una medición cuyo mínimo crece más que `--umbral` veces se
+marca como regresión y el proceso termina con código 1.
+
+Uso:
+    python correr.py [--escalas 10k 100k] [--filtro Carga] [--base resultados/x.json] [--umbral 1.2]
+"""
+import argparse
+import glob
+import inspect
+import itertools
+import json
+import os
+import platform
+import re
+import statistics
+import subprocess
+import sys
+import time
+
+CARPETA = os.path.dirname(os.path.abspath(__file__))
+CARPETA_RESULTADOS = os.path.join(CARPETA, "resultados")
+
+REPETICIONES_MINIMAS = 3
+REPETICIONES_MAXIMAS = 10
+TIEMPO_MINIMO = 0.2
+UMBRAL = 1.2
+
+
+def commit_actual():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=CARPETA,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "sin-git"
+
+def suites(modulo):
+    """Clases de `modulo` con mediciones (métodos `time_*`), en orden de definición"""
+    return [clase for clase in vars(modulo).values()
+            if inspect.isclass(clase) and clase.__module__ == modulo.__name__
+            and any(nombre.startswith("time_") for nombre in vars(clase))]
+
+def medir(funcion):
+    """(mínimo, mediana, repeticiones) de los tiempos de `funcion` en segundos"""
+    tiempos = []
+    while len(tiempos) < REPETICIONES_MINIMAS or \
+            (sum(tiempos) < TIEMPO_MINIMO and len(tiempos) < REPETICIONES_MAXIMAS):
+        inicio = time.perf_counter()
+        funcion()
+        tiempos.append(time.perf_counter() - inicio)
+    return min(tiempos), statistics.median(tiempos), len(tiempos)
+
+def correr(modulo, filtro=None):
+    """{"Suite.time_x(param, ...)": {"minimo", "mediana", "repeticiones"}}"""
+    resultados = {}
+    for clase in suites(modulo):
+        params = getattr(clase, "params", ())
+        params = params if params and isinstance(params[0], (list, tuple)) else [params] if params else []
+        metodos = [m for m in vars(clase) if m.startswith("time_")]
+        for combinacion in itertools.product(*params):
+            nombres = [f"{clase.__name__}.{m}({', '.join(map(str, combinacion))})" for m in metodos]
+            if filtro and not any(re.search(filtro, n) for n in nombres):
+                continue
+            instancia = clase()
+            try:
+                if hasattr(instancia, "setup"):
+                    instancia.setup(*combinacion)
+            except NotImplementedError as e:
+                # Convención de asv: setup lo lanza cuando la medición no aplica
+                print(f"{clase.__name__}({', '.join(map(str, combinacion))}): omitida ({e})")
+                continue
+            try:
+                for metodo, nombre in zip(metodos, nombres):
+                    if filtro and not re.search(filtro, nombre):
+                        continue
+                    minimo, mediana, repeticiones = medir(lambda: getattr(instancia, metodo)(*combinacion))
+                    resultados[nombre] = {"minimo": minimo, "mediana": mediana, "repeticiones": repeticiones}
+                    print(f"{nombre:<64} {minimo * 1000:>10.2f} ms  (mediana {mediana * 1000:.2f} ms)")
+            finally:
+                if hasattr(instancia, "teardown"):
+                    instancia.teardown(*combinacion)
+    return resultados
+
+def ultimo_resultado(excepto=None):
+    rutas = sorted(r for r in glob.glob(os.path.join(CARPETA_RESULTADOS, "*.json")) if r != excepto)
+    return rutas[-1] if rutas else None
+
+def comparar(actual, base, umbral=UMBRAL):
+    """[(medición, tiempo base, tiempo actual, cociente)] de las que se pueden comparar,
+    y la lista de las que superan el umbral"""
+    filas = [(nombre, base[nombre]["minimo"], datos["minimo"], datos["minimo"] / base[nombre]["minimo"])
+             for nombre, datos in actual.items() if nombre in base and base[nombre]["minimo"] > 0]
+    return filas, [fila for fila in filas if fila[3] > umbral]
+
+def guardar(resultados, escalas):
+    os.makedirs(CARPETA_RESULTADOS, exist_ok=True)
+    commit = commit_actual()
+    ruta = os.path.join(CARPETA_RESULTADOS, f"{time.strftime('%Y%m%d-%H%M%S')}-{commit}.json")
+    with open(ruta, "w", encoding="utf-8") as f:
+        json.dump({"commit": commit, "fecha": time.strftime("%Y-%m-%d %H:%M:%S"), "escalas": escalas,
+                   "maquina": {"python": platform.python_version(), "sistema": platform.platform(),
+                               "procesador": platform.processor(), "cpus": os.cpu_count()},
+                   "resultados": resultados}, f, indent=2)
+    return ruta
+
+
+def main(argumentos=None):
+    parser = argparse.ArgumentParser(description="Mide los tiempos de carga, uniones, agrupamientos, "
+                                                 "búsqueda, guardado y diferencias")
+    parser.add_argument("--escalas", nargs="+", default=None, help="Escalas a medir (p. ej. 10k 100k 1M)")
+    parser.add_argument("--filtro", default=None, help="Expresión regular sobre el nombre de la medición")
+    parser.add_argument("--base", default=None, help="Resultado contra el que comparar (el último si no se indica)")
+    parser.add_argument("--umbral", type=float, default=UMBRAL,
+                        help="Cociente actual/base a partir del cual hay regresión")
+    args = parser.parse_args(argumentos)
+
+    # benchmarks.py lee las escalas al importarse
+    if args.escalas:
+        os.environ["BENCH_ESCALAS"] = " ".join(args.escalas)
+    sys.path.insert(0, CARPETA)
+    import benchmarks
+
+    resultados = correr(benchmarks, args.filtro)
+    ruta = guardar(resultados, benchmarks.ESCALAS)
+    print(f"\nResultados: {ruta}")
+
+    ruta_base = args.base or ultimo_resultado(excepto=ruta)
+    if ruta_base is None:
+        return 0
+    with open(ruta_base, "r", encoding="utf-8") as f:
+        base = json.load(f)
+    filas, regresiones = comparar(resultados, base["resultados"], args.umbral)
+    print(f"Comparación con {os.path.basename(ruta_base)} (commit {base['commit']}):")
+    for nombre, anterior, actual, cociente in filas:
+        marca = "  REGRESIÓN" if cociente > args.umbral else ""
+        print(f"{nombre:<64} {anterior * 1000:>10.2f} -> {actual * 1000:>10.2f} ms  x{cociente:.2f}{marca}")
+    if regresiones:
+        print(f"\n{len(regresiones)} regresiones por encima de x{args.umbral}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
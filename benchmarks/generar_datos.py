@@ -0,0 +1,283 @@
+"""Generador de datos sintéticos con el esquema de la base `libreria`.
+
+Arma todas las tablas (clientes, autores, libros, factura, ventas y las tablas de
+referencia) a la escala pedida, de 10 mil a 100 millones de ventas, con claves
+foráneas válidas y una distribución parecida a la real:
+
+- La popularidad de los libros y la frecuencia de compra de los clientes siguen
+  una ley de Zipf (`sesgo`): pocos libros y clientes concentran muchas ventas.
+- Las facturas tienen una cantidad geométrica de líneas (1 la mayoría), las
+  cantidades son casi siempre 1 y los precios tienen distribución lognormal.
+- Las fechas avanzan con el id de factura, como en una base real.
+- `cant_total` y `monto_total` de cada factura coinciden con sus ventas.
+
+Las tablas de referencia (géneros, formatos, países, localidades, métodos de pago y
+proveedores) se copian de `Proyecto 1/Tables/`.
+
+Con la misma escala y semilla los datos son siempre los mismos: cada bloque de
+facturas usa su propio generador aleatorio derivado de la semilla. Las facturas y
+sus ventas se generan y escriben por bloques, así que la memoria no depende de la
+escala. Salidas: CSV (mismos nombres de archivo que `Tables/`), Parquet o una base
+SQLite (mismos nombres de tabla que la base MySQL).
+
+Uso:
+    python benchmarks/generar_datos.py --escala 1M --formato parquet --destino datos_1M
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+from libreria import TABLAS
+
+CARPETA_REFERENCIA = os.path.join(RAIZ, "Proyecto 1", "Tables")
+
+# Cantidad de ventas (líneas) de cada escala; la generada difiere en unas pocas filas
+ESCALAS = {
+    "10k": 10_000,
+    "100k": 100_000,
+    "1M": 1_000_000,
+    "10M": 10_000_000,
+    "100M": 100_000_000,
+}
+
+FORMATOS = ("csv", "parquet", "sqlite")
+
+# Tablas que se copian tal cual de Tables/
+TABLAS_REFERENCIA = ("formatos", "generos", "paises", "localidades", "metodos_de_pago", "proveedores")
+
+# Proporciones entre tablas
+LINEAS_POR_FACTURA = 2.1
+FACTURAS_POR_CLIENTE = 12
+VENTAS_POR_LIBRO = 80
+LIBROS_POR_AUTOR = 8
+MINIMOS = {"clientes": 40, "libros": 120, "autores": 50}
+
+# Exponente de Zipf de la popularidad de libros y clientes (0: uniforme)
+SESGO = 1.0
+
+# Parte de los libros en formato físico
+PROPORCION_FISICO = 0.85
+
+# Período que cubren las facturas
+FECHA_DESDE = "2020-01-01"
+AÑOS = 5
+
+# Facturas que se generan y escriben por vez
+FACTURAS_POR_BLOQUE = 500_000
+
+SEMILLA = 42
+
+
+def cantidad_ventas(escala):
+    """Ventas de una escala con nombre ("1M") o un número"""
+    if isinstance(escala, str) and escala in ESCALAS:
+        return ESCALAS[escala]
+    return int(escala)
+
+def tamanos(ventas):
+    """Cantidad de filas de cada tabla generada para esa cantidad de ventas"""
+    facturas = max(1, round(ventas / LINEAS_POR_FACTURA))
+    libros = max(MINIMOS["libros"], ventas // VENTAS_POR_LIBRO)
+    return {
+        "ventas": ventas,
+        "factura": facturas,
+        "clientes": max(MINIMOS["clientes"], facturas // FACTURAS_POR_CLIENTE),
+        "libros": libros,
+        "autores": max(MINIMOS["autores"], libros // LIBROS_POR_AUTOR),
+    }
+
+
+# ==================== DISTRIBUCIONES ====================
+
+class Zipf:
+    """Muestreo de ids 1..n con probabilidad proporcional a 1 / rango^sesgo.
+
+    Los rangos se reparten entre los ids con una permutación fija, así que los más
+    populares no son siempre los primeros ids.
+    """
+
+    def __init__(self, n, sesgo, rng):
+        pesos = 1.0 / np.arange(1, n + 1, dtype="float64") ** sesgo
+        self.acumulada = np.cumsum(pesos / pesos.sum())
+        self.ids = rng.permutation(n).astype("int64") + 1
+
+    def muestra(self, rng, cantidad):
+        rangos = np.searchsorted(self.acumulada, rng.random(cantidad), side="right")
+        return self.ids[np.minimum(rangos, len(self.ids) - 1)]
+
+
+def _referencia(tabla):
+    return pd.read_csv(os.path.join(CARPETA_REFERENCIA, f"{TABLAS[tabla]}.csv"))
+
+def tablas_fijas(n, semilla, sesgo):
+    """Tablas de referencia y dimensiones (autores, libros, clientes)"""
+    rng = np.random.default_rng([semilla, 0])
+    tablas = {tabla: _referencia(tabla) for tabla in TABLAS_REFERENCIA}
+    paises, generos, localidades = (len(tablas[t]) for t in ("paises", "generos", "localidades"))
+
+    tablas["autores"] = pd.DataFrame({
+        "id_autores": np.arange(1, n["autores"] + 1),
+        "nombre": [f"Autor {i}" for i in range(1, n["autores"] + 1)],
+        "id_paises": Zipf(paises, sesgo, rng).muestra(rng, n["autores"]),
+    })
+    precios = np.round(rng.lognormal(np.log(15_000), 0.35, n["libros"]), -2)
+    tablas["libros"] = pd.DataFrame({
+        "id_libro": np.arange(1, n["libros"] + 1),
+        "nombre": [f"Libro {i}" for i in range(1, n["libros"] + 1)],
+        "id_autores": Zipf(n["autores"], sesgo, rng).muestra(rng, n["libros"]),
+        "id_generos": Zipf(generos, sesgo, rng).muestra(rng, n["libros"]),
+        "id_formatos": np.where(rng.random(n["libros"]) < PROPORCION_FISICO, 1, 2),
+        "precio": np.maximum(precios, 1000.0),
+    })
+    tablas["clientes"] = pd.DataFrame({
+        "id_clientes": np.arange(1, n["clientes"] + 1),
+        "nombre": [f"Cliente {i}" for i in range(1, n["clientes"] + 1)],
+        "id_localidades": Zipf(localidades, sesgo, rng).muestra(rng, n["clientes"]),
+        "domicilio": [f"Calle {i % 997 + 1} {i % 9000 + 100}" for i in range(1, n["clientes"] + 1)],
+    })
+    return tablas, rng
+
+def bloques_de_ventas(n, libros, semilla, sesgo, rng):
+    """Genera (factura, ventas) por bloques de `FACTURAS_POR_BLOQUE` facturas"""
+    elegir_libro = Zipf(n["libros"], sesgo, rng)
+    elegir_cliente = Zipf(n["clientes"], sesgo, rng)
+    precios = libros["precio"].to_numpy()
+    desde = pd.Timestamp(FECHA_DESDE).value // 10**9
+    segundos = AÑOS * 365 * 86_400
+    # Líneas por factura: 1 + geométrica, con media LINEAS_POR_FACTURA
+    p_lineas = 1 / LINEAS_POR_FACTURA
+    id_venta = 1
+    for numero, inicio in enumerate(range(0, n["factura"], FACTURAS_POR_BLOQUE), start=1):
+        rng_bloque = np.random.default_rng([semilla, numero])
+        ids = np.arange(inicio + 1, min(inicio + FACTURAS_POR_BLOQUE, n["factura"]) + 1)
+        lineas = rng_bloque.geometric(p_lineas, len(ids))
+        # La última factura completa la cantidad de ventas pedida
+        if ids[-1] == n["factura"]:
+            restantes = n["ventas"] - (id_venta - 1) - lineas[:-1].sum()
+            lineas[-1] = max(1, restantes)
+        id_factura = np.repeat(ids, lineas)
+        cantidad = rng_bloque.geometric(0.8, len(id_factura))
+        id_libro = elegir_libro.muestra(rng_bloque, len(id_factura))
+        ventas = pd.DataFrame({
+            "id_ventas": np.arange(id_venta, id_venta + len(id_factura)),
+            "id_libro": id_libro,
+            "cantidad": cantidad,
+            "id_factura": id_factura,
+        })
+        id_venta += len(ventas)
+
+        # Fechas crecientes con el id, con algo de dispersión dentro de cada tramo
+        paso = segundos / n["factura"]
+        instantes = desde + ((ids - 1) * paso + rng_bloque.random(len(ids)) * paso).astype("int64")
+        montos = np.bincount(np.repeat(np.arange(len(ids)), lineas), weights=cantidad * precios[id_libro - 1],
+                             minlength=len(ids))
+        factura = pd.DataFrame({
+            "id_factura": ids,
+            "id_cliente": elegir_cliente.muestra(rng_bloque, len(ids)),
+            "fecha_emision": pd.to_datetime(instantes, unit="s").strftime("%Y-%m-%d %H:%M:%S"),
+            "cant_total": np.bincount(np.repeat(np.arange(len(ids)), lineas), weights=cantidad,
+                                      minlength=len(ids)).astype("int64"),
+            "monto_total": montos,
+        })
+        yield factura, ventas
+
+
+# ==================== ESCRITURA ====================
+
+class _Salida:
+    """Escribe tablas por bloques en CSV, Parquet o SQLite"""
+
+    def __init__(self, destino, formato):
+        self.destino, self.formato = destino, formato
+        self.escritores = {}
+        if formato == "sqlite":
+            from sqlalchemy import create_engine
+            os.makedirs(os.path.dirname(os.path.abspath(destino)), exist_ok=True)
+            if os.path.exists(destino):
+                os.remove(destino)
+            self.motor = create_engine(f"sqlite:///{destino}")
+        else:
+            os.makedirs(destino, exist_ok=True)
+
+    def ruta(self, tabla):
+        return os.path.join(self.destino, f"{TABLAS[tabla]}.{self.formato}")
+
+    def escribir(self, tabla, df):
+        if self.formato == "sqlite":
+            df.to_sql(tabla, self.motor, if_exists="append", index=False, chunksize=100_000)
+        elif self.formato == "csv":
+            primero = tabla not in self.escritores
+            df.to_csv(self.ruta(tabla), mode="w" if primero else "a", header=primero, index=False)
+            self.escritores[tabla] = True
+        else:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+            datos = pa.Table.from_pandas(df, preserve_index=False)
+            if tabla not in self.escritores:
+                self.escritores[tabla] = pq.ParquetWriter(self.ruta(tabla), datos.schema)
+            self.escritores[tabla].write_table(datos)
+
+    def cerrar(self):
+        if self.formato == "parquet":
+            for escritor in self.escritores.values():
+                escritor.close()
+        elif self.formato == "sqlite":
+            from sqlalchemy import text
+            # Índices de las claves, como los de la base real
+            with self.motor.begin() as conexion:
+                for tabla, columna in (("ventas", "id_ventas"), ("ventas", "id_factura"),
+                                       ("factura", "id_factura"), ("libros", "id_libro"),
+                                       ("clientes", "id_clientes"), ("autores", "id_autores")):
+                    conexion.execute(text(f"CREATE INDEX ix_{tabla}_{columna} ON {tabla} ({columna})"))
+            self.motor.dispose()
+
+
+def generar(destino, escala="10k", formato="parquet", semilla=SEMILLA, sesgo=SESGO):
+    """Genera todas las tablas en `destino` (una carpeta, o el archivo de la base
+    si `formato` es "sqlite"). Retorna la cantidad de filas de cada tabla."""
+    if formato not in FORMATOS:
+        raise ValueError(f"Formato desconocido: {formato}")
+    n = tamanos(cantidad_ventas(escala))
+    tablas, rng = tablas_fijas(n, semilla, sesgo)
+    salida = _Salida(destino, formato)
+    filas = {}
+    try:
+        for tabla, df in tablas.items():
+            salida.escribir(tabla, df)
+            filas[tabla] = len(df)
+        filas["factura"] = filas["ventas"] = 0
+        for factura, ventas in bloques_de_ventas(n, tablas["libros"], semilla, sesgo, rng):
+            salida.escribir("factura", factura)
+            salida.escribir("ventas", ventas)
+            filas["factura"] += len(factura)
+            filas["ventas"] += len(ventas)
+    finally:
+        salida.cerrar()
+    return filas
+
+
+def main(argumentos=None):
+    parser = argparse.ArgumentParser(description="Genera datos sintéticos con el esquema de la base libreria")
+    parser.add_argument("--escala", default="10k", help=f"Ventas a generar: {', '.join(ESCALAS)} o un número")
+    parser.add_argument("--formato", choices=FORMATOS, default="parquet")
+    parser.add_argument("--destino", required=True, help="Carpeta de salida (archivo .db con --formato sqlite)")
+    parser.add_argument("--semilla", type=int, default=SEMILLA)
+    parser.add_argument("--sesgo", type=float, default=SESGO, help="Exponente de Zipf de libros y clientes")
+    args = parser.parse_args(argumentos)
+
+    inicio = time.perf_counter()
+    filas = generar(args.destino, args.escala, args.formato, args.semilla, args.sesgo)
+    for tabla, cantidad in filas.items():
+        print(f"{tabla:<16} {cantidad:>12,} filas")
+    print(f"Generado en {args.destino} ({time.perf_counter() - inicio:.2f} s)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
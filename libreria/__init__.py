@@ -0,0 +1,14 @@
+"""Código compartido por los proyectos que usan la base `libreria`."""
+from libreria.acceso_datos import (
+    COLUMNAS_FECHA,
+    TABLAS,
+    URL_PREDETERMINADA,
+    cargar_tabla,
+    cerrar_motores,
+    consultar,
+    crear_motor,
+    leer_lotes,
+    motor,
+    vaciar_cache,
+    version_tabla,
+)
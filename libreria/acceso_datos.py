@@ -0,0 +1,281 @@
+"""Acceso compartido a la base `libreria`.
+
+Un solo lugar para conectarse y leer las tablas, usado por el notebook de
+Proyecto 3 y por la exportación de Proyecto 1:
+
+- `motor(url)`: un motor de SQLAlchemy por URL y por proceso, con un pool de
+  conexiones que se reutiliza entre consultas.
+- `cargar_tabla`: lee una tabla trayendo solo las columnas pedidas (proyección) y
+  solo las filas de un rango (predicado), resueltos en la base con el `SELECT`.
+- `consultar`: cualquier consulta SQL, indicando de qué tablas depende.
+- Los resultados se guardan en una caché en disco (`CARPETA_CACHE`) con la clave
+  (URL, consulta, parámetros, versión de cada tabla). Otro proceso o el mismo
+  notebook vuelto a correr los toma de ahí sin ir a la base; cuando una tabla
+  cambia su versión cambia y la consulta se vuelve a hacer.
+
+La versión de una tabla es una marca de cambio que la base da sin recorrer la tabla:
+
+- MySQL: `UPDATE_TIME` de `information_schema.TABLES` o, si no lo tiene, `CHECKSUM
+  TABLE ... QUICK` (solo existe en tablas con checksum en vivo).
+- SQLite: fecha de modificación y tamaño del archivo de la base y de su `-wal` (en
+  modo WAL las escrituras van al `-wal` hasta el checkpoint).
+
+Como estas marcas tienen resolución de un segundo (o del reloj del sistema de
+archivos), una tabla modificada hace menos de `MARGEN_VERSION` segundos no tiene
+versión todavía. Sin versión (otras bases, SQLite en memoria, una tabla InnoDB sin
+`UPDATE_TIME`, un cambio reciente) la consulta va siempre a la base: contar filas no
+sirve, porque un `UPDATE` o una baja más un alta no cambian la cantidad.
+
+La URL sale de `LIBRERIA_URL` si está definida (p. ej. `sqlite:///libreria.db`
+para trabajar sin servidor) y la carpeta de la caché de `LIBRERIA_CACHE`.
+"""
+import hashlib
+import importlib.util
+import json
+import os
+import tempfile
+import threading
+import time
+
+import pandas as pd
+from sqlalchemy import create_engine, make_url, text
+
+HAY_PYARROW = importlib.util.find_spec("pyarrow") is not None
+
+# Motor de conexión
+host = "localhost"
+user = "root"
+password = ""
+port = 3306
+database = "libreria"
+
+URL_PREDETERMINADA = os.environ.get(
+    "LIBRERIA_URL", f"mysql+pymysql://{user}:{password}@{host}:{port}/{database}?charset=utf8mb4")
+
+# Tabla en la base -> nombre de su archivo en Tables/
+TABLAS = {
+    "clientes": "clientes",
+    "autores": "autores",
+    "factura": "factura",
+    "formatos": "formato",
+    "generos": "genero",
+    "libros": "libros",
+    "localidades": "localidades",
+    "metodos_de_pago": "metodos_de_pago",
+    "paises": "paises",
+    "proveedores": "proovedores",
+    "ventas": "ventas",
+}
+
+# Columna de fecha de las tablas que se pueden filtrar por `desde`/`hasta`
+COLUMNAS_FECHA = {"factura": "fecha_emision"}
+
+# Conexiones del pool de cada motor
+CONEXIONES = 4
+
+# Caché de resultados compartida por todos los proyectos del repositorio
+CARPETA_CACHE = os.environ.get(
+    "LIBRERIA_CACHE", os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "cache_datos"))
+
+# Segundos desde el último cambio de una tabla durante los que no se usa la caché
+MARGEN_VERSION = 2
+
+# Tamaño máximo de la caché; al pasarlo se borran los resultados usados hace más tiempo
+MAX_BYTES_CACHE = 2 * 1024 ** 3
+
+_motores = {}
+_cerrojo = threading.Lock()
+
+
+# ==================== MOTORES ====================
+
+def crear_motor(url=URL_PREDETERMINADA, conexiones=CONEXIONES):
+    """Motor nuevo con un pool de a lo sumo `conexiones` conexiones"""
+    return create_engine(url, pool_size=conexiones, max_overflow=0, pool_pre_ping=True)
+
+def motor(url=None):
+    """Motor compartido de la URL (el mismo en cada llamada dentro del proceso)"""
+    url = url or URL_PREDETERMINADA
+    with _cerrojo:
+        if url not in _motores:
+            _motores[url] = crear_motor(url)
+        return _motores[url]
+
+def cerrar_motores():
+    """Cierra las conexiones de todos los motores compartidos"""
+    with _cerrojo:
+        for m in _motores.values():
+            m.dispose()
+        _motores.clear()
+
+def _motor(origen):
+    return origen if origen is not None and not isinstance(origen, str) else motor(origen)
+
+
+# ==================== CONSULTAS ====================
+
+def consulta_tabla(m, tabla, columnas=None, rangos=None):
+    """SQL y parámetros para leer una tabla.
+
+    `columnas` limita las columnas traídas y `rangos` ({columna: (desde, hasta)}, con
+    None como extremo abierto) las filas; `hasta` es exclusivo.
+    """
+    q = m.dialect.identifier_preparer.quote
+    proyeccion = ", ".join(q(c) for c in columnas) if columnas else "*"
+    condiciones, parametros = [], {}
+    for i, (columna, (desde, hasta)) in enumerate((rangos or {}).items()):
+        if desde is not None:
+            condiciones.append(f"{q(columna)} >= :desde_{i}")
+            parametros[f"desde_{i}"] = desde
+        if hasta is not None:
+            condiciones.append(f"{q(columna)} < :hasta_{i}")
+            parametros[f"hasta_{i}"] = hasta
+    consulta = f"SELECT {proyeccion} FROM {q(tabla)}"
+    if condiciones:
+        consulta += " WHERE " + " AND ".join(condiciones)
+    return consulta, parametros
+
+def leer_lotes(origen, consulta, tamano_lote, parametros=None):
+    """Recorre el resultado de una consulta en lotes con un cursor del lado del
+    servidor, sin pasar por la caché (para volcados grandes)"""
+    m = _motor(origen)
+    with m.connect().execution_options(stream_results=True, max_row_buffer=tamano_lote) as conexion:
+        yield from pd.read_sql_query(text(consulta), conexion, params=parametros, chunksize=tamano_lote)
+
+def _version_sqlite(ruta):
+    archivos = [os.stat(r) for r in (ruta, f"{ruta}-wal") if os.path.exists(r)]
+    if time.time() - max(estado.st_mtime for estado in archivos) < MARGEN_VERSION:
+        return None
+    return "/".join(f"{estado.st_mtime_ns}-{estado.st_size}" for estado in archivos)
+
+def _version_mysql(m, conexion, tabla):
+    if not getattr(m.dialect, "is_mariadb", False) and (m.dialect.server_version_info or ()) >= (8,):
+        # MySQL 8 guarda las estadísticas de information_schema por un día
+        conexion.execute(text("SET SESSION information_schema_stats_expiry = 0"))
+    cambio, ahora = conexion.execute(text(
+        "SELECT UPDATE_TIME, NOW() FROM information_schema.TABLES "
+        "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = :tabla"), {"tabla": tabla}).one()
+    if cambio is not None:
+        return None if (ahora - cambio).total_seconds() < MARGEN_VERSION else str(cambio)
+    # InnoDB no guarda UPDATE_TIME tras un reinicio; QUICK da NULL salvo con checksum en vivo
+    q = m.dialect.identifier_preparer.quote
+    suma = conexion.execute(text(f"CHECKSUM TABLE {q(tabla)} QUICK")).one()[1]
+    return None if suma is None else f"checksum-{suma}"
+
+def version_tabla(origen, tabla):
+    """Valor que cambia cuando cambia el contenido de la tabla, o None si la base no
+    da una marca de cambio confiable (entonces no se usa la caché)"""
+    m = _motor(origen)
+    if m.dialect.name == "sqlite":
+        return None if m.url.database in (None, "", ":memory:") else _version_sqlite(m.url.database)
+    if m.dialect.name == "mysql":
+        with m.connect() as conexion:
+            return _version_mysql(m, conexion, tabla)
+    return None
+
+def consultar(consulta, parametros=None, tablas=(), origen=None, cache=True):
+    """Resultado de una consulta SQL como DataFrame.
+
+    `tablas` son las tablas que lee la consulta: su versión entra en la clave de la
+    caché, así un cambio en cualquiera de ellas invalida el resultado guardado. Si
+    alguna no tiene versión (`version_tabla`) la consulta no usa la caché.
+    """
+    m = _motor(origen)
+    versiones = {t: version_tabla(m, t) for t in tablas} if cache else {}
+    if not cache or None in versiones.values():
+        with m.connect() as conexion:
+            return pd.read_sql_query(text(consulta), conexion, params=parametros)
+    clave = clave_cache(m, consulta, parametros, versiones)
+    df = leer_cache(clave)
+    if df is None:
+        with m.connect() as conexion:
+            df = pd.read_sql_query(text(consulta), conexion, params=parametros)
+        guardar_cache(clave, df)
+    return df
+
+def cargar_tabla(tabla, columnas=None, desde=None, hasta=None, rangos=None, origen=None, cache=True):
+    """Lee una tabla de la base.
+
+    `columnas` son las columnas a traer (todas si no se indican). `desde`/`hasta`
+    filtran por la columna de fecha de la tabla (`COLUMNAS_FECHA`) y `rangos` por
+    cualquier columna; el filtro se resuelve en la base.
+    """
+    m = _motor(origen)
+    rangos = dict(rangos or {})
+    if desde is not None or hasta is not None:
+        if tabla not in COLUMNAS_FECHA:
+            raise ValueError(f"La tabla {tabla} no tiene columna de fecha para filtrar")
+        rangos[COLUMNAS_FECHA[tabla]] = (desde, hasta)
+    consulta, parametros = consulta_tabla(m, tabla, columnas, rangos)
+    return consultar(consulta, parametros, (tabla,), m, cache)
+
+
+# ==================== CACHÉ EN DISCO ====================
+
+def clave_cache(m, consulta, parametros, versiones):
+    datos = {
+        "url": make_url(str(m.url)).render_as_string(hide_password=True),
+        "consulta": consulta,
+        "parametros": {k: str(v) for k, v in (parametros or {}).items()},
+        "versiones": versiones,
+    }
+    return hashlib.sha256(json.dumps(datos, sort_keys=True).encode("utf-8")).hexdigest()
+
+def _rutas_cache(clave):
+    return [os.path.join(CARPETA_CACHE, f"{clave}.{extension}") for extension in ("parquet", "pkl")]
+
+def leer_cache(clave):
+    """Resultado guardado con esa clave, o None"""
+    for ruta in _rutas_cache(clave):
+        if os.path.exists(ruta):
+            try:
+                df = pd.read_parquet(ruta) if ruta.endswith(".parquet") else pd.read_pickle(ruta)
+            except Exception:
+                continue  # archivo dañado: se vuelve a consultar
+            os.utime(ruta)  # marca de uso para el recorte
+            return df
+    return None
+
+def guardar_cache(clave, df):
+    """Guarda un resultado en la caché (Parquet, o pickle si no se puede)"""
+    os.makedirs(CARPETA_CACHE, exist_ok=True)
+    ruta_parquet, ruta_pickle = _rutas_cache(clave)
+    descriptor, temporal = tempfile.mkstemp(dir=CARPETA_CACHE, suffix=".tmp")
+    os.close(descriptor)
+    try:
+        try:
+            if not HAY_PYARROW:
+                raise ImportError("pyarrow")
+            df.to_parquet(temporal)
+            ruta = ruta_parquet
+        except Exception:
+            df.to_pickle(temporal)
+            ruta = ruta_pickle
+        os.replace(temporal, ruta)
+    finally:
+        if os.path.exists(temporal):
+            os.remove(temporal)
+    recortar_cache()
+
+def recortar_cache(max_bytes=MAX_BYTES_CACHE):
+    """Borra los resultados usados hace más tiempo hasta que la caché entre en `max_bytes`"""
+    if not os.path.isdir(CARPETA_CACHE):
+        return
+    archivos = []
+    for nombre in os.listdir(CARPETA_CACHE):
+        if nombre.endswith((".parquet", ".pkl")):
+            estado = os.stat(os.path.join(CARPETA_CACHE, nombre))
+            archivos.append((estado.st_mtime, estado.st_size, nombre))
+    total = sum(tamano for _, tamano, _ in archivos)
+    for _, tamano, nombre in sorted(archivos):
+        if total <= max_bytes:
+            break
+        try:
+            os.remove(os.path.join(CARPETA_CACHE, nombre))
+        except FileNotFoundError:
+            pass
+        total -= tamano
+
+def vaciar_cache():
+    """Borra todos los resultados guardados"""
+    recortar_cache(0)
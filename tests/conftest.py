@@ -0,0 +1,44 @@
+"""Configuración compartida de las pruebas.
+
+Los módulos de Proyecto 1 y Proyecto 3 se importan por nombre (como lo hacen
+`app.py` y el notebook), así que sus carpetas van al path. La caché de consultas de
+`libreria` se lleva a una carpeta temporal antes de importar nada.
+"""
+import os
+import sqlite3
+import sys
+import tempfile
+
+import pytest
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+for carpeta in (RAIZ, os.path.join(RAIZ, "Proyecto 1"), os.path.join(RAIZ, "Proyecto 3")):
+    if carpeta not in sys.path:
+        sys.path.insert(0, carpeta)
+
+os.environ["LIBRERIA_CACHE"] = tempfile.mkdtemp(prefix="libreria_pruebas_")
+
+TABLAS_CSV = os.path.join(RAIZ, "Proyecto 1", "Tables")
+
+
+@pytest.fixture
+def base_sqlite(tmp_path):
+    """Base SQLite con las tablas de `Proyecto 1/Tables` y los nombres de la base MySQL"""
+    from export_tables import preparar_sqlite
+    return preparar_sqlite(str(tmp_path / "libreria.db"), TABLAS_CSV)
+
+
+def agregar_ventas(ruta_db, lineas, cliente=1, fecha="2024-12-01 10:00:00"):
+    """Agrega a la base una factura con `lineas` [(id_libro, cantidad)] y retorna su id"""
+    with sqlite3.connect(ruta_db) as conexion:
+        id_factura = conexion.execute("SELECT MAX(id_factura) FROM factura").fetchone()[0] + 1
+        id_venta = conexion.execute("SELECT MAX(id_ventas) FROM ventas").fetchone()[0]
+        precios = dict(conexion.execute("SELECT id_libro, precio FROM libros"))
+        conexion.execute(
+            "INSERT INTO factura (id_factura, id_cliente, fecha_emision, cant_total, monto_total) "
+            "VALUES (?, ?, ?, ?, ?)",
+            (id_factura, cliente, fecha, sum(c for _, c in lineas), sum(precios[l] * c for l, c in lineas)))
+        conexion.executemany(
+            "INSERT INTO ventas (id_ventas, id_libro, cantidad, id_factura) VALUES (?, ?, ?, ?)",
+            [(id_venta + i, libro, cantidad, id_factura) for i, (libro, cantidad) in enumerate(lineas, 1)])
+    return id_factura
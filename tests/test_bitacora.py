@@ -0,0 +1,87 @@
+import numpy as np
+import pandas as pd
+
+from bitacora import (aplicar_operaciones, contar_operaciones, leer_operaciones, operacion,
+                      registrar, vaciar)
+
+
+def _base():
+    return pd.DataFrame({
+        "nombre": [f"n{i}" for i in range(1, 21)],
+        "precio": np.arange(1, 21) * 100.0,
+        "stock": np.arange(1, 21),
+    }, index=pd.Index(np.arange(1, 21), name="id"))
+
+def _operaciones_al_azar(base, cantidad, rng):
+    """Operaciones al azar y la tabla esperada después de cada una"""
+    esperada = base.copy()
+    siguiente = int(base.index.max()) + 1
+    entradas, versiones = [], []
+    for _ in range(cantidad):
+        tipo = rng.choice(["insert", "update", "delete"], p=[0.3, 0.5, 0.2])
+        if tipo == "insert" or len(esperada) == 0:
+            valores = {"nombre": f"alta{siguiente}", "precio": float(rng.integers(1, 500)),
+                       "stock": int(rng.integers(0, 9))}
+            entradas.append(operacion("insert", siguiente, valores))
+            esperada.loc[siguiente] = [valores["nombre"], valores["precio"], valores["stock"]]
+            siguiente += 1
+        elif tipo == "update":
+            id_fila = int(rng.choice(esperada.index))
+            valores = {"precio": float(rng.integers(1, 500))} if rng.random() < 0.5 else \
+                {"nombre": f"editado{len(entradas)}", "stock": int(rng.integers(0, 9))}
+            entradas.append(operacion("update", id_fila, valores))
+            for columna, valor in valores.items():
+                esperada.loc[id_fila, columna] = valor
+        else:
+            id_fila = int(rng.choice(esperada.index))
+            entradas.append(operacion("delete", id_fila))
+            esperada = esperada.drop(index=id_fila)
+        versiones.append(esperada.copy())
+    return entradas, versiones
+
+def _misma_tabla(obtenida, esperada):
+    pd.testing.assert_frame_equal(obtenida.sort_index(), esperada.sort_index(), check_names=False)
+
+def test_reproducir_la_bitacora_reconstruye_cada_version(tmp_path):
+    rng = np.random.default_rng(0)
+    base = _base()
+    entradas, versiones = _operaciones_al_azar(base, 300, rng)
+    ruta = str(tmp_path / "tabla.bitacora.jsonl")
+    for i, entrada in enumerate(entradas, 1):
+        assert registrar(ruta, entrada) == i
+
+    leidas = leer_operaciones(ruta)
+    assert len(leidas) == len(entradas) == contar_operaciones(ruta)
+    for i, esperada in enumerate(versiones, 1):
+        _misma_tabla(aplicar_operaciones(base, leidas[:i]), esperada)
+
+def test_una_linea_cortada_se_descarta(tmp_path):
+    ruta = str(tmp_path / "tabla.bitacora.jsonl")
+    registrar(ruta, operacion("update", 1, {"precio": 5.0}))
+    with open(ruta, "a", encoding="utf-8") as f:
+        f.write('{"op": "delete", "id": 2')  # corte a mitad de escritura
+    operaciones = leer_operaciones(ruta)
+    assert [e["op"] for e in operaciones] == ["update"]
+    assert aplicar_operaciones(_base(), operaciones).loc[1, "precio"] == 5.0
+
+    # La operación siguiente no queda pegada a la línea cortada
+    assert registrar(ruta, operacion("delete", 3)) == 2
+    operaciones = leer_operaciones(ruta)
+    assert [(e["op"], e["id"]) for e in operaciones] == [("update", 1), ("delete", 3)]
+    tabla = aplicar_operaciones(_base(), operaciones)
+    assert 2 in tabla.index and 3 not in tabla.index
+    assert contar_operaciones(ruta) == 2
+
+def test_conteo_de_pendientes_sin_releer(tmp_path):
+    ruta = str(tmp_path / "tabla.bitacora.jsonl")
+    for i in range(1, 51):
+        assert registrar(ruta, operacion("delete", i)) == i
+    # Otro proceso agrega una operación: el conteo guardado ya no vale y se recuenta
+    with open(ruta, "a", encoding="utf-8") as f:
+        f.write('{"op": "delete", "id": 99, "ts": "2024-01-01T00:00:00"}\n')
+    assert registrar(ruta, operacion("delete", 100)) == 52
+    assert contar_operaciones(ruta) == 52
+
+    vaciar(ruta)
+    assert contar_operaciones(ruta) == 0
+    assert registrar(ruta, operacion("delete", 1)) == 1
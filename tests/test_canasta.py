@@ -0,0 +1,50 @@
+import canasta
+from canasta import actualizar_canasta, minar, reglas
+from conftest import agregar_ventas
+from hechos import actualizar_hechos, leer_hechos
+
+# Con las 50 facturas de prueba el mínimo es 3 facturas, y sigue siéndolo con 52
+SOPORTE = 0.05
+
+
+def _actualizar(url, carpeta, procesos=1):
+    actualizar_hechos(origen=url, carpeta=str(carpeta))
+    return actualizar_canasta(str(carpeta), soporte_minimo=SOPORTE, procesos=procesos)
+
+def _mismo_modelo(a, b):
+    assert a["facturas"] == b["facturas"]
+    assert a["frecuentes"] == b["frecuentes"]
+    assert a["borde"] == b["borde"]
+
+def test_incremental_igual_a_minar_todo(base_sqlite, tmp_path):
+    url = f"sqlite:///{base_sqlite}"
+    incremental = tmp_path / "incremental"
+    _actualizar(url, incremental)
+
+    # Ventas que no cambian qué conjuntos son frecuentes: se suman sin volver a minar
+    agregar_ventas(base_sqlite, [(22, 1)])
+    agregar_ventas(base_sqlite, [(19, 1), (40, 1)])
+    modelo = _actualizar(url, incremental)
+    assert modelo["actualizacion"]["modo"] == "incremental"
+    _mismo_modelo(modelo, _actualizar(url, tmp_path / "completo"))
+
+def test_conjunto_que_cruza_el_umbral_vuelve_a_minar(base_sqlite, tmp_path):
+    url = f"sqlite:///{base_sqlite}"
+    incremental = tmp_path / "incremental"
+    anterior = _actualizar(url, incremental)
+    # Los libros 1 y 4 son frecuentes pero nunca se compraron juntos
+    assert (1, 4) not in anterior["frecuentes"] and (1, 4) in anterior["borde"]
+
+    for _ in range(3):
+        agregar_ventas(base_sqlite, [(1, 1), (4, 1)])
+    modelo = _actualizar(url, incremental)
+    assert modelo["actualizacion"]["modo"] == "completa"
+    assert modelo["frecuentes"][(1, 4)] == 3
+    _mismo_modelo(modelo, _actualizar(url, tmp_path / "completo"))
+    assert len(reglas(modelo, confianza_minima=0.1, origen=url))
+
+def test_en_paralelo_igual_que_en_serie(base_sqlite, tmp_path, monkeypatch):
+    monkeypatch.setattr(canasta, "MIN_LIBROS_PARALELO", 1)
+    actualizar_hechos(origen=f"sqlite:///{base_sqlite}", carpeta=str(tmp_path))
+    pares = leer_hechos(["id_factura", "id_libro"], str(tmp_path))
+    _mismo_modelo(minar(pares, 0.03, procesos=2), minar(pares, 0.03, procesos=1))
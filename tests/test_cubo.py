@@ -0,0 +1,50 @@
+import sqlite3
+
+import pandas as pd
+
+from agregados import AGREGADOS
+from conftest import agregar_ventas
+from cubo import actualizar_cubo, agregado_cubo, rollup
+from hechos import actualizar_hechos
+
+
+def _actualizar(url, carpeta):
+    actualizar_hechos(origen=url, carpeta=str(carpeta))
+    return actualizar_cubo(str(carpeta), url)
+
+def _mismo_cubo(a, b):
+    for parte in ("base", "base_facturas"):
+        pd.testing.assert_frame_equal(a[parte].sort_index(), b[parte].sort_index())
+    assert a["cuboides"].keys() == b["cuboides"].keys()
+    for clave in a["cuboides"]:
+        pd.testing.assert_frame_equal(a["cuboides"][clave].sort_index(), b["cuboides"][clave].sort_index(),
+                                      obj=str(clave))
+
+def test_incremental_igual_a_reconstruccion(base_sqlite, tmp_path):
+    url = f"sqlite:///{base_sqlite}"
+    incremental = tmp_path / "incremental"
+    _actualizar(url, incremental)
+
+    agregar_ventas(base_sqlite, [(22, 1), (19, 2)], cliente=3)
+    agregar_ventas(base_sqlite, [(1, 1)], cliente=3, fecha="2025-01-10 09:00:00")
+    # Una línea nueva en una factura ya sumada: no tiene que contar la factura otra vez
+    with sqlite3.connect(base_sqlite) as conexion:
+        conexion.execute("INSERT INTO ventas (id_ventas, id_libro, cantidad, id_factura) "
+                         "SELECT MAX(id_ventas) + 1, 5, 1, 7 FROM ventas")
+    cubo = _actualizar(url, incremental)
+
+    completo = _actualizar(url, tmp_path / "completo")
+    _mismo_cubo(cubo, completo)
+    for nombre in AGREGADOS:
+        pd.testing.assert_frame_equal(agregado_cubo(cubo, nombre), agregado_cubo(completo, nombre))
+
+def test_rollup_coincide_con_las_ventas(base_sqlite, tmp_path):
+    url = f"sqlite:///{base_sqlite}"
+    cubo = _actualizar(url, tmp_path)
+    with sqlite3.connect(base_sqlite) as conexion:
+        total = conexion.execute("SELECT SUM(v.cantidad * l.precio), SUM(v.cantidad) FROM ventas v "
+                                 "JOIN libros l ON l.id_libro = v.id_libro").fetchone()
+    todo = rollup(cubo)
+    assert todo["monto_venta"].iloc[0] == total[0]
+    assert todo["cantidad"].iloc[0] == total[1]
+    assert rollup(cubo, ("genero",), "mes")["monto_venta"].sum() == total[0]
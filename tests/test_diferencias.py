@@ -0,0 +1,77 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from diferencias import cambios_por_columna, comparar
+
+
+def _tabla(n, rng):
+    texto = np.array([f"t{i}" for i in rng.integers(0, 50, n)], dtype=object)
+    texto[rng.random(n) < 0.1] = None
+    decimal = rng.normal(size=n)
+    decimal[rng.random(n) < 0.1] = np.nan
+    return pd.DataFrame({
+        "entero": rng.integers(0, 100, n),
+        "decimal": decimal,
+        "texto": texto,
+        "nulable": pd.array(np.where(rng.random(n) < 0.1, None, rng.integers(0, 5, n)), dtype="Int64"),
+        "fecha": pd.Timestamp("2024-01-01") + pd.to_timedelta(rng.integers(0, 365, n), unit="D"),
+    }, index=pd.Index(np.arange(1, n + 1), name="id"))
+
+def _version_nueva(anterior, rng):
+    nuevo = anterior.copy()
+    n = len(nuevo)
+    for columna in nuevo.columns:
+        filas = rng.choice(n, n // 20, replace=False)
+        posicion = nuevo.columns.get_loc(columna)
+        if columna == "texto":
+            nuevo.iloc[filas, posicion] = [None if i % 3 == 0 else f"nuevo{i}" for i in range(len(filas))]
+        elif columna == "decimal":
+            nuevo.iloc[filas, posicion] = np.where(np.arange(len(filas)) % 3 == 0, np.nan, 1000.5)
+        elif columna == "nulable":
+            nuevo.iloc[filas, posicion] = pd.array([None if i % 3 == 0 else 9 for i in range(len(filas))],
+                                                   dtype="Int64")
+        elif columna == "fecha":
+            nuevo.iloc[filas, posicion] = pd.Timestamp("2030-01-01")
+        else:
+            nuevo.iloc[filas, posicion] = -1
+    nuevo = nuevo.drop(nuevo.index[rng.choice(n, n // 50, replace=False)])
+    altas = anterior.iloc[: n // 50].set_axis(anterior.index[: n // 50] + n)
+    # Las filas quedan desordenadas: la comparación alinea por id, no por posición
+    return pd.concat([nuevo, altas]).sample(frac=1, random_state=0)
+
+@pytest.mark.parametrize("semilla", [0, 1, 2])
+def test_modos_valores_y_hash_coinciden(semilla):
+    rng = np.random.default_rng(semilla)
+    anterior = _tabla(2000, rng)
+    nuevo = _version_nueva(anterior, rng)
+
+    por_valores = comparar(anterior, nuevo, modo="valores")
+    por_hash = comparar(anterior, nuevo, modo="hash")
+
+    for clave in ("altas", "bajas", "modificadas"):
+        assert por_valores[clave].sort_values().equals(por_hash[clave].sort_values()), clave
+    pd.testing.assert_frame_equal(por_valores["mascara"].sort_index(), por_hash["mascara"].sort_index())
+    assert len(por_valores["altas"]) == 40 and len(por_valores["bajas"]) == 40
+    assert len(por_valores["modificadas"]) > 0
+
+def test_dos_vacios_no_son_un_cambio():
+    anterior = pd.DataFrame({"a": [1.0, np.nan], "b": [None, "x"]}, index=[1, 2])
+    nuevo = pd.DataFrame({"a": [1.0, np.nan], "b": [None, "y"]}, index=[1, 2])
+    for modo in ("valores", "hash"):
+        diferencia = comparar(anterior, nuevo, modo=modo)
+        assert list(diferencia["modificadas"]) == [2]
+        assert cambios_por_columna(diferencia).to_dict() == {"a": 0, "b": 1}
+
+def test_columnas_agregadas_y_quitadas():
+    anterior = pd.DataFrame({"a": [1, 2], "b": [3, 4]}, index=[1, 2])
+    nuevo = pd.DataFrame({"a": [1, 5], "c": [0, 0]}, index=[1, 2])
+    diferencia = comparar(anterior, nuevo, modo="hash")
+    assert diferencia["columnas_agregadas"] == ["c"]
+    assert diferencia["columnas_quitadas"] == ["b"]
+    assert list(diferencia["modificadas"]) == [2]
+
+def test_modo_desconocido():
+    df = pd.DataFrame({"a": [1]})
+    with pytest.raises(ValueError):
+        comparar(df, df, modo="otro")
@@ -0,0 +1,50 @@
+import os
+import sqlite3
+
+import pandas as pd
+
+from conftest import agregar_ventas
+from export_tables import FORMATOS, exportar
+
+
+def _exportar(url, destino, completo=False):
+    # Lotes chicos para que la exportación escriba en varias tandas
+    estadisticas = exportar(url, str(destino), FORMATOS, hilos=2, tamano_lote=7, completo=completo)
+    assert not [e for e in estadisticas if e.get("error")]
+    return {e["tabla"]: e for e in estadisticas}
+
+def _mismos_archivos(a, b):
+    nombres = sorted(n for n in os.listdir(a) if n.endswith((".csv", ".parquet")))
+    assert nombres == sorted(n for n in os.listdir(b) if n.endswith((".csv", ".parquet")))
+    for nombre in nombres:
+        if nombre.endswith(".csv"):
+            with open(os.path.join(a, nombre), "rb") as fa, open(os.path.join(b, nombre), "rb") as fb:
+                assert fa.read() == fb.read(), nombre
+        else:
+            pd.testing.assert_frame_equal(pd.read_parquet(os.path.join(a, nombre)),
+                                          pd.read_parquet(os.path.join(b, nombre)), obj=nombre)
+
+def test_incremental_igual_a_exportar_todo(base_sqlite, tmp_path):
+    url = f"sqlite:///{base_sqlite}"
+    incremental = tmp_path / "incremental"
+    assert {e["modo"] for e in _exportar(url, incremental).values()} == {"completa"}
+
+    agregar_ventas(base_sqlite, [(22, 1), (19, 2)])
+    agregar_ventas(base_sqlite, [(1, 1)], fecha="2025-01-10 09:00:00")
+    estadisticas = _exportar(url, incremental)
+    assert {e["modo"] for e in estadisticas.values()} == {"incremental"}
+    assert estadisticas["ventas"]["filas"] == 3
+    assert estadisticas["factura"]["filas"] == 2
+
+    completa = tmp_path / "completa"
+    _exportar(url, completa, completo=True)
+    _mismos_archivos(incremental, completa)
+
+def test_fila_borrada_vuelve_a_exportar(base_sqlite, tmp_path):
+    url = f"sqlite:///{base_sqlite}"
+    _exportar(url, tmp_path)
+    with sqlite3.connect(base_sqlite) as conexion:
+        conexion.execute("DELETE FROM ventas WHERE id_ventas = 10")
+    ventas = _exportar(url, tmp_path)["ventas"]
+    assert ventas["modo"] == "completa"
+    assert 10 not in set(pd.read_csv(tmp_path / "ventas.csv")["id_ventas"])
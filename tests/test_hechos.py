@@ -0,0 +1,45 @@
+import sqlite3
+
+import pandas as pd
+
+import hechos
+from conftest import agregar_ventas
+from hechos import actualizar_hechos, leer_estado, leer_hechos
+
+
+def _hechos(carpeta):
+    return leer_hechos(carpeta=str(carpeta)).sort_values("id_ventas").reset_index(drop=True)
+
+def test_incremental_igual_a_reconstruccion(base_sqlite, tmp_path, monkeypatch):
+    # Con pocas partes permitidas también se prueba la compactación
+    monkeypatch.setattr(hechos, "MAX_PARTES", 2)
+    url = f"sqlite:///{base_sqlite}"
+    incremental = tmp_path / "incremental"
+    assert actualizar_hechos(origen=url, carpeta=str(incremental))["modo"] == "completa"
+
+    for lineas in ([(22, 1), (19, 2)], [(1, 1)], [(37, 3), (4, 1), (22, 1)]):
+        agregar_ventas(base_sqlite, lineas)
+        resumen = actualizar_hechos(origen=url, carpeta=str(incremental))
+        assert resumen["modo"] == "incremental"
+        assert resumen["filas"] == len(lineas)
+    assert len(leer_estado(str(incremental))["partes"]) <= 2
+
+    completa = tmp_path / "completa"
+    actualizar_hechos(origen=url, carpeta=str(completa))
+    pd.testing.assert_frame_equal(_hechos(incremental), _hechos(completa))
+    assert len(_hechos(completa)) == 101 + 6
+
+def test_sin_ventas_nuevas_no_agrega_nada(base_sqlite, tmp_path):
+    url = f"sqlite:///{base_sqlite}"
+    actualizar_hechos(origen=url, carpeta=str(tmp_path))
+    resumen = actualizar_hechos(origen=url, carpeta=str(tmp_path))
+    assert (resumen["modo"], resumen["filas"], resumen["total"]) == ("incremental", 0, 101)
+
+def test_venta_borrada_reconstruye(base_sqlite, tmp_path):
+    url = f"sqlite:///{base_sqlite}"
+    actualizar_hechos(origen=url, carpeta=str(tmp_path))
+    with sqlite3.connect(base_sqlite) as conexion:
+        conexion.execute("DELETE FROM ventas WHERE id_ventas = 10")
+    resumen = actualizar_hechos(origen=url, carpeta=str(tmp_path))
+    assert resumen["modo"] == "completa"
+    assert 10 not in set(_hechos(tmp_path)["id_ventas"])
@@ -0,0 +1,67 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import almacenamiento
+import historial
+from historial import cargar_version, leer_manifiesto, registrar_version
+
+
+def _siguiente(df, paso, rng):
+    """Una versión nueva: ediciones, altas y bajas, y a veces solo un cambio de tipo"""
+    if paso % 7 == 3:
+        return df.astype({"cantidad": "float64" if df["cantidad"].dtype == "int64" else "int64"})
+    nuevo = df.copy()
+    filas = rng.choice(len(nuevo), 3, replace=False)
+    nuevo.iloc[filas, nuevo.columns.get_loc("precio")] = rng.integers(1, 1000, 3) * 1.0
+    nuevo.iloc[filas[:1], nuevo.columns.get_loc("nombre")] = f"editado{paso}"
+    # Una edición y un alta con un género que la foto no tiene entre sus categorías
+    generos = nuevo["genero"].astype(object)
+    generos.iloc[filas[1]] = f"genero{paso}"
+    nuevo["genero"] = generos.astype("category")
+    nuevo = nuevo.drop(nuevo.index[rng.integers(len(nuevo))])
+    alta = pd.DataFrame({"nombre": [f"alta{paso}"], "precio": [1.5], "cantidad": nuevo["cantidad"].iloc[:1].to_numpy(),
+                         "genero": [f"nuevo{paso}"]},
+                        index=pd.Index([int(df.index.max()) + 1], name="id"))
+    nuevo = pd.concat([nuevo.astype({"genero": object}), alta])
+    return nuevo.astype({"genero": "category"})
+
+@pytest.mark.parametrize("formato", ["parquet", "csv"])
+def test_cada_version_se_reconstruye_igual(tmp_path, monkeypatch, formato):
+    monkeypatch.setattr(almacenamiento, "FORMATO_PREDETERMINADO", formato)
+    monkeypatch.setattr(historial, "FOTO_CADA", 4)
+    monkeypatch.setattr(historial, "MAX_VERSIONES", 12)
+    rng = np.random.default_rng(1)
+    df = pd.DataFrame({"nombre": [f"n{i}" for i in range(30)], "precio": np.arange(30) * 10.0,
+                       "cantidad": np.arange(30), "genero": pd.Categorical(["novela", "poesia", "ensayo"] * 10)},
+                      index=pd.Index(np.arange(1, 31), name="id"))
+
+    esperadas = {0: df}
+    anterior = df
+    for paso in range(1, 26):
+        nuevo = _siguiente(anterior, paso, rng)
+        version = registrar_version(str(tmp_path), "tabla", nuevo, anterior)
+        assert version == paso
+        esperadas[version] = nuevo
+        anterior = nuevo
+
+    versiones = leer_manifiesto(str(tmp_path), "tabla")
+    assert len(versiones) == 12
+    assert {v["tipo"] for v in versiones} == {"foto", "delta"}
+    for entrada in versiones:
+        obtenida = cargar_version(str(tmp_path), "tabla", entrada["version"])
+        # El manifiesto guarda el tipo `category`, no la lista de categorías
+        pd.testing.assert_frame_equal(obtenida, esperadas[entrada["version"]], check_names=False,
+                                      check_categorical=False)
+
+def test_solo_cambio_de_tipo_crea_version(tmp_path):
+    df = pd.DataFrame({"a": [1, 2, 3]}, index=pd.Index([1, 2, 3], name="id"))
+    como_decimal = df.astype("float64")
+    assert registrar_version(str(tmp_path), "t", como_decimal, df) == 1
+    assert registrar_version(str(tmp_path), "t", como_decimal, como_decimal) is None
+    assert cargar_version(str(tmp_path), "t", 1)["a"].dtype == "float64"
+    assert cargar_version(str(tmp_path), "t", 0)["a"].dtype == "int64"
+
+def test_version_inexistente(tmp_path):
+    with pytest.raises(KeyError):
+        cargar_version(str(tmp_path), "t", 3)